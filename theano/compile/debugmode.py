@@ -6,7 +6,10 @@ TODO: add support for IfElse Op, LazyLinker, PureOp, etc.
 """
 from __future__ import absolute_import, print_function, division
 
+import atexit
 import copy
+import multiprocessing
+import os
 import sys
 import gc
 import logging
@@ -1039,6 +1042,84 @@ def _lessbroken_deepcopy(a):
     return rval
 
 
+def _value_signature(value):
+    """
+    Return a hashable description of the value of an input of a node, used
+    to remember which nodes were already verified with similar inputs.
+
+    """
+    if isinstance(value, np.ndarray):
+        return (type(value), value.dtype.str, value.shape, value.strides)
+    return (type(value), getattr(value, 'dtype', None),
+            getattr(value, 'shape', None))
+
+
+# The (op, input signatures) pairs that passed all the checks, used when
+# DebugMode.cache_verified is True.
+_verified_nodes = set()
+
+# The process pools shared by the functions compiled with DebugMode, by
+# number of workers, and the process that created them. They stay open
+# until exit, as the compiled functions keep using them.
+_process_pools = {}
+_process_pools_pid = None
+
+
+@atexit.register
+def _close_process_pools():
+    """
+    Wait for the workers of the process pools to exit.
+
+    """
+    global _process_pools_pid
+    # Forked processes must not close the pools of their parent.
+    if _process_pools_pid == os.getpid():
+        for pool in _process_pools.values():
+            pool.close()
+            pool.join()
+    _process_pools.clear()
+    _process_pools_pid = None
+
+
+def _get_process_pool(n_workers):
+    """
+    Return a process pool of `n_workers` processes, shared by all the
+    functions compiled with DebugMode.
+
+    """
+    global _process_pools_pid
+    if _process_pools_pid != os.getpid():
+        # Drop the pools inherited from the parent process.
+        _process_pools.clear()
+        _process_pools_pid = os.getpid()
+    if n_workers not in _process_pools:
+        _process_pools[n_workers] = multiprocessing.Pool(n_workers)
+    return _process_pools[n_workers]
+
+
+def _perform_in_worker(op, input_types, inputs):
+    """
+    Run the Python implementation of `op` on `inputs` in a worker process.
+
+    The node is rebuilt from the types of its inputs, so this fails for
+    the Ops that can't be pickled or that need constant inputs.
+
+    """
+    node = op.make_node(*[t() for t in input_types])
+    storage_map = {}
+    compute_map = {}
+    for r, value in zip(node.inputs, inputs):
+        storage_map[r] = [value]
+        compute_map[r] = [True]
+    for r in node.outputs:
+        storage_map[r] = [None]
+        compute_map[r] = [False]
+    op.prepare_node(node, storage_map, compute_map, 'py')
+    thunk = op.make_py_thunk(node, storage_map, compute_map, [])
+    thunk()
+    return [storage_map[r][0] for r in node.outputs]
+
+
 def _find_bad_optimizations0(order, reasons, r_vals):
     """
     Use a simple algorithm to find broken optimizations.
@@ -1904,6 +1985,14 @@ class _Linker(gof.link.LocalLinker):
         # Precompute some things for storage pre-allocation
         def_val = int(config.unittests.rseed)
 
+        mode = self.maker.mode
+        check_fraction = mode.check_fraction
+        rng = np.random.RandomState(def_val)
+        verified = _verified_nodes if mode.cache_verified else None
+        pool = None
+        if mode.n_workers > 0:
+            pool = _get_process_pool(mode.n_workers)
+
         #####
         # This is the function that runs when you evaluate the graph
         #####
@@ -1982,6 +2071,10 @@ class _Linker(gof.link.LocalLinker):
                         print(r, s)
                     assert s[0] is None
 
+                # The nodes whose perform runs in the process pool: (index,
+                # node, verified key, async result).
+                pending = []
+
                 # try:
                 # compute the value of all variables
                 for i, (thunk_py, thunk_c, node) in enumerate(zip(thunks_py,
@@ -1999,6 +2092,44 @@ class _Linker(gof.link.LocalLinker):
                             raise InvalidValueError(r, storage_map[r][0],
                                                     client_node=node)
 
+                    # Check only a sample of the nodes, and the ones not
+                    # verified yet with similar inputs. The nodes that
+                    # destroy their inputs are always checked, as the
+                    # checks record the destroyed values.
+                    dmap = getattr(node.op, 'destroy_map', {})
+                    check = (bool(dmap) or check_fraction >= 1 or
+                             rng.uniform() < check_fraction)
+                    verified_key = None
+                    if check and verified is not None and not dmap:
+                        verified_key = (node.op, tuple(
+                            _value_signature(r_vals[r]) for r in node.inputs))
+                        check = verified_key not in verified
+                    if not check and (thunk_c or thunk_py):
+                        thunk = thunk_c or thunk_py
+                        try:
+                            thunk()
+                        except Exception:
+                            raise_with_op(node, thunk)
+                        for r in node.outputs:
+                            r_vals[r] = storage_map[r][0]
+                            storage_map[r][0] = None
+                        for r in node.inputs:
+                            storage_map[r][0] = None
+                        continue
+
+                    if pool is not None and thunk_py and thunk_c and not dmap:
+                        # Compare the C code to perform run in the pool at
+                        # the end of the call.
+                        pending.append((i, node, verified_key,
+                                        pool.apply_async(
+                                            _perform_in_worker,
+                                            (node.op,
+                                             [r.type for r in node.inputs],
+                                             [r_vals[r]
+                                              for r in node.inputs]))))
+                        verified_key = None
+                        thunk_py = None
+
                     # On the first call to thunk_py(), its output
                     # storage will be None
                     if thunk_py:
@@ -2219,6 +2350,37 @@ class _Linker(gof.link.LocalLinker):
                             assert thunks_py[idx] is None, node
                             assert thunks_c[idx] is None, node
                             raise Exception("No code run for %s" % node)
+                    if verified_key is not None:
+                        verified.add(verified_key)
+
+                for idx, node, verified_key, result in pending:
+                    try:
+                        py_outputs = result.get()
+                    except Exception:
+                        if thunks_py[idx] is None:
+                            continue
+                        # The Op could not be run in another process, run
+                        # perform here.
+                        _logger.debug("running perform of %s locally", node)
+                        for r in node.inputs:
+                            storage_map[r][0] = _lessbroken_deepcopy(
+                                r_vals[r])
+                        try:
+                            thunks_py[idx]()
+                        except Exception:
+                            raise_with_op(node, thunks_py[idx])
+                        py_outputs = [storage_map[r][0] for r in node.outputs]
+                        for r in node.inputs + node.outputs:
+                            storage_map[r][0] = None
+                    for r, py_val in zip(node.outputs, py_outputs):
+                        if not check_eq(r, py_val, r_vals[r]):
+                            raise BadThunkOutput(
+                                r, thunk1='perform', val1=py_val,
+                                thunk2='c_code', val2=r_vals[r],
+                                inputs_val=[r_vals[inp]
+                                            for inp in node.inputs])
+                    if verified_key is not None:
+                        verified.add(verified_key)
 
                 if False:
                     # This could be useful to help finding refcount problem.
@@ -2669,6 +2831,29 @@ class DebugMode(Mode):
 
     """
 
+    check_fraction = config.DebugMode.check_fraction
+    """
+    Fraction of the nodes that are checked at each call, chosen at random.
+    The other nodes are only run with one implementation. The nodes that
+    destroy their inputs are always checked.
+
+    """
+
+    cache_verified = config.DebugMode.cache_verified
+    """
+    If True, skip the checks of a node when a node with the same Op already
+    passed them with inputs of the same type, dtype, shape and strides.
+
+    """
+
+    n_workers = config.DebugMode.n_workers
+    """
+    If positive, run the `perform` of the checked nodes in a pool of this
+    many processes, while the C code runs in the calling process. The
+    outputs are compared at the end of the call.
+
+    """
+
     # This function will be used to create a FunctionMaker in
     # function_module.function
     def function_maker(self, i, o, m, *args, **kwargs):
@@ -2687,6 +2872,9 @@ class DebugMode(Mode):
                  check_isfinite=None,
                  check_preallocated_output=None,
                  require_matching_strides=None,
+                 check_fraction=None,
+                 cache_verified=None,
+                 n_workers=None,
                  linker=_DummyLinker()):
         """
         If any of these arguments (except optimizer) is not None, it overrides
@@ -2721,6 +2909,15 @@ class DebugMode(Mode):
         if require_matching_strides is not None:
             self.require_matching_strides = require_matching_strides
 
+        if check_fraction is not None:
+            self.check_fraction = check_fraction
+
+        if cache_verified is not None:
+            self.cache_verified = cache_verified
+
+        if n_workers is not None:
+            self.n_workers = n_workers
+
         if not (self.check_c_code or self.check_py_code):
             raise ValueError('DebugMode has to check at least one of c and py '
                              'code')
@@ -5,11 +5,16 @@ Driver of graph construction, optimization, and linking.
 from __future__ import absolute_import, print_function, division
 
 import copy
+import operator
+import os
+import tempfile
+import threading
 from six import string_types, iteritems, iterkeys
 from six.moves import xrange
 import six.moves.copyreg as copyreg
 import six.moves.cPickle as pickle
 from itertools import chain
+from collections import OrderedDict
 import time
 import warnings
 import numpy as np
@@ -23,7 +28,6 @@ import theano.compile.profiling
 from theano.compile.io import (
     In, SymbolicInput, SymbolicOutput)
 from theano.compile.ops import deep_copy_op, view_op
-from theano.gof.graph import is_same_graph
 from theano.gof.op import ops_with_inner_function
 
 import logging
@@ -196,6 +200,8 @@ def std_fgraph(input_specs, output_specs, accept_inplace=False):
     # If named nodes are replaced, keep the name
     for feature in std_fgraph.features:
         fgraph.attach_feature(feature())
+    if config.optdb.incremental_toposort:
+        fgraph.attach_feature(gof.toolbox.IncrementalToposort())
     return fgraph, list(map(SymbolicOutput, updates))
 
 
@@ -498,6 +504,13 @@ class Function(object):
             if input.update is not None:
                 self.n_returned_outputs -= 1
 
+        # The containers of the updated shared variables that must be told
+        # when the storage was replaced by the update (e.g. to copy it back
+        # into memory shared with other processes).
+        self.synced_containers = [
+            input.value for input in self.maker.inputs
+            if input.update is not None and hasattr(input.value, 'sync')]
+
         for node in self.maker.fgraph.apply_nodes:
             if node.op in ops_with_inner_function:
                 self.nodes_with_inner_function.append(node.op)
@@ -722,6 +735,83 @@ class Function(object):
         f_cpy.maker.fgraph.name = name
         return f_cpy
 
+    def concurrent(self, max_contexts=None):
+        """
+        Return a version of this function that can be called from several
+        threads at the same time.
+
+        Each call runs in an execution context with its own input, output
+        and intermediate storage. The contexts are made by linking the
+        optimized graph of this function again, which reuses the compiled
+        C code, and are kept in a pool to be reused by the next calls. All
+        the contexts share the storage of the shared variables, so the
+        parameters of a model are not duplicated.
+
+        Parameters
+        ----------
+        max_contexts : int, optional
+            Maximum number of execution contexts. When they are all in use,
+            the calls wait for one to be free. By default, there is one
+            context per thread calling the function at the same time.
+
+        Returns
+        -------
+        ConcurrentFunction
+
+        Notes
+        -----
+        The updates of shared variables done by concurrent calls are not
+        atomic: they can overwrite each other.
+        The outputs compiled with ``borrow=True`` can be overwritten by a
+        later call from another thread.
+
+        """
+        return ConcurrentFunction(self, max_contexts)
+
+    def _raise_fn_error(self):
+        """
+        Reraise the exception raised by self.fn, with information on the
+        node that raised it. Must be called from an except clause.
+
+        """
+        if hasattr(self.fn, 'position_of_error'):
+            # this is a new vm-provided function or c linker
+            # they need this because the exception manipulation
+            # done by raise_with_op is not implemented in C.
+            thunk = None
+            if hasattr(self.fn, 'thunks'):
+                thunk = self.fn.thunks[self.fn.position_of_error]
+            gof.link.raise_with_op(
+                node=self.fn.nodes[self.fn.position_of_error],
+                thunk=thunk,
+                storage_map=getattr(self.fn, 'storage_map', None))
+        else:
+            # old-style linkers raise their own exceptions
+            raise
+
+    def _add_bad_input_info(self, e, arg, i):
+        """
+        Add the name and the index of the bad argument `arg`, given for the
+        input `i`, to the message of the exception `e` raised by its filter.
+
+        """
+        function_name = "theano function"
+        argument_name = "argument"
+        if self.name:
+            function_name += ' with name "' + self.name + '"'
+        if hasattr(arg, 'name') and arg.name:
+            argument_name += ' with name "' + arg.name + '"'
+        where = theano.gof.utils.get_variable_trace_string(
+            self.maker.inputs[i].variable)
+        if len(e.args) == 1:
+            e.args = ("Bad input " + argument_name + " to " +
+                      function_name + " at index %d (0-based). %s"
+                      % (i, where) + e.args[0],)
+        else:
+            e.args = ("Bad input " + argument_name + " to " +
+                      function_name + " at index %d (0-based). %s"
+                      % (i, where),) + e.args
+
     def __call__(self, *args, **kwargs):
         """
         Evaluates value of a function on given arguments.
@@ -795,22 +885,7 @@ class Function(object):
                             allow_downcast=s.allow_downcast)
 
                     except Exception as e:
-                        function_name = "theano function"
-                        argument_name = "argument"
-                        if self.name:
-                            function_name += ' with name "' + self.name + '"'
-                        if hasattr(arg, 'name') and arg.name:
-                            argument_name += ' with name "' + arg.name + '"'
-                        where = theano.gof.utils.get_variable_trace_string(
-                            self.maker.inputs[i].variable)
-                        if len(e.args) == 1:
-                            e.args = ("Bad input " + argument_name + " to " +
-                                      function_name + " at index %d (0-based). %s"
-                                      % (i, where) + e.args[0],)
-                        else:
-                            e.args = ("Bad input " + argument_name + " to " +
-                                      function_name + " at index %d (0-based). %s"
-                                      % (i, where),) + e.args
+                        self._add_bad_input_info(e, arg, i)
                         restore_defaults()
                         raise
                 s.provided += 1
@@ -877,6 +952,13 @@ class Function(object):
                         % getattr(self.inv_finder[c], 'variable',
                                   self.inv_finder[c]))
 
+        sampled = True
+        if profile and profile.sample > 1 and profile.flag_time_thunks:
+            # Only profile the thunks of 1 in profile.sample calls.
+            sampled = profile.fct_callcount % profile.sample == 0
+            self.fn.time_thunks = sampled
+            self.fn.skip_profile = not sampled
+
         # Do the actual work
         t0_fn = time.time()
         try:
@@ -885,20 +967,7 @@ class Function(object):
                 self.fn(output_subset=output_subset)
         except Exception:
             restore_defaults()
-            if hasattr(self.fn, 'position_of_error'):
-                # this is a new vm-provided function or c linker
-                # they need this because the exception manipulation
-                # done by raise_with_op is not implemented in C.
-                thunk = None
-                if hasattr(self.fn, 'thunks'):
-                    thunk = self.fn.thunks[self.fn.position_of_error]
-                gof.link.raise_with_op(
-                    node=self.fn.nodes[self.fn.position_of_error],
-                    thunk=thunk,
-                    storage_map=getattr(self.fn, 'storage_map', None))
-            else:
-                # old-style linkers raise their own exceptions
-                raise
+            self._raise_fn_error()
 
         dt_fn = time.time() - t0_fn
         self.maker.mode.fn_time += dt_fn
@@ -935,6 +1004,8 @@ class Function(object):
                     storage.data = outputs.pop()
         else:
             outputs = outputs[:self.n_returned_outputs]
+        for c in self.synced_containers:
+            c.sync()
 
         # Put default values back in the storage
         restore_defaults()
@@ -950,7 +1021,7 @@ class Function(object):
         if profile:
             profile.fct_callcount += 1
             profile.fct_call_time += dt_call
-            if hasattr(self.fn, 'update_profile'):
+            if sampled and hasattr(self.fn, 'update_profile'):
                 self.fn.update_profile(profile)
             if profile.ignore_first_call:
                 profile.reset()
@@ -977,6 +1048,194 @@ class Function(object):
             else:
                 return [outputs[i] for i in output_subset]
 
+    def call_many(self, args_iter):
+        """
+        Evaluate the function on each tuple of arguments of an iterable.
+
+        This is equivalent to ``(self(*args) for args in args_iter)``, but
+        the checks that don't depend on the values of the arguments (number
+        of arguments, missing and implicit inputs, which inputs can be
+        aliased, how to return the outputs) are done once instead of at
+        each call. This reduces the Python overhead when the function is
+        small and called many times.
+
+        The updates are applied after each call, so each call sees the
+        updates of the previous ones. If an output was compiled with
+        ``borrow=True``, its buffer is reused by the next call, as it is
+        with ``__call__``.
+
+        Parameters
+        ----------
+        args_iter : iterable
+            Iterable of tuples of positional arguments. Keyword arguments
+            and ``output_subset`` are not supported, use ``__call__`` for
+            them.
+
+        Returns
+        -------
+        generator
+            Yield the outputs of each call, as ``__call__`` returns them.
+
+        """
+        input_storage = self.input_storage
+        # Positional arguments must cover all the required inputs, and not
+        # any implicit one.
+        n_min = 0
+        n_max = len(input_storage)
+        for i, c in enumerate(input_storage):
+            if c.implicit:
+                n_max = min(n_max, i)
+            elif c.required:
+                n_min = i + 1
+
+        setters = None
+        if not self.trust_input:
+            setters = [(c.storage, c.type.filter, c.strict, c.allow_downcast)
+                       for c in input_storage[:n_max]]
+        # Only the inputs whose type can share memory need an aliasing
+        # check, and only if there are at least two of them.
+        may_alias = []
+        if (not self.trust_input and
+                getattr(self, '_check_for_aliased_inputs', True)):
+            may_alias = [(self.maker.inputs[i].variable, input_storage[i])
+                         for i in xrange(len(input_storage))
+                         if hasattr(self.maker.inputs[i].variable.type,
+                                    'may_share_memory')]
+            if len(may_alias) < 2:
+                may_alias = []
+        refeed = [(input_storage[i], value)
+                  for i, (_, is_refeed, value) in enumerate(self.defaults)
+                  if is_refeed]
+        required = [c.storage for c in input_storage if c.required]
+        clear_outputs = []
+        if getattr(self.fn, 'allow_gc', False):
+            clear_outputs = [c.storage for c, v in zip(
+                self.output_storage, self.maker.fgraph.outputs)
+                if v.owner is not None]
+        updated = []
+        need_update_inputs = getattr(self.fn, 'need_update_inputs', True)
+        if need_update_inputs:
+            updated = [storage for input, storage in
+                       reversed(list(zip(self.maker.expanded_inputs,
+                                         input_storage)))
+                       if input.update is not None]
+        n_returned_outputs = self.n_returned_outputs
+        synced_containers = self.synced_containers
+        fn = self.fn
+        output_storage = self.output_storage
+        profile = self.profile
+        mode = self.maker.mode
+
+        def restore_defaults():
+            for c, value in refeed:
+                if isinstance(value, gof.Container):
+                    value = value.storage[0]
+                c.value = value
+
+        def input_name(c):
+            return getattr(self.inv_finder[c], 'variable',
+                           self.inv_finder[c])
+
+        def bad_number_error(n_args):
+            # The error raised by __call__ for these arguments.
+            if n_args > len(input_storage):
+                return TypeError(
+                    "Too many parameter passed to theano function")
+            if n_args > n_max:
+                return TypeError(
+                    "Tried to provide value for implicit input: %s"
+                    % input_name(input_storage[n_max]))
+            missing = [c for c in input_storage[n_args:] if c.required]
+            return TypeError("Missing required input: %s" %
+                             input_name(missing[0]))
+
+        def generate():
+            for args in args_iter:
+                t0 = time.time()
+                if not n_min <= len(args) <= n_max:
+                    raise bad_number_error(len(args))
+                if setters is None:
+                    for c, arg in izip(input_storage, args):
+                        c.storage[0] = arg
+                else:
+                    for i, ((storage, filter, strict, allow_downcast),
+                            arg) in enumerate(izip(setters, args)):
+                        if arg is None:
+                            storage[0] = None
+                            continue
+                        try:
+                            storage[0] = filter(
+                                arg, strict=strict,
+                                allow_downcast=allow_downcast)
+                        except Exception as e:
+                            self._add_bad_input_info(e, arg, i)
+                            restore_defaults()
+                            raise
+                if may_alias:
+                    seen = []
+                    for var, c in may_alias:
+                        val = c.storage[0]
+                        if any(v.type is var.type and
+                               v.type.may_share_memory(w, val)
+                               for v, w in seen):
+                            c.storage[0] = copy.copy(val)
+                        else:
+                            seen.append((var, val))
+
+                sampled = True
+                if profile and profile.sample > 1 and profile.flag_time_thunks:
+                    sampled = profile.fct_callcount % profile.sample == 0
+                    fn.time_thunks = sampled
+                    fn.skip_profile = not sampled
+
+                t0_fn = time.time()
+                try:
+                    outputs = fn()
+                except Exception:
+                    restore_defaults()
+                    self._raise_fn_error()
+                dt_fn = time.time() - t0_fn
+                mode.fn_time += dt_fn
+                if profile:
+                    profile.vm_call_time += dt_fn
+
+                if outputs is None:
+                    outputs = [x.data for x in output_storage]
+                for storage in required:
+                    storage[0] = None
+                for storage in clear_outputs:
+                    storage[0] = None
+                if need_update_inputs:
+                    for storage in updated:
+                        storage.data = outputs.pop()
+                else:
+                    outputs = outputs[:n_returned_outputs]
+                for c in synced_containers:
+                    c.sync()
+                restore_defaults()
+
+                dt_call = time.time() - t0
+                theano.compile.profiling.total_fct_exec_time += dt_call
+                mode.call_time += dt_call
+                if profile:
+                    profile.fct_callcount += 1
+                    profile.fct_call_time += dt_call
+                    if sampled and hasattr(fn, 'update_profile'):
+                        fn.update_profile(profile)
+                    if profile.ignore_first_call:
+                        profile.reset()
+                        profile.ignore_first_call = False
+
+                if self.return_none:
+                    yield None
+                elif self.unpack_single and len(outputs) == 1:
+                    yield outputs[0]
+                elif self.output_keys is not None:
+                    yield dict(izip(self.output_keys, outputs))
+                else:
+                    yield outputs
+        return generate()
+
     value = property(
         lambda self: self._value,
         None,  # this property itself is not settable
@@ -1057,6 +1316,321 @@ def _constructor_Function(maker, input_storage, inputs_data):
 copyreg.pickle(Function, _pickle_Function)
 
 
+class ConcurrentFunction(object):
+    """
+    A thread-safe wrapper of a Function, see `Function.concurrent`.
+
+    Parameters
+    ----------
+    function : Function
+        The function to call.
+    max_contexts : int, optional
+        Maximum number of execution contexts.
+
+    """
+
+    def __init__(self, function, max_contexts=None):
+        if max_contexts is not None and max_contexts < 1:
+            raise ValueError("max_contexts must be at least 1",
+                             max_contexts)
+        self.function = function
+        self.max_contexts = max_contexts
+        self.n_contexts = 0
+        self.free_contexts = []
+        self._cond = threading.Condition()
+
+    def make_context(self):
+        """
+        Return a new Function with the same optimized graph and shared
+        variables as `self.function`, but with its own storage.
+
+        """
+        function = self.function
+        input_storage = []
+        for i, container in zip(function.maker.inputs,
+                                function.input_storage):
+            if i.shared:
+                input_storage.append(container)
+            else:
+                input_storage.append(i.value)
+        context = function.maker.create(input_storage, trustme=True)
+        context.trust_input = function.trust_input
+        context.name = function.name
+        return context
+
+    def acquire(self):
+        """
+        Return a free execution context, making a new one if allowed.
+
+        """
+        with self._cond:
+            while not self.free_contexts:
+                if (self.max_contexts is None or
+                        self.n_contexts < self.max_contexts):
+                    self.n_contexts += 1
+                    break
+                self._cond.wait()
+            else:
+                return self.free_contexts.pop()
+        try:
+            return self.make_context()
+        except Exception:
+            with self._cond:
+                self.n_contexts -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, context):
+        """
+        Put back an execution context returned by `acquire` in the pool.
+
+        """
+        with self._cond:
+            self.free_contexts.append(context)
+            self._cond.notify()
+
+    def __call__(self, *args, **kwargs):
+        context = self.acquire()
+        try:
+            return context(*args, **kwargs)
+        finally:
+            self.release(context)
+
+    def call_many(self, args_iter):
+        """
+        Like `Function.call_many`, using a single execution context for all
+        the calls.
+
+        """
+        context = self.acquire()
+        try:
+            for outputs in context.call_many(args_iter):
+                yield outputs
+        finally:
+            self.release(context)
+
+
+class TieredFunction(object):
+    """
+    A function that is first run in a cheap mode while it is compiled with
+    the requested mode in a background thread, see config.compile.tiered.
+
+    The attributes and items of the function in use, e.g. `maker` or
+    `input_storage`, are available on this object. The attributes and
+    items set on this object, e.g. `trust_input` or the default values of
+    the inputs, are also set on the optimized function once it is ready.
+
+    Parameters
+    ----------
+    make_function
+        Callable taking a mode, and optionally a profile, and returning the
+        compiled Function.
+    mode : Mode
+        The mode of the optimized function.
+    cheap_mode : Mode
+        The mode of the function used until the optimized one is ready.
+
+    Attributes
+    ----------
+    function : Function
+        The function used by the calls. It is replaced by the optimized
+        function once it is ready.
+    optimized : bool
+        True if `function` is the optimized function.
+
+    """
+
+    # The attributes of this object, the other ones are those of `function`.
+    _own_attributes = ('function', 'optimized', 'error', '_ready', '_lock',
+                       '_settings')
+
+    def __init__(self, make_function, mode, cheap_mode):
+        self.function = make_function(cheap_mode, profile=None)
+        self.optimized = False
+        self.error = None
+        self._ready = threading.Event()
+        # Guards the settings, (setter, key, value) tuples applied to the
+        # cheap function that must be applied to the optimized one.
+        self._lock = threading.Lock()
+        self._settings = []
+
+        def compile_optimized():
+            try:
+                t0 = time.time()
+                function = make_function(mode)
+                if function.profile:
+                    function.profile.compile_time += time.time() - t0
+                    function.profile.nb_nodes = len(
+                        function.maker.fgraph.apply_nodes)
+                function.trust_input = self.function.trust_input
+                with self._lock:
+                    for setter, key, value in self._settings:
+                        setter(function, key, value)
+                    # Assigning an attribute is atomic, so a call uses
+                    # either the cheap or the optimized function.
+                    self.function = function
+                    self.optimized = True
+                    self._settings = []
+            except Exception as e:
+                self.error = e
+                _logger.warning("The compilation of the optimized version "
+                                "of %s failed, the FAST_COMPILE version "
+                                "will be used: %s", self.function.name, e)
+            finally:
+                self._ready.set()
+        thread = threading.Thread(target=compile_optimized,
+                                  name='theano tiered compilation')
+        thread.daemon = True
+        thread.start()
+
+    def wait(self, timeout=None):
+        """
+        Wait for the optimized function and return it.
+
+        Raise the exception raised by its compilation, if any.
+
+        """
+        if not self._ready.wait(timeout):
+            raise RuntimeError("The optimized function is not ready yet.")
+        if self.error is not None:
+            raise self.error
+        return self.function
+
+    def _set(self, setter, key, value):
+        with self._lock:
+            setter(self.function, key, value)
+            if not self.optimized:
+                self._settings.append((setter, key, value))
+
+    def __call__(self, *args, **kwargs):
+        return self.function(*args, **kwargs)
+
+    def __getattr__(self, attr):
+        if attr in self._own_attributes:
+            raise AttributeError(attr)
+        return getattr(self.function, attr)
+
+    def __setattr__(self, attr, value):
+        if attr in self._own_attributes:
+            object.__setattr__(self, attr, value)
+        else:
+            self._set(setattr, attr, value)
+
+    def __getitem__(self, item):
+        return self.function[item]
+
+    def __setitem__(self, item, value):
+        self._set(operator.setitem, item, value)
+
+    def __reduce__(self):
+        return (_constructor_wrapped_function, (self.wait(), ))
+
+
+def _constructor_wrapped_function(function):
+    # A TieredFunction or ShapeSpecializedFunction is unpickled as the
+    # Function it wraps.
+    return function
+
+
+class ShapeSpecializedFunction(object):
+    """
+    A function that compiles a version specialized to the shapes of its
+    inputs when it is often called with the same shapes, see
+    config.compile.shape_specialize.
+
+    The specialized versions are compiled with the shapes of the inputs
+    given by SpecifyShape, so the optimizer sees them as constants. The
+    calls whose input shapes have a specialized version use it, the
+    other ones use the generic function. The attributes of the generic
+    function, e.g. `maker` or `input_storage`, are available on this
+    object.
+
+    Parameters
+    ----------
+    function : Function
+        The generic function.
+    specialize
+        Callable taking a list of the shapes of the inputs, None for the
+        inputs that don't have a shape, and returning the Function
+        specialized to these shapes.
+    n_calls : int
+        Number of calls with the same input shapes after which a
+        specialized version is compiled.
+    cache_size : int
+        Maximum number of specialized versions. The least recently used
+        one is dropped to make room for a new one.
+
+    """
+
+    def __init__(self, function, specialize, n_calls, cache_size):
+        self.function = function
+        self.specialize = specialize
+        self.n_calls = n_calls
+        self.cache_size = cache_size
+        # Maps the shapes of the inputs to the specialized functions, in
+        # order of last use.
+        self.specialized = OrderedDict()
+        # Number of calls for the shapes that are not specialized yet.
+        self.counts = {}
+        # The shapes whose specialized version is being compiled.
+        self.compiling = set()
+        # Guards the attributes above, as the function may be called from
+        # several threads.
+        self._lock = threading.Lock()
+
+    def get_function(self, args):
+        """
+        Return the function to call with the positional arguments `args`.
+
+        The generic function is returned while the specialized version is
+        being compiled, which is done by the first thread asking for it.
+
+        """
+        shapes = tuple(getattr(arg, 'shape', None) for arg in args)
+        with self._lock:
+            fn = self.specialized.pop(shapes, None)
+            if fn is not None:
+                self.specialized[shapes] = fn
+                return fn
+            if shapes in self.compiling:
+                return self.function
+            count = self.counts.get(shapes, 0) + 1
+            if (count < self.n_calls or self.cache_size <= 0 or
+                    all(shape is None for shape in shapes)):
+                if len(self.counts) > 100 * max(self.cache_size, 1):
+                    # Don't keep counts forever for shapes seen a few times.
+                    self.counts.clear()
+                self.counts[shapes] = count
+                return self.function
+            self.counts.pop(shapes, None)
+            self.compiling.add(shapes)
+        try:
+            fn = self.specialize(shapes)
+            fn.trust_input = self.function.trust_input
+        finally:
+            with self._lock:
+                self.compiling.discard(shapes)
+        with self._lock:
+            if len(self.specialized) >= self.cache_size:
+                self.specialized.popitem(last=False)
+            self.specialized[shapes] = fn
+        return fn
+
+    def __call__(self, *args, **kwargs):
+        if kwargs:
+            return self.function(*args, **kwargs)
+        return self.get_function(args)(*args)
+
+    def __getattr__(self, attr):
+        if attr == 'function':
+            raise AttributeError(attr)
+        return getattr(self.function, attr)
+
+    def __reduce__(self):
+        # Only the generic function is pickled.
+        return (_constructor_wrapped_function, (self.function, ))
+
+
 ###
 # FunctionMaker
 ###
@@ -1145,6 +1719,35 @@ def insert_deepcopy(fgraph, wrapped_inputs, wrapped_outputs):
                                             reason="insert_deepcopy")
                         break
 
+
+def prune_optimization_cache(cache_dir, max_size):
+    """
+    Remove the least recently used graphs of the optimization cache until
+    the total size of the files in `cache_dir` is at most `max_size` bytes.
+
+    """
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith('.pkl'):
+            continue
+        path = os.path.join(cache_dir, name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            # Removed by another process.
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_size:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total -= size
+
+
 NODEFAULT = ['NODEFAULT']
 
 
@@ -1222,170 +1825,119 @@ class FunctionMaker(object):
             raise TypeError("Unknown output type: %s (%s)", type(output),
                             output)
 
-    def optimize_graph_with_cache(self, optimizer, inputs, outputs):
-        # This function is not finished
-        from theano.gof.compilelock import get_lock, release_lock
-        import os.path
-
-        graph_db_file = os.path.join(theano.config.compiledir,
-                                     'optimized_graphs.pkl')
-
-        # the inputs, outputs, and size of the graph to be optimized
-        inputs_new = [inp.variable for inp in inputs]
-        outputs_new = [out.variable for out in outputs]
-        size_new = len(self.fgraph.apply_nodes)
-        get_lock()
-        # Beginning of cache optimizations.
-        # Could be refactored in different functions.
-
-        def load_graph_db():
-            if os.path.isfile(graph_db_file):
-                print('graph_db already exists')
-            else:
-                # create graph_db
-                with open(graph_db_file, 'wb') as f:
-                    print('create new graph_db in %s' % graph_db_file)
-            # load the graph_db dictionary
+    def optimize_graph_with_cache(self, optimizer, inputs, outputs, mode):
+        """
+        Optimize self.fgraph, reusing the graph optimized by a previous
+        compilation of the same graph if the optimization cache has it.
+
+        The cache is the `optimized_graphs` directory of the compiledir. It
+        holds one file per graph, named after a hash of the structure of the
+        graph before optimization, of the optimizer of `mode`, of the Theano
+        flags and of the inputs that may be destroyed. A file stores the
+        graph before optimization, used to rule out hash collisions, and the
+        optimized FunctionGraph. The containers of the shared variables are
+        not stored: the ones of self.fgraph are used instead.
+
+        The least recently used files are removed when the cache is bigger
+        than config.cache_optimizations_max_size megabytes.
+
+        Returns
+        -------
+        The profile of the optimizer, or None if the optimized graph was
+        found in the cache.
+
+        """
+        if not isinstance(mode.provided_optimizer, gof.Query):
+            # Only optimizers defined by a query of optdb can be
+            # identified across processes.
+            return optimizer(self.fgraph)
+
+        fgraph = self.fgraph
+        key = '\n'.join([
+            theano.__version__,
+            str(mode.provided_optimizer),
+            theano.configparser.get_config_md5(in_c_key_only=False),
+            graph.structural_hash(fgraph.inputs, fgraph.outputs),
+            str([i.mutable for i in inputs]),
+            str(sorted(fgraph.update_mapping.items()))])
+        cache_dir = os.path.join(config.compiledir, 'optimized_graphs')
+        filename = os.path.join(cache_dir,
+                                '%s.pkl' % gof.utils.hash_from_code(key))
+
+        if os.path.isfile(filename):
             try:
-                with open(graph_db_file, 'rb') as f:
-                    # Temporary hack to allow
-                    # theano.scan_module.tests.test_scan.T_Scan to
-                    # finish. Should be changed in definitive version.
-                    tmp = theano.config.unpickle_function
-                    theano.config.unpickle_function = False
-                    graph_db = pickle.load(f)
-                print('graph_db loaded and it is not empty')
-            except EOFError as e:
-                # the file has nothing in it
-                print(e)
-                print('graph_db loaded and it is empty')
-                graph_db = {}
-            finally:
-                theano.config.unpickle_function = tmp
-
-            return graph_db
-
-        def find_same_graph_in_db(graph_db):
-            # If found_graph_in_db is None, then need to optimize.
-            # Otherwise, return the graph found.
-            found_graph_in_db = None
-            # The sole purpose of this loop is to set 'need_optimize' by
-            # going through graph_db, looking for graph that has the same
-            # computation performed.
-            for graph_old, graph_optimized in iteritems(graph_db):
-                inputs_old = graph_old.inputs
-                outputs_old = graph_old.outputs
-                size_old = len(graph_old.apply_nodes)
-                # Some heuristics to check is the same graphs have
-                # already been optimized before.
-                if len(inputs_new) != len(inputs_old):
-                    # If the inputs are of different size,
-                    # two graphs are for sure different
-                    print('need to optimize, because input size is different')
-                    continue
-                elif len(outputs_new) != len(outputs_old):
-                    # If the inputs are of different size,
-                    # two graphs are for sure different
-                    print('need to optimize, because output size is different')
-                    continue
-                elif not all(input_new.type == input_old.type
-                             for input_new, input_old in
-                             zip(inputs_new, inputs_old)):
-                    print('need to optimize, because inputs are of different '
-                          'types')
-                    continue
-                elif not all(output_new.type == output_old.type
-                             for output_new, output_old in
-                             zip(outputs_new, outputs_old)):
-                    print('need to optimize, because outputs are of different '
-                          'types')
-                    continue
-                elif not size_old == size_new:
-                    print('need to optimize, because numbers of nodes in graph'
-                          ' are different')
-                    continue
-                else:
-                    flags = []
-                    for i, (output_new, output_old) in enumerate(
-                            zip(outputs_new, outputs_old)):
-                        print('loop through outputs node for both graphs')
-                        graph_old.variables = set(gof.graph.variables(
-                            graph_old.inputs, graph_old.outputs))
-
-                        # using clone allowed to avoid a lot of errors
-                        # deep copy seemed to had.
-                        f2 = graph_old.clone(check_integrity=False)
-                        t1 = output_new
-                        t2 = f2.outputs[i]
-
-                        # Used to remove "already used by another graph error
-                        def removeAllFgraph(remove):
-                            if hasattr(remove, 'fgraph'):
-                                del remove.fgraph
-                            if hasattr(remove, 'owner'):
-                                if remove.owner is None:
-                                    pass
-                                else:
-                                    if hasattr(remove.owner, 'fgraph'):
-                                        del remove.owner.fgraph
-                                    if hasattr(remove.owner, 'inputs'):
-                                        remove.owner.inputs = [removeAllFgraph(
-                                            i) for i in remove.owner.inputs]
-                                        for o in remove.owner.outputs:
-                                            if hasattr(o, 'fgraph'):
-                                                del o.fgraph
-                            return remove
-
-                        t2 = removeAllFgraph(t2)
-
-                        givens = dict(izip(gof.graph.inputs([t1]),
-                                           gof.graph.inputs([t2])))
-
-                        temp = dict(izip(gof.graph.inputs([t1]),
-                                         gof.graph.inputs([t2])))
-
-                        # hack to remove inconstent entry in givens
-                        # seems to work that but source of inconsistency
-                        # could be worth investigating.
-                        for key, value in iteritems(temp):
-                            if key.type != value.type:
-                                del givens[key]
-
-                        flag = is_same_graph(t1, t2, givens=givens)
-
-                        flags.append(flag)
-
-                    is_same = all(flags)
-                    if is_same:
-                        # found the match
-                        print('found a match, no need to optimize')
-                        found_graph_in_db = graph_optimized
-                        break
-            return found_graph_in_db
-
-        graph_db = load_graph_db()
-        print('loaded graph_db from %s, size=%d' % (graph_db_file,
-                                                    len(graph_db)))
-        found_graph = find_same_graph_in_db(graph_db)
-        if found_graph:
-            self.fgraph = found_graph
-            optimizer_profile = None
-        else:
-            # this is a brand new graph, optimize it, save it to graph_db
-            print('graph not found in graph_db, optimizing the graph')
-            self.fgraph.variables = set(gof.graph.variables(
-                self.fgraph.inputs, self.fgraph.outputs))
-            # check_integrity parameters was added to ignore
-            # "excess cached variables" errors. Works that way
-            # but once again the error couldbe worth
-            # investigating.
-            before_opt = self.fgraph.clone(check_integrity=False)
-            optimizer_profile = optimizer(self.fgraph)
-            graph_db.update({before_opt: self.fgraph})
-            with open(graph_db_file, 'wb') as f:
-                pickle.dump(graph_db, f, -1)
-            print('new graph saved into graph_db')
-        release_lock()
+                with open(filename, 'rb') as f:
+                    unpickler = pickle.Unpickler(f)
+                    unpickler.persistent_load = (
+                        lambda pid: getattr(fgraph.inputs[pid], 'container',
+                                            None))
+                    with theano.configparser.change_flags(
+                            unpickle_function=False):
+                        before_inputs, before_outputs, opt_fgraph = \
+                            unpickler.load()
+            except Exception:
+                _logger.warning('Cannot load optimized graph from %s',
+                                filename, exc_info=True)
+            else:
+                # Guard against hash collisions.
+                if (len(before_inputs) == len(fgraph.inputs) and
+                        len(before_outputs) == len(fgraph.outputs) and
+                        theano.scan_module.scan_utils.equal_computations(
+                            before_outputs, fgraph.outputs,
+                            before_inputs, fgraph.inputs)):
+                    _logger.debug('Optimized graph loaded from %s', filename)
+                    opt_fgraph.profile = fgraph.profile
+                    self.fgraph = opt_fgraph
+                    try:
+                        # The modification time orders the files for the
+                        # eviction of the least recently used ones.
+                        os.utime(filename, None)
+                    except OSError:
+                        pass
+                    return None
+
+        # Keep the graph before optimization, without the values of the
+        # shared variables.
+        before_inputs = [i.type() for i in fgraph.inputs]
+        equiv = graph.clone_get_equiv(
+            fgraph.inputs, fgraph.outputs,
+            memo=dict(izip(fgraph.inputs, before_inputs)))
+        before_outputs = [equiv[o] for o in fgraph.outputs]
+
+        optimizer_profile = optimizer(fgraph)
+
+        containers = dict((id(i.container), pos)
+                          for pos, i in enumerate(fgraph.inputs)
+                          if getattr(i, 'container', None) is not None)
+        profile = fgraph.profile
+        fgraph.profile = None
+        tmp_file = None
+        try:
+            if not os.path.isdir(cache_dir):
+                try:
+                    os.makedirs(cache_dir)
+                except OSError:
+                    # Another process may have created it.
+                    assert os.path.isdir(cache_dir)
+            fd, tmp_file = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                pickler = pickle.Pickler(f, protocol=pickle.HIGHEST_PROTOCOL)
+                pickler.persistent_id = lambda obj: containers.get(id(obj))
+                pickler.dump((before_inputs, before_outputs, fgraph))
+            # The rename is atomic, so that concurrent processes never
+            # load a partially written graph.
+            os.rename(tmp_file, filename)
+            tmp_file = None
+            _logger.debug('Optimized graph saved in %s', filename)
+        except Exception:
+            _logger.warning('Cannot save optimized graph in %s', filename,
+                            exc_info=True)
+        finally:
+            fgraph.profile = profile
+            if tmp_file is not None and os.path.exists(tmp_file):
+                os.remove(tmp_file)
+        prune_optimization_cache(cache_dir,
+                                 config.cache_optimizations_max_size * 2 ** 20)
         return optimizer_profile
 
     def __init__(self, inputs, outputs,
@@ -1456,20 +2008,20 @@ class FunctionMaker(object):
         # Fetch the optimizer and linker
         optimizer, linker = mode.optimizer, copy.copy(mode.linker)
         if need_opt:
-            compute_test_value_orig = theano.config.compute_test_value
-            limit_orig = theano.config.traceback.limit
             # Why we add stack on node when it get done in output var?
-            try:
+            # The flags are only changed in this thread, the compilation can
+            # run in the background, see config.compile.tiered.
+            with theano.configparser.thread_local_flags(**{
+                    'compute_test_value': config.compute_test_value_opt,
+                    'traceback.limit': config.traceback.compile_limit}):
                 # optimize the fgraph
-                theano.config.compute_test_value = \
-                    theano.config.compute_test_value_opt
-                theano.config.traceback.limit = theano.config.traceback.compile_limit
                 start_optimizer = time.time()
 
                 # now optimize the graph
                 if theano.config.cache_optimizations:
                     optimizer_profile = self.optimize_graph_with_cache(
-                        optimizer, inputs, outputs)
+                        optimizer, inputs, outputs, mode)
+                    fgraph = self.fgraph
                 else:
                     optimizer_profile = optimizer(fgraph)
 
@@ -1489,9 +2041,6 @@ class FunctionMaker(object):
 
                 # Add deep copy to respect the memory interface
                 insert_deepcopy(fgraph, inputs, outputs + additional_outputs)
-            finally:
-                theano.config.compute_test_value = compute_test_value_orig
-                theano.config.traceback.limit = limit_orig
 
         # initialize the linker
         if not hasattr(linker, 'accept'):
@@ -1654,13 +2203,11 @@ class FunctionMaker(object):
         # Get a function instance
         start_linker = time.time()
         start_import_time = theano.gof.cmodule.import_time
-        limit_orig = theano.config.traceback.limit
-        try:
-            theano.config.traceback.limit = theano.config.traceback.compile_limit
+        start_lock_wait_time = theano.gof.compilelock.lock_wait_time
+        with theano.configparser.thread_local_flags(**{
+                'traceback.limit': config.traceback.compile_limit}):
             _fn, _i, _o = self.linker.make_thunk(
                 input_storage=input_storage_lists, storage_map=storage_map)
-        finally:
-            theano.config.traceback.limit = limit_orig
 
         end_linker = time.time()
 
@@ -1670,8 +2217,13 @@ class FunctionMaker(object):
         if self.profile:
             self.profile.linker_time += linker_time
             _fn.time_thunks = self.profile.flag_time_thunks
+            if (getattr(self.profile, 'timeline', None) is not None and
+                    hasattr(_fn, 'timeline')):
+                _fn.timeline = []
             import_time = theano.gof.cmodule.import_time - start_import_time
             self.profile.import_time += import_time
+            self.profile.lock_wait_time += (
+                theano.gof.compilelock.lock_wait_time - start_lock_wait_time)
 
         fn = self.function_builder(_fn, _i, _o, self.indices, self.outputs,
                                    defaults, self.unpack_single,
@@ -1785,22 +2337,78 @@ def orig_function(inputs, outputs, mode=None, accept_inplace=False,
         raise Exception("We do not support the passing of multiple modes")
     else:
         Maker = getattr(mode, 'function_maker', FunctionMaker)
-        fn = Maker(inputs,
-                   outputs,
-                   mode,
-                   accept_inplace=accept_inplace,
-                   profile=profile,
-                   on_unused_input=on_unused_input,
-                   output_keys=output_keys).create(
-            defaults)
+
+        cheap_mode = theano.compile.mode.get_mode('FAST_COMPILE')
+
+        def make_function(mode, inputs=inputs, outputs=outputs,
+                          profile=profile):
+            fn = Maker(inputs,
+                       outputs,
+                       mode,
+                       accept_inplace=accept_inplace,
+                       profile=profile,
+                       on_unused_input=on_unused_input,
+                       output_keys=output_keys).create(
+                defaults)
+            fn.name = name
+            fn.maker.fgraph.name = name
+            return fn
+
+        def specialize(shapes):
+            # Compile the graph with the shapes of the inputs given as
+            # constants.
+            replace = {}
+            for i, shape in zip(inputs, shapes):
+                if (shape is not None and not i.implicit and
+                        getattr(i.variable.type, 'ndim', None) == len(shape)):
+                    replace[i.variable] = theano.compile.ops.specify_shape(
+                        i.variable, shape)
+            if outputs is None:
+                outs = []
+            elif isinstance(outputs, (list, tuple)):
+                outs = list(outputs)
+            else:
+                outs = [outputs]
+            ins_updated = [i for i in inputs if i.update is not None]
+            new_vars = theano.clone(
+                [o.variable for o in outs] +
+                [i.update for i in ins_updated], replace=replace)
+            new_outs = []
+            for o, v in zip(outs, new_vars):
+                o = copy.copy(o)
+                o.variable = v
+                new_outs.append(o)
+            new_ins = list(inputs)
+            for i, v in zip(ins_updated, new_vars[len(outs):]):
+                new_i = copy.copy(i)
+                new_i.update = v
+                new_ins[inputs.index(i)] = new_i
+            if outputs is not None and not isinstance(outputs, (list, tuple)):
+                new_outs = new_outs[0]
+            return make_function(mode, new_ins, new_outs)
+
+        if (config.compile.tiered and Maker is FunctionMaker and
+                mode is not cheap_mode):
+            if config.compile.shape_specialize:
+                raise ValueError(
+                    "config.compile.tiered and "
+                    "config.compile.shape_specialize can't be used together.")
+            fn = TieredFunction(make_function, mode, cheap_mode)
+        elif config.compile.shape_specialize and Maker is FunctionMaker:
+            fn = ShapeSpecializedFunction(
+                make_function(mode), specialize,
+                config.compile.shape_specialize,
+                config.compile.shape_specialize_cache_size)
+        else:
+            fn = make_function(mode)
 
     t2 = time.time()
     if profile:
         profile.compile_time += t2 - t1
-        profile.nb_nodes = len(fn.maker.fgraph.apply_nodes)
+        # The optimized function of a TieredFunction sets it when ready.
+        if not isinstance(fn, TieredFunction):
+            profile.nb_nodes = len(fn.maker.fgraph.apply_nodes)
 
-    fn.name = name
-    fn.maker.fgraph.name = name
     return fn
 
 
@@ -221,6 +221,128 @@ f_gpua_min = f_compute(T.min)
 f_gpua_max = f_compute(T.max)
 f_gpua_absmax = f_compute(lambda x: T.max(T.abs_(x)))
 
+NAN = 1
+INF = 2
+BIG = 4
+
+
+class CheckValues(theano.gof.OpenMPOp):
+    """
+    Check in a single pass if a tensor contains NaNs, Infs or big values
+    (absolute value greater than 1e10).
+
+    The output is an int8 scalar, the bitwise or of `NAN`, `INF` and `BIG`
+    for the kinds of values found. An Inf is also a big value.
+
+    """
+    __props__ = ('openmp',)
+
+    def make_node(self, x):
+        x = T.as_tensor_variable(x)
+        return theano.Apply(self, [x], [T.TensorType('int8', ())()])
+
+    def perform(self, node, inputs, output_storage):
+        x, = inputs
+        flags = 0
+        if x.size:
+            if np.isnan(np.min(x)):
+                flags |= NAN
+            if np.isinf(np.nanmax(x)) or np.isinf(np.nanmin(x)):
+                flags |= INF
+            if np.nanmax(np.abs(x)) > 1e10:
+                flags |= BIG
+        output_storage[0][0] = np.asarray(flags, dtype='int8')
+
+    def c_headers(self):
+        return ['<math.h>'] + super(CheckValues, self).c_headers()
+
+    def c_code(self, node, name, inputs, outputs, sub):
+        if node.inputs[0].dtype == 'float16':
+            # A cast of npy_half to double would convert its raw bits.
+            raise theano.gof.utils.MethodNotDefined(
+                "no c_code for float16")
+        x, = inputs
+        z, = outputs
+        fail = sub['fail']
+        omp = ''
+        if self.openmp:
+            omp = ('#pragma omp parallel for reduction(|:flags) '
+                   'if (n >= %d)' % config.openmp_elemwise_minsize)
+        return """
+        int flags = 0;
+        npy_intp n = PyArray_SIZE(%(x)s);
+        if (PyArray_IS_C_CONTIGUOUS(%(x)s)) {
+            const dtype_%(x)s * data = (dtype_%(x)s *)PyArray_DATA(%(x)s);
+            %(omp)s
+            for (npy_intp i = 0; i < n; ++i) {
+                double v = (double)data[i];
+                if (v != v) {
+                    flags |= %(NAN)s;
+                } else if (fabs(v) > 1e10) {
+                    flags |= isinf(v) ? %(INF)s | %(BIG)s : %(BIG)s;
+                }
+            }
+        } else {
+            PyArrayIterObject * it = (PyArrayIterObject *)PyArray_IterNew(
+                (PyObject *)%(x)s);
+            if (!it) {
+                %(fail)s;
+            }
+            while (it->index < it->size) {
+                double v = (double)*(dtype_%(x)s *)it->dataptr;
+                if (v != v) {
+                    flags |= %(NAN)s;
+                } else if (fabs(v) > 1e10) {
+                    flags |= isinf(v) ? %(INF)s | %(BIG)s : %(BIG)s;
+                }
+                PyArray_ITER_NEXT(it);
+            }
+            Py_DECREF(it);
+        }
+        if (!%(z)s) {
+            %(z)s = (PyArrayObject *)PyArray_EMPTY(0, NULL, NPY_INT8, 0);
+            if (!%(z)s) {
+                %(fail)s;
+            }
+        }
+        *(npy_int8 *)PyArray_DATA(%(z)s) = flags;
+        """ % dict(x=x, z=z, fail=fail, omp=omp, NAN=NAN, INF=INF, BIG=BIG)
+
+    def c_code_cache_version(self):
+        return (1, config.openmp_elemwise_minsize)
+
+
+def check_values(arr):
+    """
+    Return the bitwise or of `NAN`, `INF` and `BIG` for the kinds of values
+    found in the numpy.ndarray `arr`, making a single pass over it.
+
+    Returns None if `arr` can't be checked this way (it is not a real or
+    integer ndarray, it is a float16 one, or there is no C compiler). The
+    checking functions are compiled on the first call for each dtype and
+    number of dimensions.
+
+    """
+    if (not isinstance(arr, np.ndarray) or arr.dtype.kind not in 'fiu' or
+            arr.dtype == 'float16' or not config.cxx):
+        return None
+    key = (str(arr.dtype), arr.ndim)
+    f = check_values.cache.get(key)
+    if f is None:
+        x = T.TensorType(key[0], (False,) * arr.ndim)()
+        f = theano.function([x], CheckValues()(x),
+                            mode=Mode(linker='c', optimizer=None),
+                            profile=False)
+        f.trust_input = True
+        check_values.cache[key] = f
+    f.input_storage[0].storage[0] = arr
+    try:
+        f.fn()
+    finally:
+        f.input_storage[0].storage[0] = None
+    return int(f.output_storage[0].storage[0])
+check_values.cache = {}
+
 
 class NanGuardMode(Mode):
     """
@@ -238,6 +360,11 @@ class NanGuardMode(Mode):
     big_is_error : bool
         If True, raise an error when a value greater than 1e10 is encountered.
 
+    The outputs that are real or integer numpy.ndarray are checked for the
+    three conditions at once by compiled C code, see `check_values`. With
+    the Theano flag NanGuardMode.sample=N, the outputs of each node are only
+    checked at one of every N executions of the node.
+
     Note
     ----
         We ignore the linker parameter
@@ -256,6 +383,10 @@ class NanGuardMode(Mode):
 
         assert nan_is_error or inf_is_error or big_is_error
 
+        sample = config.NanGuardMode.sample
+        # Number of times each node was run, for the sampling.
+        node_counts = collections.defaultdict(int)
+
         if cuda.cuda_enabled:
             compile_gpu_func(nan_is_error, inf_is_error, big_is_error)
 
@@ -278,15 +409,26 @@ class NanGuardMode(Mode):
             """
             error = False
             sio = StringIO()
-            if nan_is_error:
+            flags = check_values(value)
+            if flags is not None:
+                if nan_is_error and flags & NAN:
+                    print('NaN detected', file=sio)
+                    error = True
+                if inf_is_error and flags & INF:
+                    print('Inf detected', file=sio)
+                    error = True
+                if big_is_error and flags & BIG:
+                    print('Big value detected', file=sio)
+                    error = True
+            elif nan_is_error:
                 if contains_nan(value, nd, var):
                     print('NaN detected', file=sio)
                     error = True
-            if inf_is_error:
+            if flags is None and inf_is_error:
                 if contains_inf(value, nd, var):
                     print('Inf detected', file=sio)
                     error = True
-            if big_is_error:
+            if flags is None and big_is_error:
                 err = False
                 if isinstance(value, theano.gof.type._cdata_type):
                     err = False
@@ -330,6 +472,10 @@ class NanGuardMode(Mode):
                     logger.error(msg)
 
         def nan_check(node, thunk, storage_map, compute_map):
+            if sample > 1:
+                node_counts[node] += 1
+                if node_counts[node] % sample != 1:
+                    return
             for var in node.outputs:
                 if getattr(var.tag, 'nan_guard_mode_check', True):
                     do_check_on(storage_map[var][0], node)
@@ -186,6 +186,9 @@ def rebuild_collect_shared(outputs,
             raise ValueError('this shared variable already has an update '
                              'expression',
                              (store_into, update_d[store_into]))
+        if store_into.container.readonly:
+            raise ValueError('this shared variable is read-only and can not '
+                             'be updated', store_into)
 
         # filter_variable ensure smooth conversion of cpu/gpu Types
         try:
@@ -467,13 +470,23 @@ def pfunc(params, outputs=None, mode=None, updates=None, givens=None,
         if i.update:
             i.update = clone_d[i.update]
 
+    # Shared variables whose values are views of the same memory, like the
+    # ones of a SharedGroup, must not be updated inplace when another one
+    # is used, as it would change its value while it is read.
+    n_aliases = {}
+    for sv in shared_inputs:
+        root = id(getattr(sv.container, 'memory_root', sv.container))
+        n_aliases[root] = n_aliases.get(root, 0) + 1
+
     for sv in shared_inputs:
         # pass value of None
         # value will be stored in the resulting functions' defaults
         # list but since the value of shared variables never needs to
         # be refed, it is not needed
         if sv in update_d:
-            si = In(variable=sv, value=sv.container, mutable=True,
+            root = id(getattr(sv.container, 'memory_root', sv.container))
+            si = In(variable=sv, value=sv.container,
+                    mutable=n_aliases[root] == 1,
                     borrow=True, update=update_d[sv], shared=True)
         else:
             si = In(variable=sv, value=sv.container,
@@ -21,8 +21,10 @@ __docformat__ = "restructuredtext en"
 
 import atexit
 import copy
+import json
 import operator
 import os
+import struct
 import sys
 import time
 from collections import defaultdict
@@ -30,7 +32,7 @@ from collections import defaultdict
 import numpy as np
 
 import theano
-from six import iteritems
+from six import iteritems, string_types
 from theano.gof import graph
 
 logger = logging.getLogger('theano.compile.profiling')
@@ -82,6 +84,7 @@ def _atexit_print_fn():
                 for attr in ["compile_time", "fct_call_time", "fct_callcount",
                              "vm_call_time", "optimizer_time", "linker_time",
                              "validate_time", "import_time",
+                             "lock_wait_time",
                              "linker_node_make_thunks"]:
                     setattr(cum, attr, getattr(cum, attr) + getattr(ps, attr))
 
@@ -170,6 +173,8 @@ class ProfileStats(object):
         self.vm_call_time = 0.
         self.apply_time = {}
         self.apply_callcount = {}
+        if self.timeline is not None:
+            self.timeline = []
         # self.apply_cimpl = None
         # self.messge = None
     #
@@ -234,6 +239,9 @@ class ProfileStats(object):
     import_time = 0.0
     # time spent in importing compiled python module.
 
+    lock_wait_time = 0.0
+    # time spent waiting for compilation locks while linking.
+
     linker_node_make_thunks = 0.0
 
     linker_make_thunk_time = {}
@@ -248,6 +256,14 @@ class ProfileStats(object):
     optimizer_profile = None
     # None or tuple (the optimizer, the profile it returned)
 
+    sample = 1
+    # Only 1 in `sample` calls have their thunks timed. The times and call
+    # counts of the Apply nodes are scaled by `sample`.
+
+    timeline = None
+    # None, or list with one element per timed call: the list of the
+    # (node, start, end, thread id) of the thunks run by the call.
+
     # param is called flag_time_thunks because most other attributes with time
     # in the name are times *of* something, rather than configuration flags.
     def __init__(self, atexit_print=True, flag_time_thunks=None, **kwargs):
@@ -284,6 +300,9 @@ class ProfileStats(object):
             self.flag_time_thunks = config.profiling.time_thunks
         else:
             self.flag_time_thunks = flag_time_thunks
+        self.sample = config.profiling.sample
+        if config.profiling.timeline:
+            self.timeline = []
         self.__dict__.update(kwargs)
         if atexit_print:
             global _atexit_print_list
@@ -715,6 +734,9 @@ class ProfileStats(object):
                 print('  Time in thunks: %es (%.3f%%)' %
                       (local_time, 100 * local_time / self.fct_call_time),
                       file=file)
+                if self.sample > 1:
+                    print('    (estimated from 1 in %d calls)' % self.sample,
+                          file=file)
         print('  Total compile time: %es' % self.compile_time, file=file)
         print('    Number of Apply nodes: %d' % self.nb_nodes, file=file)
         print('    Theano Optimizer time: %es' % self.optimizer_time,
@@ -724,6 +746,7 @@ class ProfileStats(object):
         print('    Theano Linker time (includes C, CUDA code '
               'generation/compiling): %es' % self.linker_time, file=file)
         print('       Import time %es' % self.import_time, file=file)
+        print('       Lock wait time %es' % self.lock_wait_time, file=file)
         print('       Node make_thunk time %es' % self.linker_node_make_thunks,
               file=file)
 
@@ -1318,6 +1341,109 @@ class ProfileStats(object):
                                                     self.optimizer_profile[1])
         self.print_tips(file)
 
+    def timeline_sizes(self):
+        """
+        Return a dict mapping the nodes to the total size in bytes of their
+        outputs, from the shapes recorded by the memory profiler.
+
+        """
+        sizes = {}
+        for node in self.apply_time:
+            size = 0
+            for out in node.outputs:
+                shape = self.variable_shape.get(out)
+                if shape is not None and hasattr(out.type, 'get_size'):
+                    size += int(out.type.get_size(shape))
+            sizes[node] = size
+        return sizes
+
+    def export_chrome_trace(self, file):
+        """
+        Write the timeline in the Chrome trace event JSON format.
+
+        The file can be opened in chrome://tracing or Perfetto. Each thunk
+        run is a complete event, whose arguments give the call, the node
+        and, if the memory profiler recorded them, the shapes and size of
+        its outputs. A counter event tracks the total size of the outputs
+        computed during each call.
+
+        Parameters
+        ----------
+        file
+            A file opened in text mode, or a file name.
+
+        """
+        if self.timeline is None:
+            raise ValueError("This profile has no timeline, create it with "
+                             "the Theano flag profiling.timeline=True.")
+        if isinstance(file, string_types):
+            with open(file, 'w') as f:
+                return self.export_chrome_trace(f)
+        pid = os.getpid()
+        sizes = self.timeline_sizes()
+        origin = min([event[1] for events in self.timeline
+                      for event in events] or [0])
+        trace = []
+        for call, events in enumerate(self.timeline):
+            allocated = 0
+            for node, start, end, tid in events:
+                args = {'call': call, 'node': str(node)}
+                shapes = [self.variable_shape.get(out)
+                          for out in node.outputs]
+                if any(shape is not None for shape in shapes):
+                    args['output shapes'] = [
+                        [int(d) for d in shape] if shape is not None else None
+                        for shape in shapes]
+                    args['output bytes'] = sizes.get(node, 0)
+                trace.append({'name': str(node.op), 'cat': 'apply',
+                              'ph': 'X', 'pid': pid, 'tid': tid,
+                              'ts': (start - origin) * 1e6,
+                              'dur': (end - start) * 1e6,
+                              'args': args})
+                if sizes.get(node):
+                    allocated += sizes[node]
+                    trace.append({'name': 'outputs', 'ph': 'C', 'pid': pid,
+                                  'ts': (end - origin) * 1e6,
+                                  'args': {'bytes': allocated}})
+        json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms',
+                   'otherData': {'message': str(self.message)}}, file)
+
+    def export_timeline(self, file):
+        """
+        Write the timeline in a compact binary format.
+
+        See `read_timeline` for the format.
+
+        Parameters
+        ----------
+        file
+            A file opened in binary mode, or a file name.
+
+        """
+        if self.timeline is None:
+            raise ValueError("This profile has no timeline, create it with "
+                             "the Theano flag profiling.timeline=True.")
+        if isinstance(file, string_types):
+            with open(file, 'wb') as f:
+                return self.export_timeline(f)
+        names = {}
+        sizes = self.timeline_sizes()
+        events = []
+        for call, call_events in enumerate(self.timeline):
+            for node, start, end, tid in call_events:
+                if node not in names:
+                    names[node] = len(names)
+                events.append(struct.pack(
+                    TIMELINE_EVENT, call, names[node], start, end,
+                    tid or 0, sizes.get(node, 0)))
+        file.write(TIMELINE_MAGIC)
+        file.write(struct.pack('<II', len(names), len(events)))
+        for node, i in sorted(iteritems(names), key=operator.itemgetter(1)):
+            name = str(node).encode('utf-8')
+            file.write(struct.pack('<I', len(name)))
+            file.write(name)
+        file.write(b''.join(events))
+
     def print_tips(self, file):
         print("""Here are tips to potentially make your code run faster
                  (if you think of new ones, suggest them on the mailing list).
@@ -1463,6 +1589,52 @@ class ProfileStats(object):
             print("  Sorry, no tip for today.", file=file)
 
 
+TIMELINE_MAGIC = b'THTL\x01\x00\x00\x00'
+# Call index, node index, start, end, thread id, size of the outputs.
+TIMELINE_EVENT = '<IIddQQ'
+
+
+def read_timeline(file):
+    """
+    Read a timeline written by `ProfileStats.export_timeline`.
+
+    The format is, in little endian: the 8 bytes of `TIMELINE_MAGIC`, the
+    number of nodes and of events as uint32, the name of each node as its
+    size in bytes (uint32) followed by its utf-8 encoding, then the events
+    packed as `TIMELINE_EVENT`.
+
+    Parameters
+    ----------
+    file
+        A file opened in binary mode, or a file name.
+
+    Returns
+    -------
+    list
+        The (call, node name, start, end, thread id, output bytes) of each
+        event.
+
+    """
+    if isinstance(file, string_types):
+        with open(file, 'rb') as f:
+            return read_timeline(f)
+    if file.read(len(TIMELINE_MAGIC)) != TIMELINE_MAGIC:
+        raise ValueError("Not a Theano timeline file")
+    n_names, n_events = struct.unpack('<II', file.read(8))
+    names = []
+    for i in range(n_names):
+        size, = struct.unpack('<I', file.read(4))
+        names.append(file.read(size).decode('utf-8'))
+    event_size = struct.calcsize(TIMELINE_EVENT)
+    data = file.read(n_events * event_size)
+    events = []
+    for i in range(n_events):
+        call, name, start, end, tid, size = struct.unpack_from(
+            TIMELINE_EVENT, data, i * event_size)
+        events.append((call, names[name], start, end, tid, size))
+    return events
+
+
 class ScanProfileStats(ProfileStats):
     callcount = 0.0
     nbsteps = 0.0
@@ -1471,6 +1643,9 @@ class ScanProfileStats(ProfileStats):
     def __init__(self, atexit_print=True, name=None, **kwargs):
         super(ScanProfileStats, self).__init__(atexit_print, **kwargs)
         self.name = name
+        # Scan calls its inner function directly, so all the steps are
+        # timed.
+        self.sample = 1
 
     def summary_globals(self, file):
         # Do nothing, we don't want to print extra global summary
@@ -216,6 +216,81 @@ def test_badthunkoutput():
     assert False  # an error should have been detected
 
 
+def test_check_fraction():
+    if not theano.config.cxx:
+        raise SkipTest("G++ not available, so we need to skip this test.")
+    a = theano.tensor.dvector()
+    b = theano.tensor.dvector()
+
+    # No node is checked, so the inconsistency isn't detected, but the
+    # outputs are still computed.
+    f = theano.function([a, b], inconsistent(a, b),
+                        mode=debugmode.DebugMode(check_fraction=0))
+    assert np.allclose(f([1.0, 2.0], [2, 3]), [3.5, 5.5])
+
+    f = theano.function([a, b], inconsistent(a, b),
+                        mode=debugmode.DebugMode(check_fraction=0.5))
+    try:
+        for i in range(20):
+            f([1.0, 2.0], [2, 3])
+    except debugmode.BadThunkOutput as e:
+        assert e.r.owner.op is inconsistent
+    else:
+        assert False  # an error should have been detected
+
+
+def test_cache_verified():
+    if not theano.config.cxx:
+        raise SkipTest("G++ not available, so we need to skip this test.")
+    a = theano.tensor.dvector()
+    b = theano.tensor.dvector()
+    f = theano.function([a, b], off_by_half(a, b),
+                        mode=debugmode.DebugMode(cache_verified=True))
+    f([1.0, 2.0], [2, 3])
+    key = (off_by_half, tuple(debugmode._value_signature(np.zeros(2))
+                              for i in range(2)))
+    assert key in debugmode._verified_nodes
+
+    # The inconsistent Op isn't verified yet, so it is checked.
+    f = theano.function([a, b], inconsistent(a, b),
+                        mode=debugmode.DebugMode(cache_verified=True))
+    try:
+        f([1.0, 2.0], [2, 3])
+    except debugmode.BadThunkOutput:
+        pass
+    else:
+        assert False  # an error should have been detected
+
+
+def test_n_workers():
+    if not theano.config.cxx:
+        raise SkipTest("G++ not available, so we need to skip this test.")
+    a = theano.tensor.dvector()
+    b = theano.tensor.dvector()
+    mode = debugmode.DebugMode(n_workers=2)
+    f_good = theano.function([a, b], off_by_half(a, b) * 2, mode=mode)
+    assert np.allclose(f_good([1.0, 2.0], [2, 3]), [7, 11])
+
+    f_inconsistent = theano.function([a, b], inconsistent(a, b), mode=mode)
+    try:
+        f_inconsistent([1.0, 2.0], [2, 3])
+    except debugmode.BadThunkOutput as e:
+        assert e.r.owner.op is inconsistent
+        assert e.thunk1 == 'perform'
+    else:
+        assert False  # an error should have been detected
+
+    # The functions with the same number of workers share a pool, and
+    # compiling one with another number does not close it.
+    pool = debugmode._get_process_pool(2)
+    assert debugmode._get_process_pool(2) is pool
+    mode3 = debugmode.DebugMode(n_workers=3)
+    f3 = theano.function([a, b], off_by_half(a, b) * 2, mode=mode3)
+    assert debugmode._get_process_pool(3) is not pool
+    assert np.allclose(f3([1.0, 2.0], [2, 3]), [7, 11])
+    assert np.allclose(f_good([1.0, 2.0], [2, 3]), [7, 11])
+
+
 def test_badoptimization():
     @gof.local_optimizer([theano.tensor.add])
     def insert_broken_add(node):
@@ -2,6 +2,7 @@ from __future__ import absolute_import, print_function, division
 import copy
 import six.moves.cPickle as pickle
 import numpy as np
+import threading
 import unittest
 
 
@@ -591,6 +592,178 @@ class T_function(unittest.TestCase):
         except TypeError:
             assert(func(first=1) == x)
 
+    def test_call_many(self):
+        a = T.dvector('a')
+        b = T.dscalar('b')
+        s = theano.shared(0.)
+        f = theano.function([a, In(b, value=1.)], (a * b).sum(),
+                            updates=[(s, s + 1)])
+        args = [([1, 2], 2), ([3.], ), (np.ones(2), -1)]
+        assert list(f.call_many(args)) == [6., 3., -2.]
+        assert s.get_value() == 3
+
+        g = theano.function([a], [a + 1, a * 2])
+        for (x, y), v in zip(g.call_many((v,) for v in [[0.], [1., 2.]]),
+                             [[0.], [1., 2.]]):
+            assert np.allclose(x, np.array(v) + 1)
+            assert np.allclose(y, np.array(v) * 2)
+
+        # The errors are the ones of __call__, raised without calling the
+        # function.
+        for bad_args in [(), (1, 2), ([[1]], 2), ([1], 2, 3)]:
+            try:
+                f(*bad_args)
+            except TypeError as e:
+                call_error = str(e)
+            try:
+                list(f.call_many([bad_args]))
+            except TypeError as e:
+                assert str(e) == call_error, (str(e), call_error)
+            else:
+                assert False
+        assert s.get_value() == 3
+        # The default value of b is restored after an error.
+        assert list(f.call_many([([1], )])) == [1.]
+
+    def test_concurrent(self):
+        a = T.dvector('a')
+        w = theano.shared(np.ones(3))
+        f = theano.function([a], T.dot(a, w) + T.exp(a).sum())
+        cf = f.concurrent()
+        errors = []
+
+        def worker(seed):
+            rng = np.random.RandomState(seed)
+            try:
+                for _ in range(50):
+                    v = rng.rand(3)
+                    assert np.allclose(cf(v), v.sum() + np.exp(v).sum())
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=worker, args=(i,))
+                   for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert not errors, errors
+        assert 1 <= cf.n_contexts <= 4
+
+        # The contexts share the shared variables of the function.
+        w.set_value(np.zeros(3))
+        v = np.arange(3.)
+        assert np.allclose(cf(v), np.exp(v).sum())
+        assert list(cf.call_many([(v, )])) == [f(v)]
+
+        cf1 = f.concurrent(max_contexts=1)
+        context = cf1.acquire()
+        blocked = threading.Thread(target=cf1, args=(v, ))
+        blocked.start()
+        blocked.join(0.1)
+        assert blocked.is_alive()
+        cf1.release(context)
+        blocked.join()
+        assert cf1.n_contexts == 1
+
+    def test_tiered(self):
+        a = T.dvector('a')
+        s = theano.shared(0.)
+        with theano.configparser.change_flags(**{'compile.tiered': True}):
+            f = theano.function([a], T.exp(a).sum() + s,
+                                updates=[(s, s + 1)], mode='FAST_RUN')
+        assert isinstance(f, theano.compile.function_module.TieredFunction)
+        v = np.arange(3.)
+        assert np.allclose(f(v), np.exp(v).sum())
+        optimized = f.wait()
+        assert f.optimized and f.function is optimized
+        assert optimized.maker.mode is theano.compile.mode.get_mode(
+            'FAST_RUN')
+        # The state of the shared variables carries over.
+        assert np.allclose(f(v), np.exp(v).sum() + 1)
+        assert s.get_value() == 2
+        assert f.maker is optimized.maker
+        assert np.allclose(pickle.loads(pickle.dumps(f))(v),
+                           np.exp(v).sum() + 2)
+
+    def test_tiered_settings(self):
+        a = T.dvector('a')
+        b = T.dscalar('b')
+        with theano.configparser.change_flags(**{'compile.tiered': True}):
+            f = theano.function([a, In(b, value=1., name='b')],
+                                T.exp(a).sum() * b, mode='FAST_RUN',
+                                profile=True)
+        # The items and attributes set before the optimized function is
+        # ready are also set on it.
+        f['b'] = 2.
+        f.trust_input = True
+        assert f['b'] == 2. and f.function.trust_input
+        v = np.arange(3.)
+        assert np.allclose(f(v), 2 * np.exp(v).sum())
+        optimized = f.wait()
+        assert optimized['b'] == 2. and optimized.trust_input
+        assert np.allclose(f(v), 2 * np.exp(v).sum())
+        # The profile accounts for the optimized function.
+        assert f.profile is optimized.profile
+        assert f.profile.nb_nodes == len(optimized.maker.fgraph.apply_nodes)
+        assert f.profile.compile_time > 0
+
+        with theano.configparser.change_flags(**{
+                'compile.tiered': True, 'compile.shape_specialize': 2}):
+            self.assertRaises(ValueError, theano.function, [a], a * 2)
+
+    def test_shape_specialize(self):
+        a = T.dmatrix('a')
+        s = theano.shared(0.)
+        with theano.configparser.change_flags(**{
+                'compile.shape_specialize': 2,
+                'compile.shape_specialize_cache_size': 1}):
+            f = theano.function([a], [a.shape[0] * a.sum(), a.shape],
+                                updates=[(s, s + a.shape[1])])
+        SSF = theano.compile.function_module.ShapeSpecializedFunction
+        assert isinstance(f, SSF)
+        v1 = np.ones((2, 3))
+        v2 = np.ones((4, 5))
+        for i in range(3):
+            assert f.get_function((v1, )) is (f.function if i < 1 else
+                                              f.specialized[(v1.shape, )])
+            r, shape = f(v1)
+            assert r == 12 and list(shape) == [2, 3]
+        assert s.get_value() == 9
+        # The shapes are constants in the specialized function.
+        fgraph = f.specialized[(v1.shape, )].maker.fgraph
+        assert not any(isinstance(node.op, (T.Shape, T.opt.Shape_i))
+                       for node in fgraph.apply_nodes)
+        r, shape = f(v2)
+        assert r == 80 and list(shape) == [4, 5]
+        f(v2)
+        # The least recently used version is dropped.
+        assert list(f.specialized) == [(v2.shape, )]
+        assert s.get_value() == 19
+
+    def test_shape_specialize_threads(self):
+        a = T.dmatrix('a')
+        with theano.configparser.change_flags(**{
+                'compile.shape_specialize': 2,
+                'compile.shape_specialize_cache_size': 1}):
+            f = theano.function([a], a.sum(), profile=True)
+        specialize = f.specialize
+        n_compiled = []
+
+        def counted_specialize(shapes):
+            n_compiled.append(shapes)
+            return specialize(shapes)
+        f.specialize = counted_specialize
+        v = np.ones((2, 3))
+        threads = [threading.Thread(target=f, args=(v, )) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # A single specialized version was compiled, which updates the
+        # profile of the function.
+        assert n_compiled == [(v.shape, )]
+        assert f.specialized[(v.shape, )].profile is f.profile
+
 
 class T_picklefunction(unittest.TestCase):
 
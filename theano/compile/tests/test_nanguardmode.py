@@ -69,3 +69,52 @@ def test_NanGuardMode():
         assert_raises(AssertionError, fun, biga)  # big values
     finally:
         _logger.propagate = True
+
+
+def test_check_values():
+    from theano.compile.nanguardmode import check_values, NAN, INF, BIG
+    a = np.arange(24.).reshape(2, 3, 4)
+    for dtype in ['float32', 'float64', 'int64']:
+        b = a.astype(dtype)
+        assert check_values(b) == 0
+        assert check_values(b[:, ::2, 1:]) == 0
+        b[1, 2, 3] = 2e10
+        assert check_values(b) == BIG
+        # Not contiguous.
+        assert check_values(b[:, ::2]) == BIG
+        assert check_values(b[:, :2]) == 0
+    b = a.copy()
+    b[0, 0, 0] = np.nan
+    b[1, 1, 1] = -np.inf
+    assert check_values(b) == NAN | INF | BIG
+    assert check_values(b[1]) == INF | BIG
+    assert check_values(np.zeros((0, 3))) == 0
+    assert check_values(np.zeros(3, dtype='complex64')) is None
+    # float16 is left to the numpy checks.
+    assert check_values(np.array([1, np.nan, np.inf], 'float16')) is None
+    x = T.vector(dtype='float16')
+    fun = theano.function([x], x * 2, mode=NanGuardMode(True, True, True))
+    _logger = logging.getLogger("theano.compile.nanguardmode")
+    try:
+        _logger.propagate = False
+        assert_raises(AssertionError, fun,
+                      np.array([1, np.nan], dtype='float16'))
+        assert_raises(AssertionError, fun,
+                      np.array([1, np.inf], dtype='float16'))
+    finally:
+        _logger.propagate = True
+
+
+def test_NanGuardMode_sample():
+    x = T.vector()
+    with theano.configparser.change_flags(**{'NanGuardMode.sample': 3}):
+        fun = theano.function(
+            [x], T.log(x),
+            mode=NanGuardMode(nan_is_error=True, inf_is_error=True))
+    ok = np.ones(3, dtype=theano.config.floatX)
+    bad = np.zeros(3, dtype=theano.config.floatX)
+    # The first call of the node is checked, as the fourth one.
+    fun(ok)
+    fun(bad)
+    fun(bad)
+    assert_raises(AssertionError, fun, bad)
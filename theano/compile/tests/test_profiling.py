@@ -4,12 +4,14 @@ Test of memory profiling
 """
 from __future__ import absolute_import, print_function, division
 
+import json
 import unittest
 
 import numpy as np
 
 import theano
 from six.moves import StringIO
+from io import BytesIO
 import theano.tensor as T
 from theano.ifelse import ifelse
 
@@ -108,6 +110,111 @@ class Test_profiling(unittest.TestCase):
             theano.config.profile = config1
             theano.config.profile_memory = config2
 
+    def test_sample(self):
+        x = T.dvector('x')
+        p = theano.ProfileStats(False, sample=4)
+        f = theano.function([x], T.exp(x).sum(), profile=p, mode='FAST_RUN')
+        timed = []
+        for i in range(10):
+            f(np.ones(3))
+            timed.append(f.fn.time_thunks)
+        # Only the calls 0, 4 and 8 time their thunks.
+        assert timed == [i % 4 == 0 for i in range(10)]
+        assert p.fct_callcount == 10
+        # Each timed call counts for 4 calls.
+        assert set(p.apply_callcount.values()) == set([12])
+        assert len(p.apply_time) == len(f.maker.fgraph.apply_nodes)
+
+        buf = StringIO()
+        p.summary(buf)
+        assert "(estimated from 1 in 4 calls)" in buf.getvalue()
+
+        # The calls that are not sampled do not update the profile.
+        for linker in ['cvm', 'vm', 'vm_nogc']:
+            if linker == 'cvm' and not theano.config.cxx:
+                continue
+            mode = theano.Mode(linker=linker, optimizer='fast_run')
+            p = theano.ProfileStats(False, sample=3)
+            f = theano.function([x], T.exp(x).sum(), profile=p, mode=mode)
+            counts = []
+            for i in range(7):
+                f(np.ones(3))
+                counts.append(sum(p.apply_callcount.values()))
+            n = len(f.maker.fgraph.apply_nodes)
+            assert counts == [3 * n * (i // 3 + 1) for i in range(7)], counts
+
+        # Nor do they time the thunks, with the Stack VM used by the memory
+        # profiler either.
+        vm_time = theano.gof.vm.time
+        timed = []
+
+        class CountingTime(object):
+            def time(self):
+                timed.append(1)
+                return vm_time.time()
+        with theano.configparser.change_flags(profile=True,
+                                              profile_memory=True):
+            p = theano.ProfileStats(False, sample=3)
+            f = theano.function([x], T.exp(x).sum(), profile=p,
+                                mode=theano.Mode(linker='vm'))
+            f(np.ones(3))
+            theano.gof.vm.time = CountingTime()
+            try:
+                f(np.ones(3))
+                f(np.ones(3))
+            finally:
+                theano.gof.vm.time = vm_time
+        assert not timed
+
+    def test_timeline(self):
+        x = T.dvector('x')
+        for linker, memory in [('cvm', False), ('vm', False),
+                               ('vm_nogc', False), ('vm', True)]:
+            if linker == 'cvm' and not theano.config.cxx:
+                continue
+            # The memory profiler records the shapes of the outputs.
+            with theano.configparser.change_flags(profile=memory,
+                                                  profile_memory=memory):
+                p = theano.ProfileStats(False, timeline=[])
+                f = theano.function([x], T.exp(x).sum() * 2, profile=p,
+                                    mode=theano.Mode(linker=linker,
+                                                     optimizer='fast_run'))
+                f(np.ones(3))
+                f(np.ones(5))
+            nodes = f.maker.fgraph.toposort()
+            assert len(p.timeline) == 2
+            for events in p.timeline:
+                assert [e[0] for e in events] == nodes
+                assert all(start <= end for _, start, end, _ in events)
+
+            buf = StringIO()
+            p.export_chrome_trace(buf)
+            trace = json.loads(buf.getvalue())['traceEvents']
+            complete = [e for e in trace if e['ph'] == 'X']
+            assert len(complete) == 2 * len(nodes)
+            assert [e['args']['call'] for e in complete] == (
+                [0] * len(nodes) + [1] * len(nodes))
+            assert any(e['ph'] == 'C' for e in trace) == memory
+
+            buf = BytesIO()
+            p.export_timeline(buf)
+            buf.seek(0)
+            events = theano.compile.profiling.read_timeline(buf)
+            assert [(e[0], e[1]) for e in events] == [
+                (c, str(n)) for c in range(2) for n in nodes]
+            assert events[0][2] == p.timeline[0][0][1]
+
+            # Only the sampled calls are recorded.
+            with theano.configparser.change_flags(profile=memory,
+                                                  profile_memory=memory):
+                p = theano.ProfileStats(False, timeline=[], sample=3)
+                f = theano.function([x], T.exp(x).sum() * 2, profile=p,
+                                    mode=theano.Mode(linker=linker,
+                                                     optimizer='fast_run'))
+                for i in range(6):
+                    f(np.ones(3))
+            assert [len(events) for events in p.timeline] == [len(nodes)] * 2
+
 
 if __name__ == '__main__':
     unittest.main()
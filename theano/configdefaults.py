@@ -835,6 +835,15 @@ AddConfigVar(
     in_c_key=False)
 
 
+AddConfigVar(
+    'hash_consing',
+    ("If True, calling an Op on the same inputs as an Apply node that "
+     "still exists returns the outputs of that node instead of building "
+     "a duplicate, so graphs are merged as they are built."),
+    BoolParam(False),
+    in_c_key=False)
+
+
 AddConfigVar('compute_test_value_opt',
              ("For debugging Theano optimization only."
               " Same as compute_test_value, but is used"
@@ -934,14 +943,21 @@ AddConfigVar(
 
 AddConfigVar(
     'cache_optimizations',
-    "WARNING: work in progress, does not work yet. "
-    "Specify if the optimization cache should be used. This cache will "
-    "any optimized graph and its optimization. Actually slow downs a lot "
-    "the first optimization, and could possibly still contains some bugs. "
-    "Use at your own risks.",
+    "Specify if the optimization cache should be used. This cache "
+    "stores each optimized graph in the compiledir, keyed by the "
+    "structure of the graph before optimization, the optimizer and the "
+    "Theano flags, so that compiling the same graph again skips the "
+    "graph optimization.",
     BoolParam(False),
     in_c_key=False)
 
+AddConfigVar(
+    'cache_optimizations_max_size',
+    "Maximum size in megabytes of the optimization cache. When it is "
+    "exceeded, the least recently used graphs are removed from the cache.",
+    IntParam(100, lambda i: i >= 0),
+    in_c_key=False)
+
 
 def good_seed_param(seed):
     if seed == "random":
@@ -974,6 +990,12 @@ AddConfigVar('NanGuardMode.big_is_error',
              BoolParam(True),
              in_c_key=False)
 
+AddConfigVar('NanGuardMode.sample',
+             """Check the outputs of each node only at one of every N
+             executions of the node.""",
+             IntParam(1, lambda i: i >= 1),
+             in_c_key=False)
+
 AddConfigVar('NanGuardMode.action',
              "What NanGuardMode does when it finds a problem",
              EnumStr('raise', 'warn', 'pdb'),
@@ -1018,6 +1040,24 @@ AddConfigVar('DebugMode.check_finite',
              BoolParam(True),
              in_c_key=False)
 
+AddConfigVar('DebugMode.check_fraction',
+             ("Fraction of the nodes checked at each call, chosen at "
+              "random. The other nodes are only run once."),
+             FloatParam(1.0, lambda f: 0 <= f <= 1),
+             in_c_key=False)
+
+AddConfigVar('DebugMode.cache_verified',
+             ("Skip the checks of the nodes whose Op was already checked "
+              "with inputs of the same shapes, strides and dtypes."),
+             BoolParam(False),
+             in_c_key=False)
+
+AddConfigVar('DebugMode.n_workers',
+             ("If > 0, run the Python implementations of the checked nodes "
+              "in a pool of this many processes."),
+             IntParam(0, lambda i: i >= 0),
+             in_c_key=False)
+
 AddConfigVar('DebugMode.check_strides',
              ("Check that Python- and C-produced ndarrays have same strides. "
               "On difference: (0) - ignore, (1) warn, or (2) raise error"),
@@ -1068,6 +1108,20 @@ AddConfigVar('profiling.time_thunks',
              BoolParam(True),
              in_c_key=False)
 
+AddConfigVar('profiling.sample',
+             """Time the thunks of only 1 in N calls of a profiled function.
+             The times and call counts of the nodes are scaled by N, so
+             they estimate the totals.""",
+             IntParam(1, lambda i: i >= 1),
+             in_c_key=False)
+
+AddConfigVar('profiling.timeline',
+             """Record the start and end times of the thunks of each
+             profiled call, to export them with
+             ProfileStats.export_chrome_trace or export_timeline.""",
+             BoolParam(False),
+             in_c_key=False)
+
 AddConfigVar('profiling.n_apply',
              "Number of Apply instances to print by default",
              IntParam(20, lambda i: i > 0),
@@ -1126,6 +1180,20 @@ AddConfigVar('optdb.max_use_ratio',
              FloatParam(8),
              in_c_key=False)
 
+AddConfigVar('optdb.incremental_toposort',
+             'If True, keep the topological order of the graph up to date '
+             'during the optimization instead of sorting the whole graph '
+             'at each pass of the optimizers.',
+             BoolParam(False),
+             in_c_key=False)
+
+AddConfigVar('optdb.worklist',
+             'If True, after their first pass over the graph, the '
+             'EquilibriumOptimizer only try the local optimizers again '
+             'on the nodes near the changes made to the graph.',
+             BoolParam(False),
+             in_c_key=False)
+
 AddConfigVar('gcc.cxxflags',
              "Extra compiler flags for gcc",
              StrParam(""),
@@ -1155,6 +1223,43 @@ AddConfigVar('cmodule.compilation_warning',
              in_c_key=False)
 
 
+AddConfigVar('cmodule.compile_workers',
+             "Number of C modules that can be compiled concurrently when a "
+             "function is compiled. The modules missing from the cache are "
+             "first collected, then built by that many compiler processes "
+             "while the compilation lock is held. 0 or 1 compiles them one "
+             "after the other.",
+             IntParam(0, lambda i: i >= 0),
+             in_c_key=False)
+
+AddConfigVar('cmodule.lock_per_module',
+             "If True, compiling a C module only locks that module instead "
+             "of the whole compilation directory, so that processes "
+             "compiling different modules do not wait for each other. All "
+             "the processes sharing a compilation directory must use the "
+             "same value, as the two kinds of locks don't exclude each "
+             "other.",
+             BoolParam(False),
+             in_c_key=False)
+
+AddConfigVar('cmodule.use_index',
+             "If True, the compiled modules are looked up in an append-only "
+             "index file of the compilation directory, and only the entries "
+             "needed are loaded, instead of reading the whole cache when "
+             "Theano starts. Old modules are then only deleted by "
+             "`theano-cache cleanup`.",
+             BoolParam(False),
+             in_c_key=False)
+
+AddConfigVar('cmodule.unity_build',
+             "Maximum number of C modules of a function linked into a "
+             "single shared library. The modules missing from the cache "
+             "that use the same compiler flags are built by one compiler "
+             "process, and each module directory gets a hard link to the "
+             "shared library. 0 or 1 builds one shared library per module.",
+             IntParam(0, lambda i: i >= 0),
+             in_c_key=False)
+
 AddConfigVar('cmodule.preload_cache',
              "If set to True, will preload the C module cache at import time",
              BoolParam(False, allow_override=False),
@@ -1436,6 +1541,22 @@ AddConfigVar('vm.lazy',
              ConfigParam('None', filter_vm_lazy),
              in_c_key=False)
 
+AddConfigVar('vm.threads',
+             "Useful only for the vm linkers. Number of threads used to run "
+             "the independent nodes of a graph concurrently. 0 or 1 runs "
+             "the nodes one after the other. Only used for graphs without "
+             "lazy nodes.",
+             IntParam(0, lambda i: i >= 0),
+             in_c_key=False)
+
+AddConfigVar('vm.memory_plan',
+             "Useful only for the vm linkers. If True, the intermediate "
+             "results are stored in a single buffer per function, planned "
+             "from their liveness for each shape of the inputs. Only used "
+             "for graphs without lazy nodes, when vm.threads is 0 or 1.",
+             BoolParam(False),
+             in_c_key=False)
+
 AddConfigVar(
     'warn.identify_1pexp_bug',
     'Warn if Theano versions prior to 7987b51 (2011-12-18) could have '
@@ -1532,6 +1653,29 @@ AddConfigVar('compile.wait',
 def _timeout_default():
     return theano.config.compile.wait * 24
 
+AddConfigVar('compile.tiered',
+             """If True, theano.function first returns a function compiled
+             with the FAST_COMPILE mode, and compiles the function with the
+             requested mode in a background thread. The optimized function
+             replaces the first one once it is ready.""",
+             BoolParam(False),
+             in_c_key=False)
+
+AddConfigVar('compile.shape_specialize',
+             """If N > 0, theano.function compiles a version of the function
+             specialized to the shapes of its inputs after N calls with
+             these shapes, and uses it for the next calls with the same
+             shapes. 0 disables it.""",
+             IntParam(0, lambda i: i >= 0),
+             in_c_key=False)
+
+AddConfigVar('compile.shape_specialize_cache_size',
+             """Maximum number of versions of a function specialized to
+             input shapes, see compile.shape_specialize. The least recently
+             used one is dropped when it is reached.""",
+             IntParam(4, lambda i: i >= 0),
+             in_c_key=False)
+
 AddConfigVar('compile.timeout',
              """In seconds, time that a process will wait before deciding to
 override an existing lock. An override only happens when the existing
@@ -7,6 +7,7 @@ import logging
 import os
 import shlex
 import sys
+import threading
 import warnings
 from functools import wraps
 
@@ -18,6 +19,12 @@ from six import string_types
 
 _logger = logging.getLogger('theano.configparser')
 
+# Config values overridden in the current thread only, see
+# `thread_local_flags`. `_thread_local_lock` guards the count of threads
+# overriding each ConfigParam.
+_thread_local = threading.local()
+_thread_local_lock = threading.Lock()
+
 
 class TheanoConfigWarning(Warning):
 
@@ -131,6 +138,46 @@ class change_flags(object):
             v.__set__(None, self.old_vals[k])
 
 
+class thread_local_flags(change_flags):
+    """
+    Like `change_flags`, but the new values are only seen by the current
+    thread.
+
+    This allows e.g. a compilation running in a background thread to change
+    flags without affecting the graphs built at the same time by the other
+    threads.
+    """
+    def __enter__(self):
+        new_overrides = {}
+        for k, v in iteritems(self.confs):
+            if not v.allow_override:
+                raise Exception(
+                    "Can't change the value of this config parameter "
+                    "after initialization!")
+            val = self.new_vals[k]
+            new_overrides[v] = v.filter(val) if v.filter else val
+        overrides = getattr(_thread_local, 'overrides', {})
+        saved = getattr(_thread_local, 'saved', None)
+        if saved is None:
+            saved = _thread_local.saved = []
+        saved.append((overrides, list(new_overrides)))
+        # Only the params overridden by some thread look up the overrides
+        # of the current thread when they are read.
+        with _thread_local_lock:
+            for v in new_overrides:
+                v.n_thread_overrides += 1
+        overrides = dict(overrides)
+        overrides.update(new_overrides)
+        _thread_local.overrides = overrides
+
+    def __exit__(self, *args):
+        overrides, params = _thread_local.saved.pop()
+        _thread_local.overrides = overrides
+        with _thread_local_lock:
+            for v in params:
+                v.n_thread_overrides -= 1
+
+
 def fetch_val_for_key(key, delete_key=False):
     """Return the overriding config value for a key.
     A successful search returns a string value.
@@ -181,15 +228,18 @@ def _config_print(thing, buf, print_doc=True):
         print("", file=buf)
 
 
-def get_config_md5():
+def get_config_md5(in_c_key_only=True):
     """
     Return a string md5 of the current config options. It should be such that
     we can safely assume that two different config setups will lead to two
     different strings.
 
-    We only take into account config options for which `in_c_key` is True.
+    By default, we only take into account config options for which
+    `in_c_key` is True. If `in_c_key_only` is False, all config options are
+    taken into account.
     """
-    all_opts = sorted([c for c in _config_var_list if c.in_c_key],
+    all_opts = sorted([c for c in _config_var_list
+                       if c.in_c_key or not in_c_key_only],
                       key=lambda cv: cv.fullname)
     return theano.gof.utils.hash_from_code('\n'.join(
         ['%s = %s' % (cv.fullname, cv.__get__(True, None)) for cv in all_opts]))
@@ -296,6 +346,9 @@ def AddConfigVar(name, doc, configparam, root=config, in_c_key=True):
 
 class ConfigParam(object):
 
+    # Number of `thread_local_flags` overriding this param in any thread.
+    n_thread_overrides = 0
+
     def __init__(self, default, filter=None, allow_override=True):
         """
         If allow_override is False, we can't change the value after the import
@@ -318,6 +371,10 @@ class ConfigParam(object):
     def __get__(self, cls, type_, delete_key=False):
         if cls is None:
             return self
+        if self.n_thread_overrides:
+            overrides = getattr(_thread_local, 'overrides', None)
+            if overrides and self in overrides:
+                return overrides[self]
         if not hasattr(self, 'val'):
             try:
                 val_str = fetch_val_for_key(self.fullname,
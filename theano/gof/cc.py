@@ -15,7 +15,7 @@ import numpy as np
 
 import theano
 from theano import config
-from theano.compat import PY3
+from theano.compat import PY3, get_unbound_function
 from theano.compat import izip
 from six import string_types, reraise
 from six.moves import StringIO, xrange
@@ -25,7 +25,7 @@ from theano.gof import graph
 from theano.gof import link
 from theano.gof import utils
 from theano.gof import cmodule
-from theano.gof.compilelock import get_lock, release_lock
+from theano.gof.compilelock import get_lock, lock_count, release_lock
 from theano.gof.callcache import CallCache
 
 
@@ -1465,38 +1465,67 @@ class CLinker(link.Linker):
         mod = self.get_dynamic_module()
         return mod.code()
 
-    def compile_cmodule(self, location=None):
+    def compile_cmodule(self, location=None, py_module=True):
         """
         This compiles the source code for this linker and returns a
         loaded module.
 
+        If `py_module` is False, the shared library is only built in
+        `location` and its path is returned. The compilation lock is not
+        taken in that case: the caller must already hold it. This is what
+        lets `ModuleCache.modules_from_keys` run many of them concurrently.
+
         """
         if location is None:
             location = cmodule.dlimport_workdir(config.compiledir)
         mod = self.get_dynamic_module()
-        c_compiler = self.c_compiler()
-        libs = self.libraries()
-        preargs = self.compile_args()
+        c_compiler, include_dirs, lib_dirs, libs, preargs = \
+            self.compile_settings()
         # We want to compute the code without the lock
         src_code = mod.code()
-        get_lock()
+        if py_module:
+            get_lock()
         try:
             _logger.debug("LOCATION %s", str(location))
             module = c_compiler.compile_str(
                 module_name=mod.code_hash,
                 src_code=src_code,
                 location=location,
-                include_dirs=self.header_dirs(),
-                lib_dirs=self.lib_dirs(),
-                libs=libs,
-                preargs=preargs)
+                include_dirs=list(include_dirs),
+                lib_dirs=list(lib_dirs),
+                libs=list(libs),
+                preargs=list(preargs),
+                py_module=py_module)
         except Exception as e:
             e.args += (str(self.fgraph),)
             raise
         finally:
-            release_lock()
+            if py_module:
+                release_lock()
+        if not py_module:
+            return os.path.join(location, '%s.%s' % (
+                mod.code_hash, cmodule.get_lib_extension()))
         return module
 
+    def compile_settings(self):
+        """
+        Return the compiler and the arguments used to build the module of
+        this linker.
+
+        Modules with equal settings can be linked into the same shared
+        library by `ModuleCache.modules_from_keys`.
+
+        Returns
+        -------
+        tuple
+            (c_compiler, include_dirs, lib_dirs, libs, preargs), the
+            lists being converted to tuples so that it can be hashed.
+
+        """
+        return (self.c_compiler(), tuple(self.header_dirs()),
+                tuple(self.lib_dirs()), tuple(self.libraries()),
+                tuple(self.compile_args()))
+
     def get_dynamic_module(self):
         """
         Return a cmodule.DynamicModule instance full of the code for our fgraph.
@@ -1701,6 +1730,78 @@ class _CThunk(object):
             reraise(exc_type, exc_value, exc_trace)
 
 
+def node_clinkers(order, no_recycling, storage_map=None, compute_map=None):
+    """
+    Return the (key, CLinker) pairs of the nodes that compile a C module.
+
+    Each CLinker is the one built by `Op.make_c_thunk`, so its key is the
+    one of the module used by the thunk of the node. Nodes whose Op
+    overrides `Op.make_thunk` or doesn't provide C code are skipped.
+
+    Parameters
+    ----------
+    order
+        List of Apply nodes.
+    no_recycling
+        Variables whose storage can't be reused, as given to the linker.
+
+    """
+    Op = theano.gof.op.Op
+    keys_lnks = []
+    for node in order:
+        op = node.op
+        if (not isinstance(op, Op) or
+                get_unbound_function(type(op).make_thunk) is not
+                get_unbound_function(Op.make_thunk)):
+            continue
+        op.prepare_node(node, storage_map=storage_map,
+                        compute_map=compute_map, impl='c')
+        try:
+            cl = op._make_c_linker(node, no_recycling)
+        except NotImplementedError:
+            # float16 is not supported.
+            continue
+        try:
+            key = cl.cmodule_key()
+        except (KeyError, NotImplementedError, utils.MethodNotDefined):
+            key = None
+        if key is None:
+            continue
+        for n in cl.node_order:
+            n.op.prepare_node(n, None, None, 'c')
+        keys_lnks.append((key, cl))
+    return keys_lnks
+
+
+def precompile_nodes(order, storage_map, compute_map, no_recycling,
+                     n_workers=None):
+    """
+    Compile together the C modules of the nodes missing from the cache.
+
+    The keys of all the nodes are collected first and the missing modules
+    are built together by `ModuleCache.modules_from_keys`, concurrently
+    and/or linked in a few shared libraries (see
+    config.cmodule.unity_build). The thunks made afterwards by
+    `Op.make_c_thunk` then find their module in the cache.
+
+    Parameters
+    ----------
+    order
+        List of Apply nodes.
+    n_workers : int
+        Maximum number of concurrent compilations. Defaults to
+        config.cmodule.compile_workers. Nothing is done if it is lower
+        than 2 and config.cmodule.unity_build is also lower than 2.
+
+    """
+    if n_workers is None:
+        n_workers = config.cmodule.compile_workers
+    if (n_workers < 2 and config.cmodule.unity_build < 2) or not config.cxx:
+        return
+    keys_lnks = node_clinkers(order, no_recycling, storage_map, compute_map)
+    get_module_cache().modules_from_keys(keys_lnks, n_workers=n_workers)
+
+
 class OpWiseCLinker(link.LocalLinker):
     """
     Uses CLinker on the individual Ops that comprise an fgraph and loops
@@ -1766,7 +1867,7 @@ class OpWiseCLinker(link.LocalLinker):
         # C code. We will keep the lock untill all the function
         # compilation will be finished. This allow to don't
         # require the lock when all c code are already compiled!
-        orig_n_lock = getattr(get_lock, "n_lock", 0)
+        orig_n_lock = lock_count()
         try:
 
             fgraph = self.fgraph
@@ -1785,6 +1886,8 @@ class OpWiseCLinker(link.LocalLinker):
             for k in storage_map:
                 compute_map[k] = [k.owner is None]
 
+            precompile_nodes(order, storage_map, compute_map, no_recycling)
+
             thunks = []
             for node in order:
                 # make_thunk will try by default C code, otherwise
@@ -1820,9 +1923,9 @@ class OpWiseCLinker(link.LocalLinker):
 
         finally:
             # Release lock on compilation directory.
-            if getattr(get_lock, "n_lock", 0) > orig_n_lock:
+            if lock_count() > orig_n_lock:
                 release_lock()
-                assert get_lock.n_lock == orig_n_lock
+                assert lock_count() == orig_n_lock
 
         return (f,
                 [link.Container(input, storage)
@@ -19,14 +19,17 @@ import time
 import platform
 import distutils.sysconfig
 import warnings
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
 
 import numpy.distutils
 
 import theano
 from theano.compat import PY3, decode, decode_iter
-from six import b, BytesIO, StringIO, string_types, iteritems
+from six import (b, BytesIO, StringIO, string_types, integer_types,
+                 iteritems)
 from six.moves import xrange
-from theano.gof.utils import flatten
+from theano.gof.utils import flatten, MethodNotDefined
 from theano.configparser import config
 from theano.gof.utils import hash_from_code
 from theano.misc.windows import (subprocess_Popen,
@@ -452,6 +455,25 @@ def get_safe_part(key):
     return key[0] + (md5, )
 
 
+def get_key_digest(key):
+    """
+    Return a hash of a versioned `key` that is stable across processes.
+
+    The objects in the key are represented by their type and str(), since
+    their hash and repr often depend on the process. Different keys may thus
+    share a digest: it is only used to find candidate modules in the cache
+    index, whose keys are then compared to `key`.
+
+    """
+    def to_str(x):
+        if isinstance(x, tuple):
+            return '(%s)' % ', '.join(to_str(e) for e in x)
+        if isinstance(x, string_types + integer_types + (float, type(None))):
+            return repr(x)
+        return '%s.%s{%s}' % (type(x).__module__, type(x).__name__, x)
+    return hash_from_code(to_str(key))
+
+
 class KeyData(object):
     """
     Used to store the key information in the cache.
@@ -502,15 +524,25 @@ class KeyData(object):
         pickle time (in which case a warning is also displayed).
 
         """
+        # The file is written next to its final location then renamed, so
+        # that processes reading the cache without holding the lock never
+        # see a partially written file.
+        tmp_pkl = '%s.%s.tmp' % (self.key_pkl, os.getpid())
         # Note that writing in binary mode is important under Windows.
         try:
-            with open(self.key_pkl, 'wb') as f:
+            with open(tmp_pkl, 'wb') as f:
                 pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
         except pickle.PicklingError:
             _logger.warning("Cache leak due to unpickle-able key data %s",
                             self.keys)
-            os.remove(self.key_pkl)
+            os.remove(tmp_pkl)
             raise
+        try:
+            os.rename(tmp_pkl, self.key_pkl)
+        except OSError:
+            # Under Windows, rename does not overwrite an existing file.
+            os.remove(self.key_pkl)
+            os.rename(tmp_pkl, self.key_pkl)
 
     def get_entry(self):
         """
@@ -653,6 +685,20 @@ class ModuleCache(object):
     """
     Set of all key.pkl files that have been loaded.
 
+    """
+    index_file = ""
+    """
+    Path of the cache index, used if config.cmodule.use_index is True. Each
+    line maps a module hash or a key digest (see `get_key_digest`) to the
+    directory of a module. It is written even if the index is not used, so
+    that the processes using it find the modules written by the other ones.
+
+    """
+    index = None
+    """
+    Maps a module hash or key digest to the directories listed for it in
+    the cache index. Loaded lazily.
+
     """
 
     def __init__(self, dirname, check_for_broken_eq=True, do_refresh=True):
@@ -665,9 +711,18 @@ class ModuleCache(object):
         self.check_for_broken_eq = check_for_broken_eq
         self.loaded_key_pkl = set()
         self.time_spent_in_check_key = 0
+        self.index_file = os.path.join(dirname, 'index.log')
+        self.index = None
+        self.index_offset = 0
 
-        if do_refresh:
+        # With the index, the entries are loaded lazily from it.
+        if do_refresh and (not config.cmodule.use_index or
+                           not os.path.exists(self.index_file)):
             self.refresh()
+            # Index the modules compiled before the index existed.
+            if not os.path.exists(self.index_file):
+                with compilelock.lock_ctx():
+                    self._rebuild_index()
 
     age_thresh_use = config.cmodule.age_thresh_use  # default 24 days
     """
@@ -743,7 +798,7 @@ class ModuleCache(object):
         files, root = None, None  # To make sure the "del" below works
         for subdirs_elem in subdirs:
             # Never clean/remove lock_dir
-            if subdirs_elem == 'lock_dir':
+            if subdirs_elem in ('lock_dir', 'module_locks'):
                 continue
             root = os.path.join(self.dirname, subdirs_elem)
             key_pkl = os.path.join(root, 'key.pkl')
@@ -753,8 +808,12 @@ class ModuleCache(object):
                 continue
             files = os.listdir(root)
             if not files:
-                rmtree_empty(root, ignore_nocleanup=True,
-                             msg="empty dir")
+                # A recent empty directory may be a compilation just
+                # started by a process holding only its module lock.
+                if (time_now - os.path.getmtime(root) >
+                        config.compile.timeout):
+                    rmtree_empty(root, ignore_nocleanup=True,
+                                 msg="empty dir")
                 continue
             if 'delete.me' in files:
                 rmtree(root, ignore_nocleanup=True,
@@ -891,35 +950,7 @@ class ModuleCache(object):
                                               age, entry)
                         continue
 
-                    # Remember the map from a module's hash to the KeyData
-                    # object associated with it.
-                    self.module_hash_to_key_data[mod_hash] = key_data
-
-                    for key in key_data.keys:
-                        if key not in self.entry_from_key:
-                            self.entry_from_key[key] = entry
-                            # Assert that we have not already got this
-                            # entry somehow.
-                            assert entry not in self.module_from_name
-                            # Store safe part of versioned keys.
-                            if key[0]:
-                                self.similar_keys.setdefault(
-                                    get_safe_part(key),
-                                    []).append(key)
-                        else:
-                            dir1 = os.path.dirname(self.entry_from_key[key])
-                            dir2 = os.path.dirname(entry)
-                            _logger.warning(
-                                "The same cache key is associated to "
-                                "different modules (%s and %s). This "
-                                "is not supposed to happen! You may "
-                                "need to manually delete your cache "
-                                "directory to fix this.",
-                                dir1, dir2)
-                    # Clean up the name space to prevent bug.
-                    if key_data.keys:
-                        del key
-                    self.loaded_key_pkl.add(key_pkl)
+                    self._register_key_data(key_data, entry, key_pkl)
                 else:
                     too_old_to_use.append(entry)
 
@@ -987,6 +1018,216 @@ class ModuleCache(object):
 
         return too_old_to_use
 
+    def _register_key_data(self, key_data, entry, key_pkl):
+        """
+        Add the keys of a KeyData object loaded from `key_pkl` to the
+        in-memory mappings.
+
+        """
+        # Remember the map from a module's hash to the KeyData
+        # object associated with it.
+        self.module_hash_to_key_data[key_data.module_hash] = key_data
+
+        for key in key_data.keys:
+            if key not in self.entry_from_key:
+                self.entry_from_key[key] = entry
+                # Assert that we have not already got this
+                # entry somehow.
+                assert entry not in self.module_from_name
+                # Store safe part of versioned keys.
+                if key[0]:
+                    self.similar_keys.setdefault(
+                        get_safe_part(key),
+                        []).append(key)
+            else:
+                dir1 = os.path.dirname(self.entry_from_key[key])
+                dir2 = os.path.dirname(entry)
+                _logger.warning(
+                    "The same cache key is associated to "
+                    "different modules (%s and %s). This "
+                    "is not supposed to happen! You may "
+                    "need to manually delete your cache "
+                    "directory to fix this.",
+                    dir1, dir2)
+        self.loaded_key_pkl.add(key_pkl)
+
+    def _read_index(self):
+        """
+        Load the entries appended to the cache index since the last call.
+
+        """
+        if self.index is None:
+            self.index = {}
+            self.index_offset = 0
+        try:
+            with open(self.index_file, 'rb') as f:
+                f.seek(self.index_offset)
+                data = f.read()
+        except IOError:
+            return
+        # Ignore a last line that is still being written by another process.
+        end = data.rfind(b'\n') + 1
+        self.index_offset += end
+        for line in decode(data[:end]).splitlines():
+            try:
+                digest, subdir = line.split()
+            except ValueError:
+                continue
+            self.index.setdefault(digest, []).append(subdir)
+
+    def _load_from_index(self, digest):
+        """
+        Load the KeyData files associated to `digest` in the cache index.
+
+        `digest` is either a module hash or the result of `get_key_digest`.
+        Only those files are unpickled, instead of the whole cache as in
+        `refresh`.
+
+        """
+        self._read_index()
+        for subdir in self.index.get(digest, []):
+            self.add_module_dir(os.path.join(self.dirname, subdir))
+
+    def add_module_dir(self, root, add_to_index=False):
+        """
+        Load the keys of the module stored in the cache directory `root`.
+
+        Unlike `refresh`, only this directory is read. Nothing is done if
+        it does not hold a usable module, or if its module is already known.
+
+        Parameters
+        ----------
+        root
+            A subdirectory of the cache directory.
+        add_to_index : bool
+            If True, also record the module in the cache index, if it is
+            used. This is needed for directories added from outside of this
+            class.
+
+        Returns
+        -------
+        KeyData or None
+            The KeyData object of the module, if it was loaded.
+
+        """
+        key_pkl = os.path.join(root, 'key.pkl')
+        if key_pkl in self.loaded_key_pkl or not os.path.isdir(root):
+            return None
+        entry = module_name_from_dir(root, err=False)
+        if (entry is None or
+                time.time() - last_access_time(entry) >= self.age_thresh_use):
+            return None
+        try:
+            with open(key_pkl, 'rb') as f:
+                key_data = pickle.load(f)
+        except Exception:
+            # The module may have been deleted, or its key refers to
+            # classes that are not imported yet. refresh() deals with
+            # those cases.
+            return None
+        if (not isinstance(key_data, KeyData) or
+                key_data.module_hash in self.module_hash_to_key_data):
+            return None
+        # The directory may have been moved from another compiledir.
+        key_data.entry = entry
+        key_data.key_pkl = key_pkl
+        self._register_key_data(key_data, entry, key_pkl)
+        if add_to_index:
+            self._add_to_index(key_data, [key_data.module_hash] +
+                               [get_key_digest(k) for k in key_data.keys])
+        return key_data
+
+    def _add_to_index(self, key_data, digests):
+        """
+        Append to the cache index that `digests` map to the module of
+        `key_data`.
+
+        Each entry is appended with a single write, so that concurrent
+        writers do not need the lock. This is done even if
+        config.cmodule.use_index is False, to keep the index complete.
+
+        """
+        subdir = os.path.basename(os.path.dirname(key_data.key_pkl))
+        lines = ''.join('%s %s\n' % (digest, subdir) for digest in digests)
+        fd = os.open(self.index_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+        try:
+            os.write(fd, lines.encode())
+        finally:
+            os.close(fd)
+
+    def _rebuild_index(self):
+        """
+        Rewrite the cache index from the modules currently known.
+
+        This expects the compile lock to be held, and `refresh` to have
+        been called. As the entries are appended without the lock, the
+        entries of the current index whose module still exists are kept,
+        including the ones appended while the new index is written.
+
+        """
+        lines = []
+        for module_hash, key_data in iteritems(self.module_hash_to_key_data):
+            keys = [key for key in key_data.keys if key[0]]
+            if not keys:
+                continue
+            subdir = os.path.basename(os.path.dirname(key_data.key_pkl))
+            for digest in [module_hash] + [get_key_digest(k) for k in keys]:
+                lines.append('%s %s\n' % (digest, subdir))
+        try:
+            old_index = open(self.index_file, 'rb')
+        except IOError:
+            old_index = None
+        try:
+            if old_index is not None:
+                data = old_index.read()
+                lines.extend(self._existing_index_lines(data))
+            tmp_file = '%s.%s.tmp' % (self.index_file, os.getpid())
+            with open(tmp_file, 'w') as f:
+                f.write(''.join(OrderedDict.fromkeys(lines)))
+            try:
+                os.rename(tmp_file, self.index_file)
+                renamed = True
+            except OSError:
+                renamed = False
+            # The entries appended to the old index in the meantime, after
+            # the last line that was not complete yet.
+            appended = []
+            if old_index is not None:
+                data = data[data.rfind(b'\n') + 1:] + old_index.read()
+                appended = self._existing_index_lines(data)
+                old_index.close()
+                old_index = None
+            if not renamed:
+                # Under Windows, rename does not overwrite an existing file.
+                os.remove(self.index_file)
+                os.rename(tmp_file, self.index_file)
+        finally:
+            if old_index is not None:
+                old_index.close()
+        if appended:
+            fd = os.open(self.index_file, os.O_WRONLY | os.O_APPEND)
+            try:
+                os.write(fd, ''.join(appended).encode())
+            finally:
+                os.close(fd)
+        self.index = None
+
+    def _existing_index_lines(self, data):
+        """
+        Return the complete lines of the index data `data` whose module
+        directory still exists.
+
+        """
+        lines = []
+        for line in decode(data[:data.rfind(b'\n') + 1]).splitlines():
+            try:
+                digest, subdir = line.split()
+            except ValueError:
+                continue
+            if os.path.isdir(os.path.join(self.dirname, subdir)):
+                lines.append('%s %s\n' % (digest, subdir))
+        return lines
+
     def _get_from_key(self, key, key_data=None):
         """
         Returns a module if the passed-in key is found in the cache
@@ -1003,6 +1244,9 @@ class ModuleCache(object):
             except (TypeError, ValueError):
                 raise ValueError(
                     "Invalid key. key must have form (version, rest)", key)
+            if (key not in self.entry_from_key and key[0] and
+                    config.cmodule.use_index):
+                self._load_from_index(get_key_digest(key))
             if key in self.entry_from_key:
                 name = self.entry_from_key[key]
         else:
@@ -1012,11 +1256,27 @@ class ModuleCache(object):
             return None
         return self._get_module(name)
 
+    def _lock_ctx(self, module_hashes, keep_lock=False):
+        """
+        Return the lock context protecting the writes of the given modules.
+
+        This is the lock of the whole compilation directory, unless
+        config.cmodule.lock_per_module is True. In that case, only the
+        processes writing one of the same modules wait for each other.
+
+        """
+        if config.cmodule.lock_per_module:
+            return compilelock.module_lock_ctx(module_hashes)
+        return compilelock.lock_ctx(keep_lock=keep_lock)
+
     def _get_from_hash(self, module_hash, key, keep_lock=False):
+        if (module_hash not in self.module_hash_to_key_data and
+                config.cmodule.use_index):
+            self._load_from_index(module_hash)
         if module_hash in self.module_hash_to_key_data:
             key_data = self.module_hash_to_key_data[module_hash]
             module = self._get_from_key(None, key_data)
-            with compilelock.lock_ctx(keep_lock=keep_lock):
+            with self._lock_ctx([module_hash], keep_lock=keep_lock):
                 try:
                     key_data.add_key(key, save_pkl=bool(key[0]))
                     key_broken = False
@@ -1029,6 +1289,8 @@ class ModuleCache(object):
                 if (key[0] and not key_broken and
                         self.check_for_broken_eq):
                     self.check_key(key, key_data.key_pkl)
+                if key[0] and not key_broken:
+                    self._add_to_index(key_data, [get_key_digest(key)])
             self._update_mappings(key, key_data, module.__file__, check_in_keys=not key_broken)
             return module
         else:
@@ -1051,7 +1313,8 @@ class ModuleCache(object):
 
     def _add_to_cache(self, module, key, module_hash):
         """
-        This function expects the compile lock to be held.
+        This function expects the compile lock, or the lock of this module
+        (see `_lock_ctx`), to be held.
 
         """
         name = module.__file__
@@ -1082,6 +1345,10 @@ class ModuleCache(object):
             if not key_broken and self.check_for_broken_eq:
                 self.check_key(key, key_pkl)
             self.loaded_key_pkl.add(key_pkl)
+            digests = [module_hash]
+            if not key_broken:
+                digests.append(get_key_digest(key))
+            self._add_to_index(key_data, digests)
         elif config.cmodule.warn_no_version:
             key_flat = flatten(key)
             ops = [k for k in key_flat if isinstance(k, theano.Op)]
@@ -1122,7 +1389,7 @@ class ModuleCache(object):
         if module is not None:
             return module
 
-        with compilelock.lock_ctx(keep_lock=keep_lock):
+        with self._lock_ctx([module_hash], keep_lock=keep_lock):
             # 1) Maybe somebody else compiled it for us while we
             #    where waiting for the lock. Try to load it again.
             # 2) If other repo that import Theano have Theano ops defined,
@@ -1137,7 +1404,10 @@ class ModuleCache(object):
             #    compilation to skip them, but not for future
             #    compilations. So reloading the cache here
             #    compilation fixes this problem. (we could do that only once)
-            self.refresh(cleanup=False)
+            #    With the cache index, the lookups below only load the
+            #    entries of this key instead.
+            if not config.cmodule.use_index:
+                self.refresh(cleanup=False)
 
             module = self._get_from_key(key)
             if module is not None:
@@ -1152,7 +1422,14 @@ class ModuleCache(object):
             nocleanup = False
             try:
                 location = dlimport_workdir(self.dirname)
-                module = lnk.compile_cmodule(location)
+                if config.cmodule.lock_per_module:
+                    # Don't take the lock of the whole compilation directory.
+                    lib = lnk.compile_cmodule(location, py_module=False)
+                    # touch the __init__ file
+                    open(os.path.join(location, "__init__.py"), 'w').close()
+                    module = dlimport(lib)
+                else:
+                    module = lnk.compile_cmodule(location)
                 name = module.__file__
                 assert name.startswith(location)
                 assert name not in self.module_from_name
@@ -1180,6 +1457,171 @@ class ModuleCache(object):
         self.stats[2] += 1
         return module
 
+    def modules_from_keys(self, keys_lnks, n_workers=None, keep_lock=False):
+        """
+        Return the modules of many keys, compiling the missing ones
+        concurrently.
+
+        All the keys missing from the cache are collected first. Then,
+        while holding the compilation lock once, their modules are built
+        by up to `n_workers` compiler processes and dlimported together.
+        If config.cmodule.unity_build is greater than 1, the modules that
+        use the same compiler flags are linked by groups of that size in
+        one shared library each.
+
+        Parameters
+        ----------
+        keys_lnks
+            List of (key, lnk) pairs, as accepted by `module_from_key`. The
+            linkers must also accept a `py_module` argument in
+            `compile_cmodule(location, py_module)`, like `CLinker` does.
+        n_workers : int
+            Maximum number of concurrent compilations. Defaults to
+            config.cmodule.compile_workers.
+        keep_lock : bool
+            If True, the compilation lock will not be released if taken.
+
+        Returns
+        -------
+        list
+            The module of each key, in the same order. The entry is None for
+            the linkers that can't generate C code.
+
+        """
+        if n_workers is None:
+            n_workers = config.cmodule.compile_workers
+        modules = [None] * len(keys_lnks)
+        # Maps each missing key to its linker and positions in keys_lnks.
+        # The source code is generated only once for equal keys.
+        missing = {}
+        for i, (key, lnk) in enumerate(keys_lnks):
+            if key in missing:
+                missing[key][1].append(i)
+                continue
+            module = self._get_from_key(key)
+            if module is not None:
+                modules[i] = module
+            else:
+                missing[key] = (lnk, [i])
+        if not missing:
+            return modules
+
+        # Maps each module hash to the keys that share it.
+        by_hash = {}
+        for key, (lnk, idx) in iteritems(missing):
+            try:
+                src_code = lnk.get_src_code()
+            except (NotImplementedError, MethodNotDefined):
+                continue
+            by_hash.setdefault(get_module_hash(src_code, key), []).append(key)
+
+        with self._lock_ctx(list(by_hash), keep_lock=keep_lock):
+            # Somebody else may have compiled some of them while we were
+            # waiting for the lock. See `module_from_key`.
+            if not config.cmodule.use_index:
+                self.refresh(cleanup=False)
+            jobs = []
+            for module_hash, keys in iteritems(by_hash):
+                key = keys[0]
+                module = self._get_from_key(key)
+                if module is None:
+                    module = self._get_from_hash(module_hash, key)
+                if module is None:
+                    jobs.append((module_hash, key,
+                                 dlimport_workdir(self.dirname)))
+
+            # Group the jobs of the modules that can be linked in the same
+            # shared library. Each group is built by one compiler process.
+            unity_build = config.cmodule.unity_build
+            groups = []
+            open_groups = {}
+            for job in jobs:
+                lnk = missing[job[1]][0]
+                settings = None
+                if unity_build > 1 and hasattr(lnk, 'compile_settings'):
+                    settings = lnk.compile_settings()
+                    if not hasattr(settings[0], 'compile_str_unity'):
+                        settings = None
+                if settings is None:
+                    groups.append([job])
+                    continue
+                group = open_groups.get(settings)
+                if group is None or len(group) >= unity_build:
+                    group = open_groups[settings] = []
+                    groups.append(group)
+                group.append(job)
+
+            def build_one(job):
+                module_hash, key, location = job
+                try:
+                    return missing[key][0].compile_cmodule(location,
+                                                           py_module=False)
+                except Exception as e:
+                    return e
+
+            def build(group):
+                if len(group) == 1:
+                    return [build_one(group[0])]
+                lnks = [missing[key][0] for _, key, _ in group]
+                (c_compiler, include_dirs, lib_dirs, libs,
+                 preargs) = lnks[0].compile_settings()
+                try:
+                    return c_compiler.compile_str_unity(
+                        module_names=[lnk.get_dynamic_module().code_hash
+                                      for lnk in lnks],
+                        src_codes=[lnk.get_src_code() for lnk in lnks],
+                        locations=[location for _, _, location in group],
+                        include_dirs=list(include_dirs),
+                        lib_dirs=list(lib_dirs),
+                        libs=list(libs),
+                        preargs=list(preargs))
+                except Exception:
+                    # E.g. the support code of two modules defines the
+                    # same symbol.
+                    _logger.debug('Could not link %d modules in one shared '
+                                  'library, building them one by one.',
+                                  len(group), exc_info=True)
+                    return [build_one(job) for job in group]
+
+            if len(groups) > 1 and n_workers > 1:
+                pool = ThreadPool(min(n_workers, len(groups)))
+                try:
+                    group_libs = pool.map(build, groups)
+                finally:
+                    pool.close()
+                    pool.join()
+            else:
+                group_libs = [build(group) for group in groups]
+            jobs = [job for group in groups for job in group]
+            libs = [lib for group_lib in group_libs for lib in group_lib]
+
+            error = None
+            for (module_hash, key, location), lib in zip(jobs, libs):
+                if isinstance(lib, Exception):
+                    _rmtree(location, ignore_if_missing=True,
+                            msg='exception during compilation')
+                    if error is None:
+                        error = lib
+                    continue
+                # touch the __init__ file
+                open(os.path.join(location, "__init__.py"), 'w').close()
+                module = dlimport(lib)
+                self.module_from_name[module.__file__] = module
+                key_data = self._add_to_cache(module, key, module_hash)
+                self.module_hash_to_key_data[module_hash] = key_data
+                self.stats[2] += 1
+            if error is not None:
+                raise error
+
+            for module_hash, keys in iteritems(by_hash):
+                for key in keys:
+                    module = self._get_from_key(key)
+                    if module is None:
+                        module = self._get_from_hash(module_hash, key)
+                    for i in missing[key][1]:
+                        modules[i] = module
+        return modules
+
     def check_key(self, key, key_pkl):
         """
         Perform checks to detect broken __eq__ / __hash__ implementations.
@@ -1306,6 +1748,7 @@ class ModuleCache(object):
                 assert parent.startswith(os.path.join(self.dirname, 'tmp'))
                 _rmtree(parent, msg='old cache directory', level=logging.INFO,
                         ignore_nocleanup=True)
+            self._rebuild_index()
 
     def clear(self, unversioned_min_age=None, clear_base_files=False,
               delete_if_problem=False):
@@ -1477,7 +1920,10 @@ class ModuleCache(object):
 
         # Note: for clear_old(), as this happen unfrequently, we only
         # take the lock when it happen.
-        self.clear_old()
+        # With the cache index, we do not walk the whole cache at exit:
+        # old modules are only deleted by `theano-cache cleanup`.
+        if not config.cmodule.use_index:
+            self.clear_old()
         self.clear_unversioned()
         _logger.debug('Time spent checking keys: %s',
                       self.time_spent_in_check_key)
@@ -2221,6 +2667,97 @@ class GCC_compiler(Compiler):
         if not theano.config.cxx:
             raise MissingGXX("g++ not available! We can't compile c code.")
 
+        cppfilename = os.path.join(location, 'mod.cpp')
+        with open(cppfilename, 'w') as cppfile:
+
+            _logger.debug('Writing module C++ code to %s', cppfilename)
+
+            cppfile.write(src_code)
+            # Avoid gcc warning "no newline at end of file".
+            if not src_code.endswith('\n'):
+                cppfile.write('\n')
+
+        lib_filename = os.path.join(
+            location,
+            '%s.%s' % (module_name, get_lib_extension()))
+
+        GCC_compiler._build_shared_lib(
+            lib_filename, [cppfilename], [src_code], include_dirs,
+            lib_dirs, libs, preargs, hide_symbols)
+
+        if py_module:
+            # touch the __init__ file
+            open(os.path.join(location, "__init__.py"), 'w').close()
+            assert os.path.isfile(lib_filename)
+            return dlimport(lib_filename)
+
+    @staticmethod
+    def compile_str_unity(module_names, src_codes, locations,
+                          include_dirs=None, lib_dirs=None, libs=None,
+                          preargs=None, hide_symbols=True):
+        """
+        Build the code of several modules into a single shared library.
+
+        Each module is written to the `mod.cpp` file of its location and
+        compiled as its own translation unit, as the support code of the
+        ops is not meant to share one, but a single compiler process links
+        them all. The library is built in the first location and hard
+        linked (or copied if that is not supported) in the other ones, so
+        that each module directory holds a library named after its module,
+        which exports the init function of every module.
+
+        Parameters are the same as in `compile_str`, but `module_names`,
+        `src_codes` and `locations` are lists with one entry per module.
+
+        Returns
+        -------
+        list of str
+            The path of the shared library in each location.
+
+        """
+        if not theano.config.cxx:
+            raise MissingGXX("g++ not available! We can't compile c code.")
+        assert len(module_names) == len(src_codes) == len(locations)
+
+        cppfilenames = []
+        for src_code, location in zip(src_codes, locations):
+            cppfilename = os.path.join(location, 'mod.cpp')
+            with open(cppfilename, 'w') as cppfile:
+                _logger.debug('Writing module C++ code to %s', cppfilename)
+                cppfile.write(src_code)
+                if not src_code.endswith('\n'):
+                    cppfile.write('\n')
+            cppfilenames.append(cppfilename)
+
+        lib_filenames = [
+            os.path.join(location, '%s.%s' % (name, get_lib_extension()))
+            for name, location in zip(module_names, locations)]
+        # A failure is not reported: the caller builds the modules one by
+        # one then, which reports the errors of each module.
+        GCC_compiler._build_shared_lib(
+            lib_filenames[0], cppfilenames, src_codes, include_dirs,
+            lib_dirs, libs, preargs, hide_symbols, quiet=True)
+        for lib_filename in lib_filenames[1:]:
+            try:
+                os.link(lib_filenames[0], lib_filename)
+            except (OSError, AttributeError):
+                # The file system, or Python 2 on Windows, does not
+                # support hard links.
+                shutil.copyfile(lib_filenames[0], lib_filename)
+        return lib_filenames
+
+    @staticmethod
+    def _build_shared_lib(lib_filename, cppfilenames, src_codes,
+                          include_dirs=None, lib_dirs=None, libs=None,
+                          preargs=None, hide_symbols=True, quiet=False):
+        """
+        Run the compiler to build `lib_filename` from `cppfilenames`.
+
+        `src_codes` are the contents of `cppfilenames`, printed if the
+        compilation fails. If `quiet` is True, nothing is printed, and the
+        errors are only logged at the debug level.
+
+        """
         if include_dirs is None:
             include_dirs = []
         if lib_dirs is None:
@@ -2238,20 +2775,6 @@ class GCC_compiler(Compiler):
         libs = libs + std_libs()
         lib_dirs = lib_dirs + std_lib_dirs()
 
-        cppfilename = os.path.join(location, 'mod.cpp')
-        with open(cppfilename, 'w') as cppfile:
-
-            _logger.debug('Writing module C++ code to %s', cppfilename)
-
-            cppfile.write(src_code)
-            # Avoid gcc warning "no newline at end of file".
-            if not src_code.endswith('\n'):
-                cppfile.write('\n')
-
-        lib_filename = os.path.join(
-            location,
-            '%s.%s' % (module_name, get_lib_extension()))
-
         _logger.debug('Generating shared lib %s', lib_filename)
         cmd = [theano.config.cxx, get_gcc_shared_library_arg(), '-g']
 
@@ -2272,13 +2795,17 @@ class GCC_compiler(Compiler):
             # different, as usual).
             cmd.append('-fvisibility=hidden')
         cmd.extend(['-o', lib_filename])
-        cmd.append(cppfilename)
+        cmd.extend(cppfilenames)
         cmd.extend(['-l%s' % l for l in libs])
         # print >> sys.stderr, 'COMPILING W CMD', cmd
         _logger.debug('Running cmd: %s', ' '.join(cmd))
 
         def print_command_line_error():
             # Print command line when a problem occurred.
+            if quiet:
+                _logger.debug('Compilation failed with the command line: %s',
+                              ' '.join(cmd))
+                return
             print(("Problem occurred during compilation with the "
                    "command line below:"), file=sys.stderr)
             print(' '.join(cmd), file=sys.stderr)
@@ -2294,14 +2821,21 @@ class GCC_compiler(Compiler):
         status = p_out[2]
 
         if status:
-            print('===============================')
-            for i, l in enumerate(src_code.split('\n')):
-                # gcc put its messages to stderr, so we add ours now
-                print('%05i\t%s' % (i + 1, l), file=sys.stderr)
-            print('===============================')
-            print_command_line_error()
-            # Print errors just below the command line.
-            print(compile_stderr)
+            if quiet:
+                print_command_line_error()
+                _logger.debug('Compiler output: %s', compile_stderr)
+            else:
+                print('===============================')
+                for cppfilename, src_code in zip(cppfilenames, src_codes):
+                    if len(cppfilenames) > 1:
+                        print(cppfilename, file=sys.stderr)
+                    for i, l in enumerate(src_code.split('\n')):
+                        # gcc put its messages to stderr, so we add ours now
+                        print('%05i\t%s' % (i + 1, l), file=sys.stderr)
+                print('===============================')
+                print_command_line_error()
+                # Print errors just below the command line.
+                print(compile_stderr)
             # We replace '\n' by '. ' in the error message because when Python
             # prints the exception, having '\n' in the text makes it more
             # difficult to read.
@@ -2311,12 +2845,6 @@ class GCC_compiler(Compiler):
             # Print errors just below the command line.
             print(compile_stderr)
 
-        if py_module:
-            # touch the __init__ file
-            open(os.path.join(location, "__init__.py"), 'w').close()
-            assert os.path.isfile(lib_filename)
-            return dlimport(lib_filename)
-
 
 def icc_module_compile_str(*args):
     raise NotImplementedError()
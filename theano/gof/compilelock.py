@@ -5,6 +5,7 @@ from __future__ import absolute_import, print_function, division
 import atexit
 import os
 import socket  # only used for gethostname()
+import threading
 import time
 import logging
 
@@ -24,6 +25,26 @@ if _logger.level == logging.NOTSET:
 
 hostname = socket.gethostname()
 
+lock_wait_time = 0.0
+"""
+Total time (in seconds) this process spent waiting to acquire compilation
+locks.
+
+"""
+
+# Only one thread of the process may hold the lock on the compilation
+# directory at a time. The other ones wait on this lock before trying to
+# acquire it.
+_thread_lock = threading.RLock()
+
+# Maps the (thread id, directory) of each module lock held by this process
+# to the number of times that thread requested it. It is only accessed while
+# holding `_module_locks_lock`.
+_module_locks = {}
+_module_locks_lock = threading.Lock()
+# The thread refreshing the module locks held by this process, if running.
+_module_locks_refresher = None
+
 
 def force_unlock():
     """
@@ -42,6 +63,108 @@ def lock_ctx(lock_dir=None, keep_lock=False, **kw):
         release_lock()
 
 
+@contextmanager
+def module_lock_ctx(names, **kw):
+    """
+    Lock the compilation of the modules in `names` only.
+
+    Unlike `lock_ctx`, which locks the whole compilation directory, only
+    the processes asking for one of the same names (usually module
+    hashes) wait for each other, as well as the threads of a process. The
+    locks are acquired in sorted order, to avoid deadlocks, and are
+    reentrant within a thread. They are refreshed by a thread of the
+    process while held.
+
+    The module locks don't exclude the lock of the whole compilation
+    directory: all the processes sharing a compilation directory must use
+    the same `config.cmodule.lock_per_module` value.
+
+    Parameters
+    ----------
+    names
+        List of strings identifying the modules to lock.
+    kw
+        Additional arguments to be forwarded to the `lock` function when
+        acquiring the locks.
+
+    """
+    lock_dirs = [os.path.join(config.compiledir, 'module_locks', name)
+                 for name in sorted(set(names))]
+    thread_id = threading.current_thread().ident
+    acquired = []
+    try:
+        for lock_dir in lock_dirs:
+            key = (thread_id, lock_dir)
+            with _module_locks_lock:
+                n_lock = _module_locks.get(key, 0)
+            # Don't hold `_module_locks_lock` while waiting for the lock, as
+            # the thread owning it needs it to release the lock.
+            if n_lock == 0 and getattr(get_lock, 'lock_is_enabled', True):
+                lock(lock_dir, **kw)
+            with _module_locks_lock:
+                _module_locks[key] = n_lock + 1
+                _start_module_locks_refresher()
+            acquired.append(key)
+        yield
+    finally:
+        for key in reversed(acquired):
+            with _module_locks_lock:
+                _module_locks[key] -= 1
+                if _module_locks[key] == 0:
+                    del _module_locks[key]
+                    # Unlock while holding `_module_locks_lock`, so that
+                    # the refresher doesn't write in a released lock.
+                    if getattr(get_lock, 'lock_is_enabled', True):
+                        Unlocker(key[1]).unlock(force=False)
+
+
+def _start_module_locks_refresher():
+    # Start the thread refreshing the module locks, unless it is running.
+    # Must be called while holding `_module_locks_lock`.
+    global _module_locks_refresher
+    if (_module_locks_refresher is None and config.compile.timeout and
+            getattr(get_lock, 'lock_is_enabled', True)):
+        _module_locks_refresher = threading.Thread(
+            target=_module_locks_refresher_loop)
+        _module_locks_refresher.daemon = True
+        _module_locks_refresher.start()
+
+
+def _module_locks_refresher_loop():
+    # Like `get_lock` does for the lock of the compilation directory, the
+    # module locks are refreshed every 'config.compile.timeout / 2' seconds
+    # while they are held, so that no one else overrides them after their
+    # 'config.compile.timeout' timeout period. The thread stops once this
+    # process holds no module lock.
+    global _module_locks_refresher
+    while True:
+        time.sleep(config.compile.timeout / 2.)
+        with _module_locks_lock:
+            if not _module_locks:
+                _module_locks_refresher = None
+                return
+            _refresh_module_locks()
+
+
+def _refresh_module_locks():
+    # Refresh the module locks held by this process. Must be called while
+    # holding `_module_locks_lock`.
+    for lock_dir in set(lock_dir for _, lock_dir in _module_locks):
+        lock_file = os.path.join(lock_dir, 'lock')
+        try:
+            with open(lock_file) as f:
+                pid, _, hname = f.readlines()[0].strip().split('_')
+            if pid != str(os.getpid()) or hname != hostname:
+                # Someone else overrode it.
+                continue
+            _logger.debug('Refreshing lock %s', lock_file)
+            with open(lock_file, 'w') as f:
+                f.write(_unique_id() + '\n')
+        except Exception:
+            _logger.warning('Refreshing lock %s failed', lock_file,
+                            exc_info=True)
+
+
 # We define this name with an underscore so that python shutdown
 # deletes this before non-underscore names (like os).  We need to do
 # it this way to avoid errors on shutdown.
@@ -57,11 +180,24 @@ def _get_lock(lock_dir=None, **kw):
 
     Notes
     -----
-    We can lock only on 1 directory at a time.
+    We can lock only on 1 directory at a time. Only one thread of the
+    process holds the lock at a time: the other ones wait for it to be
+    released, which serializes the compilations of the threads.
 
     """
     if lock_dir is None:
         lock_dir = os.path.join(config.compiledir, 'lock_dir')
+    _thread_lock.acquire()
+    try:
+        _get_lock_in_thread(lock_dir, **kw)
+    except Exception:
+        _thread_lock.release()
+        raise
+    get_lock.owner = threading.current_thread().ident
+
+
+def _get_lock_in_thread(lock_dir, **kw):
+    # The part of `get_lock` run while holding `_thread_lock`.
     if not hasattr(get_lock, 'n_lock'):
         # Initialization.
         get_lock.n_lock = 0
@@ -117,10 +253,24 @@ def release_lock():
     """
     get_lock.n_lock -= 1
     assert get_lock.n_lock >= 0
+    if get_lock.n_lock == 0:
+        get_lock.owner = None
     # Only really release lock once all lock requests have ended.
     if get_lock.lock_is_enabled and get_lock.n_lock == 0:
         get_lock.start_time = None
         get_lock.unlocker.unlock(force=False)
+    _thread_lock.release()
+
+
+def lock_count():
+    """
+    Return the number of times the current thread took the lock on the
+    compilation directory and did not release it yet.
+
+    """
+    if getattr(get_lock, 'owner', None) != threading.current_thread().ident:
+        return 0
+    return get_lock.n_lock
 
 
 def set_lock_status(use_lock):
@@ -178,12 +328,14 @@ def lock(tmp_dir, timeout=notset, min_wait=None, max_wait=None, verbosity=1):
         Amount of feedback displayed to screen (default 1).
 
     """
+    global lock_wait_time
     if min_wait is None:
         min_wait = config.compile.wait
     if max_wait is None:
         max_wait = min_wait * 2
     if timeout is notset:
         timeout = config.compile.timeout
+    lock_start = time.time()
     # Create base of lock directory if required.
     base_lock = os.path.dirname(tmp_dir)
     if not os.path.isdir(base_lock):
@@ -238,7 +390,7 @@ def lock(tmp_dir, timeout=notset, min_wait=None, max_wait=None, verbosity=1):
                         msg = "process '%s'" % read_owner.split('_')[0]
                         _logger.warning("Overriding existing lock by dead %s "
                                         "(I am process '%s')", msg, my_pid)
-                    get_lock.unlocker.unlock(force=True)
+                    Unlocker(tmp_dir).unlock(force=True)
                     continue
                 if last_owner == read_owner:
                     if (timeout is not None and
@@ -251,7 +403,7 @@ def lock(tmp_dir, timeout=notset, min_wait=None, max_wait=None, verbosity=1):
                                 msg = "process '%s'" % read_owner.split('_')[0]
                             _logger.warning("Overriding existing lock by %s "
                                             "(I am process '%s')", msg, my_pid)
-                        get_lock.unlocker.unlock(force=True)
+                        Unlocker(tmp_dir).unlock(force=True)
                         continue
                 else:
                     last_owner = read_owner
@@ -297,6 +449,7 @@ def lock(tmp_dir, timeout=notset, min_wait=None, max_wait=None, verbosity=1):
                 continue
             else:
                 # We got the lock, hoorray!
+                lock_wait_time += time.time() - lock_start
                 return
 
         except Exception as e:
@@ -309,16 +462,21 @@ def lock(tmp_dir, timeout=notset, min_wait=None, max_wait=None, verbosity=1):
             continue
 
 
+def _unique_id():
+    # A new unique id of this process, to be written in its lock files.
+    return '%s_%s_%s' % (
+        os.getpid(),
+        ''.join([str(random.randint(0, 9)) for i in range(10)]),
+        hostname)
+
+
 def refresh_lock(lock_file):
     """
     'Refresh' an existing lock by re-writing the file containing the owner's
     unique id, using a new (randomly generated) id, which is also returned.
 
     """
-    unique_id = '%s_%s_%s' % (
-        os.getpid(),
-        ''.join([str(random.randint(0, 9)) for i in range(10)]),
-        hostname)
+    unique_id = _unique_id()
     try:
         with open(lock_file, 'w') as lock_write:
             lock_write.write(unique_id + '\n')
@@ -653,7 +653,9 @@ class DestroyHandler(toolbox.Bookkeeper):  # noqa
 
     It is a work in progress. The following data structures have been
     converted to use the incremental strategy:
-        <none>
+        position: a topological order of the Apply nodes, so that validate
+        only searches the ancestors of an edge that goes backward in that
+        order to look for cycles.
 
     The following data structures remain to be converted:
         <unknown>
@@ -738,6 +740,11 @@ class DestroyHandler(toolbox.Bookkeeper):  # noqa
         # clients: how many times does an apply use a given variable
         self.clients = OrderedDict()  # variable -> apply -> ninputs
         self.stale_droot = True
+        # apply -> its index in a topological order of the data dependencies
+        self.position = {}
+        self.next_position = 0
+        # False when a change introduced a cycle in the data dependencies
+        self.order_valid = True
 
         self.debug_all_apps = OrderedSet()
         if self.do_imports_on_attach:
@@ -772,6 +779,7 @@ class DestroyHandler(toolbox.Bookkeeper):  # noqa
         del self.view_o
         del self.clients
         del self.stale_droot
+        del self.position
         assert self.fgraph.destroyer_handler is self
         delattr(self.fgraph, 'destroyers')
         delattr(self.fgraph, 'destroy_handler')
@@ -811,6 +819,10 @@ class DestroyHandler(toolbox.Bookkeeper):  # noqa
         for i, output in enumerate(app.outputs):
             self.clients.setdefault(output, OrderedDict())
 
+        # The inputs of an imported node are already in the graph.
+        self.position[app] = self.next_position
+        self.next_position += 1
+
         self.stale_droot = True
 
     def on_prune(self, fgraph, app, reason):
@@ -848,6 +860,8 @@ class DestroyHandler(toolbox.Bookkeeper):  # noqa
             if not self.view_o[i]:
                 del self.view_o[i]
 
+        del self.position[app]
+
         self.stale_droot = True
 
     def on_change_input(self, fgraph, app, i, old_r, new_r, reason):
@@ -891,8 +905,83 @@ class DestroyHandler(toolbox.Bookkeeper):  # noqa
 
                     self.view_o.setdefault(new_r, OrderedSet()).add(output)
 
+            if (self.order_valid and new_r.owner is not None and
+                    not self._add_edge(new_r.owner, app)):
+                # The change will be reverted, and the order rebuilt at the
+                # next validation.
+                self.order_valid = False
+
         self.stale_droot = True
 
+    def _add_edge(self, u, v, ord_parents=None):
+        """
+        Update self.position after the addition of a dependency from Apply
+        `u` to Apply `v` (`u` must be computed before `v`).
+
+        When `u` comes after `v`, the nodes after `v` on which `u` depends
+        are moved just before `v`. Only them and their inputs are visited.
+        The dependencies followed are the ones of the data and the ones
+        given in `ord_parents` (apply -> list of applies).
+
+        Returns
+        -------
+        bool
+            False if the new dependency creates a cycle.
+
+        """
+        position = self.position
+        lower = position[v]
+        if position[u] < lower:
+            return True
+
+        # The nodes after v on which u depends, and the last position of
+        # their other parents.
+        backward = []
+        seen = set([u])
+        stack = [u]
+        last = None
+        while stack:
+            node = stack.pop()
+            backward.append(node)
+            parents = [inp.owner for inp in node.inputs
+                       if inp.owner is not None]
+            if ord_parents is not None:
+                parents.extend(ord_parents.get(node, ()))
+            for parent in parents:
+                if parent is v:
+                    return False
+                if parent in seen:
+                    continue
+                p = position[parent]
+                if p > lower:
+                    seen.add(parent)
+                    stack.append(parent)
+                elif last is None or p > last:
+                    last = p
+
+        # Their children are after them, so they can take any position
+        # between their other parents and v.
+        backward.sort(key=position.__getitem__)
+        n = len(backward)
+        if last is None:
+            last = lower - 1
+        step = (lower - last) / (n + 1.)
+        slots = [last + step * (k + 1) for k in range(n)]
+        if not (last < slots[0] and slots[-1] < lower and
+                all(a < b for a, b in zip(slots, slots[1:]))):
+            # No room left between the positions.
+            self._renumber()
+            return self._add_edge(u, v, ord_parents)
+        for slot, node in zip(slots, backward):
+            position[node] = slot
+        return True
+
+    def _renumber(self):
+        """Replace the positions by consecutive integers."""
+        order = sorted(self.position, key=self.position.__getitem__)
+        self.position = dict((app, i) for i, app in enumerate(order))
+        self.next_position = len(order)
+
     def validate(self, fgraph):
         """
         Return None.
@@ -905,8 +994,27 @@ class DestroyHandler(toolbox.Bookkeeper):  # noqa
         if self.destroyers:
             ords = self.orderings(fgraph)
 
-            if _contains_cycle(fgraph, ords):
-                raise InconsistencyError("Dependency graph contains cycles")
+            if not self.order_valid:
+                if _contains_cycle(fgraph, ords):
+                    raise InconsistencyError(
+                        "Dependency graph contains cycles")
+                self.position = dict(
+                    (app, i) for i, app in enumerate(
+                        graph.io_toposort(fgraph.inputs, fgraph.outputs)))
+                self.next_position = len(self.position)
+                self.order_valid = True
+                return True
+
+            # The order is valid for the data dependencies, add the
+            # orderings one by one. A new cycle must go through one of them,
+            # or it would have been found in on_change_input.
+            ord_parents = {}
+            for app, prereqs in iteritems(ords):
+                for prereq in prereqs:
+                    ord_parents.setdefault(app, []).append(prereq)
+                    if not self._add_edge(prereq, app, ord_parents):
+                        raise InconsistencyError(
+                            "Dependency graph contains cycles")
         else:
             # James's Conjecture:
             # If there are no destructive ops, then there can be no cycles.
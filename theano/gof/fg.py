@@ -550,6 +550,7 @@ class FunctionGraph(utils.object2):
 
         # Add the feature
         self._features.append(feature)
+        self._features_changed()
 
     def remove_feature(self, feature):
         """
@@ -567,6 +568,13 @@ class FunctionGraph(utils.object2):
         detach = getattr(feature, 'on_detach', None)
         if detach is not None:
             detach(self)
+        self._features_changed()
+
+    def _features_changed(self):
+        # The orderings of the features may have changed.
+        incremental = getattr(self, 'incremental_toposort', None)
+        if incremental is not None:
+            incremental.clear_cache()
 
     # callback utils #
     def execute_callbacks(self, name, *args, **kwargs):
@@ -620,6 +628,11 @@ class FunctionGraph(utils.object2):
         this FunctionGraph as sole argument. It should return a dictionary of
         `{node: predecessors}` where predecessors is a list of nodes that
         should be computed before the key node.
+
+        If the `IncrementalToposort` feature is attached, its order is
+        returned when it satisfies these orderings. The same list is then
+        returned until the graph or its features change, so it must not be
+        modified.
         """
         if len(self.apply_nodes) < 2:
             # optimization
@@ -629,6 +642,10 @@ class FunctionGraph(utils.object2):
             return list(self.apply_nodes)
         fg = self
 
+        incremental = getattr(self, 'incremental_toposort', None)
+        if incremental is not None:
+            return incremental.fgraph_toposort()
+
         ords = self.orderings()
 
         order = graph.io_toposort(fg.inputs, fg.outputs, ords)
@@ -765,7 +782,8 @@ class FunctionGraph(utils.object2):
 
         if attach_feature:
             for feature in self._features:
-                e.attach_feature(feature)
+                clone = getattr(feature, 'clone', None)
+                e.attach_feature(feature if clone is None else clone())
         return e, equiv
 
     def __getstate__(self):
@@ -6,6 +6,7 @@ from __future__ import absolute_import, print_function, division
 from collections import deque
 from copy import copy
 from itertools import count
+import weakref
 
 import theano
 from theano import config
@@ -21,6 +22,21 @@ equal_computations = None
 
 NoParams = object()
 
+# class -> names of the slots of its instances
+_slot_names = {}
+
+
+def _get_slot_names(cls):
+    names = _slot_names.get(cls)
+    if names is None:
+        names = []
+        for c in cls.__mro__:
+            for name in c.__dict__.get('__slots__', ()):
+                if name not in ('__dict__', '__weakref__', '_tag'):
+                    names.append(name)
+        _slot_names[cls] = names
+    return names
+
 
 class Node(utils.object2):
     """
@@ -32,8 +48,40 @@ class Node(utils.object2):
     Variable.owner / Apply.inputs and its children
     via Variable.clients / Apply.outputs.
 
+    The attributes of the nodes are stored in slots, so that nodes only
+    have a `__dict__` when other attributes are set on them. The `tag` is
+    only allocated when it is used.
+
     """
 
+    __slots__ = ('_tag', 'fgraph', '__dict__', '__weakref__')
+
+    def _get_tag(self):
+        tag = self._tag
+        if tag is None:
+            tag = self._tag = utils.scratchpad()
+        return tag
+
+    def _set_tag(self, tag):
+        self._tag = tag
+
+    tag = property(_get_tag, _set_tag, doc="scratchpad of the node")
+
+    def __getstate__(self):
+        d = self.__dict__.copy()
+        for name in _get_slot_names(type(self)):
+            try:
+                d[name] = getattr(self, name)
+            except AttributeError:
+                pass
+        d['tag'] = self._tag
+        return d
+
+    def __setstate__(self, d):
+        self._tag = None
+        for name, value in iteritems(d):
+            setattr(self, name, value)
+
     def get_parents(self):
         """
         Return a list of the parents of this node.
@@ -90,10 +138,12 @@ class Apply(Node):
 
     """
 
+    __slots__ = ('op', 'inputs', 'outputs', 'deps')
+
     def __init__(self, op, inputs, outputs):
         self.op = op
         self.inputs = []
-        self.tag = utils.scratchpad()
+        self._tag = None
 
         if not isinstance(inputs, (list, tuple)):
             raise TypeError("The inputs of an Apply must be a list or tuple")
@@ -130,11 +180,10 @@ class Apply(Node):
         return NoParams
 
     def __getstate__(self):
-        d = self.__dict__
+        d = super(Apply, self).__getstate__()
         # ufunc don't pickle/unpickle well
-        if hasattr(self.tag, 'ufunc'):
-            d = copy(self.__dict__)
-            t = d["tag"]
+        if self._tag is not None and hasattr(self._tag, 'ufunc'):
+            t = copy(self._tag)
             del t.ufunc
             d["tag"] = t
         return d
@@ -201,7 +250,8 @@ class Apply(Node):
         """
         cp = self.__class__(self.op, self.inputs,
                             [output.clone() for output in self.outputs])
-        cp.tag = copy(self.tag)
+        if self._tag is not None:
+            cp.tag = copy(self._tag)
         return cp
 
     def clone_with_new_inputs(self, inputs, strict=True):
@@ -368,13 +418,13 @@ class Variable(Node):
 
     """
 
-    # __slots__ = ['type', 'owner', 'index', 'name']
+    __slots__ = ('type', 'owner', 'index', 'name', '_auto_id', 'clients')
     __count__ = count(0)
 
     def __init__(self, type, owner=None, index=None, name=None):
         super(Variable, self).__init__()
 
-        self.tag = utils.scratchpad()
+        self._tag = None
         self.type = type
         if owner is not None and not isinstance(owner, Apply):
             raise TypeError("owner must be an Apply instance", owner)
@@ -385,7 +435,15 @@ class Variable(Node):
         if name is not None and not isinstance(name, string_types):
             raise TypeError("name must be a string", name)
         self.name = name
-        self.auto_name = 'auto_' + str(next(self.__count__))
+        self._auto_id = next(self.__count__)
+
+    def _get_auto_name(self):
+        return 'auto_%s' % self._auto_id
+
+    def _set_auto_name(self, auto_name):
+        self._auto_id = auto_name[len('auto_'):]
+
+    auto_name = property(_get_auto_name, _set_auto_name)
 
     def __str__(self):
         """Return a str representation of the Variable.
@@ -445,7 +503,8 @@ class Variable(Node):
         """
         # return copy(self)
         cp = self.__class__(self.type, None, None, self.name)
-        cp.tag = copy(self.tag)
+        if self._tag is not None:
+            cp.tag = copy(self._tag)
         return cp
 
     def __lt__(self, other):
@@ -521,7 +580,7 @@ class Variable(Node):
         return rval
 
     def __getstate__(self):
-        d = self.__dict__.copy()
+        d = super(Variable, self).__getstate__()
         d.pop("_fn_cache", None)
         return d
 
@@ -543,7 +602,8 @@ class Constant(Variable):
 
     """
 
-    # __slots__ = ['data']
+    __slots__ = ('data',)
+
     def __init__(self, type, data, name=None):
         Variable.__init__(self, type, None, None, name)
         self.data = type.filter(data)
@@ -575,7 +635,8 @@ class Constant(Variable):
 
         """
         cp = self.__class__(self.type, self.data, self.name)
-        cp.tag = copy(self.tag)
+        if self._tag is not None:
+            cp.tag = copy(self._tag)
         return cp
 
     def __set_owner(self, value):
@@ -597,6 +658,74 @@ class Constant(Variable):
     # index is not defined, because the `owner` attribute must necessarily be None
 
 
+# (op, keys of the inputs) -> Apply, see `intern_apply`.
+_interned_applies = weakref.WeakValueDictionary()
+
+
+def _intern_key(node):
+    # The key of `node` in `_interned_applies`, or None if it can't be
+    # shared.
+    key = [node.op]
+    for i in node.inputs:
+        if getattr(i, 'fgraph', None) is not None:
+            return None
+        if isinstance(i, Constant):
+            key.append(i.merge_signature())
+        else:
+            key.append(id(i))
+    return tuple(key)
+
+
+def intern_apply(node):
+    """
+    Return an existing Apply node equivalent to `node`, or register `node`.
+
+    Two nodes are equivalent if their ops are equal and their inputs are the
+    same variables, or constants with the same signature, like for the
+    MergeOptimizer. Only nodes that are still alive are returned. Nodes
+    whose op has a `destroy_map` are never shared, nor are nodes of a
+    FunctionGraph. Nothing is shared while an optimizer runs, as
+    optimizers expect the nodes they build to be new.
+
+    This is used by `Op.__call__` when `config.hash_consing` is True.
+
+    Parameters
+    ----------
+    node : Apply
+
+    Returns
+    -------
+    Apply
+        `node`, or an equivalent node built before.
+
+    """
+    if not intern_apply.enable or getattr(node.op, 'destroy_map', None):
+        return node
+    key = _intern_key(node)
+    if key is None:
+        return node
+    try:
+        other = _interned_applies.get(key)
+        if other is None:
+            _interned_applies[key] = node
+            return node
+    except TypeError:
+        # Unhashable op or constant.
+        return node
+    if getattr(other, 'fgraph', None) is not None:
+        return node
+    if _intern_key(other) != key:
+        # The inputs of `other` were changed since it was registered, e.g.
+        # by a FunctionGraph built with clone=False.
+        _interned_applies[key] = node
+        return node
+    if len(other.outputs) != len(node.outputs) or any(
+            o1.type != o2.type for o1, o2 in zip(other.outputs, node.outputs)):
+        return node
+    return other
+intern_apply.enable = True
+
+
 def stack_search(start, expand, mode='bfs', build_inv=False):
     """
     Search through a graph, either breadth- or depth-first.
@@ -1350,3 +1479,65 @@ def list_of_nodes(inputs, outputs):
         lambda o: [inp.owner for inp in o.inputs
                    if inp.owner and
                    not any(i in inp.owner.outputs for i in inputs)])
+
+
+def structural_hash(inputs, outputs):
+    """
+    Return a hash of the structure of the graph between inputs and outputs.
+
+    The hash does not depend on the identity or the name of the variables:
+    inputs are identified by their position in `inputs` and the other
+    variables by their position in the topological order of the graph.
+    Constants are identified by their type and the hash of their data.
+
+    Two graphs with the same hash perform the same computation with high
+    probability. Use `equal_computations` from
+    `theano.scan_module.scan_utils` to check it.
+
+    Parameters
+    ----------
+    inputs : list of Variable
+        The inputs of the graph.
+    outputs : list of Variable
+        The outputs of the graph.
+
+    Returns
+    -------
+    str
+        The md5 hex digest of the structure of the graph.
+
+    """
+    ids = {}
+    for i, inp in enumerate(inputs):
+        ids[inp] = 'i%d' % i
+    lines = ['%s: %s' % (ids[inp], inp.type) for inp in inputs]
+
+    def add_orphan(var):
+        # An orphan is typically a constant.
+        ids[var] = 'c%d' % len(lines)
+        if isinstance(var, Constant):
+            sig = var.signature()
+            if hasattr(sig, 'theano_hash'):
+                data = sig.theano_hash()
+            else:
+                data = utils.hash_from_code(repr(var.data))
+            lines.append('%s: %s{%s}' % (ids[var], var.type, data))
+        else:
+            lines.append('%s: %s' % (ids[var], var.type))
+
+    for n, node in enumerate(io_toposort(inputs, outputs)):
+        for inp in node.inputs:
+            if inp not in ids:
+                add_orphan(inp)
+        for k, out in enumerate(node.outputs):
+            ids[out] = 'n%d.%d' % (n, k)
+        op = node.op
+        lines.append('n%d: %s.%s{%s}(%s) -> %s' % (
+            n, type(op).__module__, type(op).__name__, op,
+            ', '.join(ids[inp] for inp in node.inputs),
+            ', '.join(str(out.type) for out in node.outputs)))
+    for out in outputs:
+        if out not in ids:
+            add_orphan(out)
+    lines.append('outputs: %s' % ', '.join(ids[out] for out in outputs))
+    return utils.hash_from_code('\n'.join(lines))
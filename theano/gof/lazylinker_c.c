@@ -111,6 +111,7 @@ typedef struct {
     void ** thunk_cptr_data;
     PyObject * call_times;
     PyObject * call_counts;
+    PyObject * timeline; // NULL, None or a list of (node_idx, start, end)
     int do_timing;
     int need_update_inputs;
     int position_of_error; // -1 for no error, otw the index into `thunks` that failed.
@@ -172,6 +173,7 @@ CLazyLinker_dealloc(PyObject* _self)
   Py_XDECREF(self->thunks);
   Py_XDECREF(self->call_times);
   Py_XDECREF(self->call_counts);
+  Py_XDECREF(self->timeline);
   Py_XDECREF(self->pre_call_clear);
   Py_TYPE(self)->tp_free((PyObject*)self);
 }
@@ -218,6 +220,7 @@ CLazyLinker_new(PyTypeObject *type, PyObject *args, PyObject *kwds)
       self->thunk_cptr_fn = NULL;
       self->call_times = NULL;
       self->call_counts = NULL;
+      self->timeline = NULL;
       self->do_timing = 0;
 
       self->need_update_inputs = 0;
@@ -477,6 +480,19 @@ static void set_position_of_error(CLazyLinker * self, int owner_idx)
       self->position_of_error = owner_idx;
     }
 }
+static int record_timeline(CLazyLinker * self, Py_ssize_t node_idx,
+                           double t0, double t1)
+{
+  // Append (node_idx, t0, t1) to self->timeline, if it is a list.
+  if (!self->timeline || self->timeline == Py_None)
+    return 0;
+  PyObject * event = Py_BuildValue("(ndd)", node_idx, t0, t1);
+  if (!event)
+    return -1;
+  int err = PyList_Append(self->timeline, event);
+  Py_DECREF(event);
+  return err;
+}
 static PyObject * pycall(CLazyLinker * self, Py_ssize_t node_idx, int verbose)
 {
   // call thunk to see which inputs it wants
@@ -499,6 +515,11 @@ static PyObject * pycall(CLazyLinker * self, Py_ssize_t node_idx, int verbose)
           long icount = PyInt_AsLong(count);
           PyList_SetItem(self->call_counts, node_idx,
                          PyInt_FromLong(icount + 1));
+          if (record_timeline(self, node_idx, t0, t1))
+            {
+              Py_DECREF(rval);
+              rval = NULL;
+            }
       }
     }
   else
@@ -527,6 +548,8 @@ static int c_call(CLazyLinker * self, Py_ssize_t node_idx, int verbose)
       PyObject * count = PyList_GetItem(self->call_counts, node_idx);
       long icount = PyInt_AsLong(count);
       PyList_SetItem(self->call_counts, node_idx, PyInt_FromLong(icount+1));
+      if (!err && record_timeline(self, node_idx, t0, t1))
+        return -1; // the Python error is already set
     }
   else
     {
@@ -999,6 +1022,8 @@ static PyMemberDef CLazyLinker_members[] = {
      (char*)"total runtime in each thunk"},
     {(char*)"position_of_error", T_INT, offsetof(CLazyLinker, position_of_error), 0,
      (char*)"position of failed thunk"},
+    {(char*)"timeline", T_OBJECT, offsetof(CLazyLinker, timeline), 0,
+     (char*)"None or list to which the timed calls append (node_idx, start, end)"},
     {(char*)"time_thunks", T_INT, offsetof(CLazyLinker, do_timing), 0,
      (char*)"bool: nonzero means call will time thunks"},
     {(char*)"need_update_inputs", T_INT, offsetof(CLazyLinker, need_update_inputs), 0,
@@ -1054,7 +1079,7 @@ static PyTypeObject lazylinker_ext_CLazyLinkerType = {
 
 static PyObject * get_version(PyObject *dummy, PyObject *args)
 {
-  PyObject *result = PyFloat_FromDouble(0.211);
+  PyObject *result = PyFloat_FromDouble(0.212);
   return result;
 }
 
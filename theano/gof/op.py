@@ -602,6 +602,8 @@ class PureOp(object):
         """
         return_list = kwargs.pop('return_list', False)
         node = self.make_node(*inputs, **kwargs)
+        if config.hash_consing:
+            node = graph.intern_apply(node)
 
         if config.compute_test_value != 'off':
             run_perform = True
@@ -798,13 +800,15 @@ class Op(utils.object2, PureOp, CLinkerOp):
         """
         pass
 
-    def make_c_thunk(self, node, storage_map, compute_map, no_recycling):
-        """Like make_thunk, but will only try to make a C thunk.
-
+    def _make_c_linker(self, node, no_recycling):
         """
-        node_input_storage = [storage_map[r] for r in node.inputs]
-        node_output_storage = [storage_map[r] for r in node.outputs]
+        Return the CLinker compiling the C code of `node` for
+        `make_c_thunk`.
+
+        Raise NotImplementedError if `node` uses float16 and the Op does
+        not support it.
 
+        """
         # float16 gets special treatment since running
         # unprepared C code will get bad results.
         if not getattr(self, '_f16_ok', False):
@@ -813,15 +817,27 @@ class Op(utils.object2, PureOp, CLinkerOp):
 
             if (any(is_f16(i.type) for i in node.inputs) or
                     any(is_f16(o.type) for o in node.outputs)):
-                print("Disabling C code for %s due to unsupported "
-                      "float16" % (self,))
                 raise NotImplementedError("float16")
         e = FunctionGraph(node.inputs, node.outputs)
         e_no_recycling = [new_o
                           for (new_o, old_o) in zip(e.outputs, node.outputs)
                           if old_o in no_recycling]
-        cl = theano.gof.cc.CLinker().accept(e,
-                                            no_recycling=e_no_recycling)
+        return theano.gof.cc.CLinker().accept(e,
+                                              no_recycling=e_no_recycling)
+
+    def make_c_thunk(self, node, storage_map, compute_map, no_recycling):
+        """Like make_thunk, but will only try to make a C thunk.
+
+        """
+        node_input_storage = [storage_map[r] for r in node.inputs]
+        node_output_storage = [storage_map[r] for r in node.outputs]
+
+        try:
+            cl = self._make_c_linker(node, no_recycling)
+        except NotImplementedError:
+            print("Disabling C code for %s due to unsupported "
+                  "float16" % (self,))
+            raise
 
         _logger.debug('Trying CLinker.make_thunk')
         outputs = cl.make_thunk(input_storage=node_input_storage,
@@ -36,6 +36,18 @@ def _list_of_nodes(fgraph):
     return list(graph.io_toposort(fgraph.inputs, fgraph.outputs))
 
 
+def _toposort_from(fgraph, start_from):
+    """
+    Return the nodes needed to compute `start_from` in topological order,
+    using the `IncrementalToposort` feature when it is attached.
+
+    """
+    incremental = getattr(fgraph, 'incremental_toposort', None)
+    if incremental is not None and start_from is fgraph.outputs:
+        return incremental.toposort()
+    return graph.io_toposort(fgraph.inputs, start_from)
+
+
 class Optimizer(object):
     """
 
@@ -83,10 +95,14 @@ class Optimizer(object):
         self.add_requirements(fgraph)
         try:
             orig = theano.tensor.basic.constant.enable
+            orig_intern = graph.intern_apply.enable
             theano.tensor.basic.constant.enable = False
+            # Optimizers expect the nodes they build to be new.
+            graph.intern_apply.enable = False
             ret = self.apply(fgraph, *args, **kwargs)
         finally:
             theano.tensor.basic.constant.enable = orig
+            graph.intern_apply.enable = orig_intern
         return ret
 
     def __call__(self, fgraph):
@@ -2049,7 +2065,7 @@ class TopoOptimizer(NavigatorOptimizer):
         callback_before = fgraph.execute_callbacks_time
         nb_nodes_start = len(fgraph.apply_nodes)
         t0 = time.time()
-        q = deque(graph.io_toposort(fgraph.inputs, start_from))
+        q = deque(_toposort_from(fgraph, start_from))
         io_t = time.time() - t0
 
         def importer(node):
@@ -2233,6 +2249,50 @@ class ChangeTracker:
         del fgraph.change_tracker
 
 
+class DirtyTracker:
+    """
+    Keep the set of nodes that local optimizers should try again.
+
+    A node is dirty when it was imported or one of its inputs changed, and
+    when one of the variables it uses or produces was replaced, gained or
+    lost a client. As local optimizers also look at the neighbours of the
+    node they are tried on, the owners of the inputs and the clients of
+    the outputs of an imported or changed node are dirty too. The
+    EquilibriumOptimizer removes a node from `dirty` when it tries it.
+
+    """
+    def __init__(self):
+        self.dirty = set()
+
+    def _touch(self, r):
+        if r.owner is not None:
+            self.dirty.add(r.owner)
+        # The clients of pruned variables are removed.
+        for c, i in getattr(r, 'clients', ()):
+            if c != 'output':
+                self.dirty.add(c)
+
+    def _touch_node(self, node):
+        self.dirty.add(node)
+        for r in node.inputs:
+            self._touch(r)
+        for r in node.outputs:
+            self._touch(r)
+
+    def on_import(self, fgraph, node, reason):
+        self._touch_node(node)
+
+    def on_prune(self, fgraph, node, reason):
+        for r in node.inputs:
+            self._touch(r)
+
+    def on_change_input(self, fgraph, node, i, r, new_r, reason):
+        if node != 'output':
+            self._touch_node(node)
+        self._touch(r)
+        self._touch(new_r)
+
+
 def merge_dict(d1, d2):
     """
     merge 2 dicts by adding the values.
@@ -2268,6 +2328,11 @@ class EquilibriumOptimizer(NavigatorOptimizer):
         They must not traverse the graph as they are called very frequently.
         The MergeOptimizer is one example of optimization that respect this.
         They are applied after all global optimizer, then when one local optimizer is applied, then after all final optimizer.
+    worklist : bool
+        If True, only the first pass tries the local optimizers on all the
+        nodes. The next passes only try them on the nodes that were
+        imported, or whose inputs or outputs changed, since they were last
+        tried.
 
     """
 
@@ -2278,7 +2343,8 @@ class EquilibriumOptimizer(NavigatorOptimizer):
                  tracks_on_change_inputs=False,
                  max_use_ratio=None,
                  final_optimizers=None,
-                 cleanup_optimizers=None):
+                 cleanup_optimizers=None,
+                 worklist=False):
         super(EquilibriumOptimizer, self).__init__(
             None,
             ignore_newtrees=ignore_newtrees,
@@ -2289,6 +2355,7 @@ class EquilibriumOptimizer(NavigatorOptimizer):
         self.final_optimizers = []
         self.cleanup_optimizers = []
         self.tracks_on_change_inputs = tracks_on_change_inputs
+        self.worklist = worklist
 
         for opt in optimizers:
             if isinstance(opt, LocalOptimizer):
@@ -2332,6 +2399,10 @@ class EquilibriumOptimizer(NavigatorOptimizer):
     def apply(self, fgraph, start_from=None):
         change_tracker = ChangeTracker()
         fgraph.attach_feature(change_tracker)
+        dirty_tracker = None
+        if self.worklist:
+            dirty_tracker = DirtyTracker()
+            fgraph.attach_feature(dirty_tracker)
         if start_from is None:
             start_from = fgraph.outputs
         else:
@@ -2353,6 +2424,7 @@ class EquilibriumOptimizer(NavigatorOptimizer):
         io_toposort_timing = []
         nb_nodes = []
         node_created = {}
+        node_tried = {}
         global_sub_profs = []
         final_sub_profs = []
         cleanup_sub_profs = []
@@ -2363,6 +2435,7 @@ class EquilibriumOptimizer(NavigatorOptimizer):
             global_process_count.setdefault(opt, 0)
             time_opts.setdefault(opt, 0)
             node_created.setdefault(opt, 0)
+            node_tried.setdefault(opt, 0)
 
         def apply_cleanup(profs_dict):
             changed = False
@@ -2418,7 +2491,11 @@ class EquilibriumOptimizer(NavigatorOptimizer):
 
             # apply local optimizer
             topo_t0 = time.time()
-            q = deque(graph.io_toposort(fgraph.inputs, start_from))
+            q = deque(_toposort_from(fgraph, start_from))
+            if dirty_tracker is not None and loop_timing:
+                # Only the first pass visits all the nodes.
+                dirty = dirty_tracker.dirty
+                q = deque(node for node in q if node in dirty)
             io_toposort_timing.append(time.time() - topo_t0)
 
             nb_nodes.append(len(q))
@@ -2443,6 +2520,8 @@ class EquilibriumOptimizer(NavigatorOptimizer):
                     if node not in fgraph.apply_nodes:
                         continue
                     current_node = node
+                    if dirty_tracker is not None:
+                        dirty_tracker.dirty.discard(node)
                     for lopt in (self.local_optimizers_all +
                                  self.local_optimizers_map.get(type(node.op), []) +
                                  self.local_optimizers_map.get(node.op, [])):
@@ -2450,6 +2529,7 @@ class EquilibriumOptimizer(NavigatorOptimizer):
                         t_opt = time.time()
                         lopt_change = self.process_node(fgraph, node, lopt)
                         time_opts[lopt] += time.time() - t_opt
+                        node_tried[lopt] += 1
                         if not lopt_change:
                             continue
                         process_count.setdefault(lopt, 0)
@@ -2518,6 +2598,8 @@ class EquilibriumOptimizer(NavigatorOptimizer):
             else:
                 _logger.error(msg)
         fgraph.remove_feature(change_tracker)
+        if dirty_tracker is not None:
+            fgraph.remove_feature(dirty_tracker)
         assert len(loop_process_count) == len(loop_timing)
         assert len(loop_process_count) == len(global_opt_timing)
         assert len(loop_process_count) == len(nb_nodes)
@@ -2529,7 +2611,7 @@ class EquilibriumOptimizer(NavigatorOptimizer):
                 (start_nb_nodes, end_nb_nodes, max_nb_nodes),
                 global_opt_timing, nb_nodes, time_opts, io_toposort_timing,
                 node_created, global_sub_profs, final_sub_profs,
-                cleanup_sub_profs)
+                cleanup_sub_profs, node_tried)
 
     def print_summary(self, stream=sys.stdout, level=0, depth=-1):
         name = getattr(self, 'name', None)
@@ -2546,7 +2628,7 @@ class EquilibriumOptimizer(NavigatorOptimizer):
          (start_nb_nodes, end_nb_nodes, max_nb_nodes),
          global_opt_timing, nb_nodes, time_opts, io_toposort_timing,
          node_created, global_sub_profs, final_sub_profs,
-         cleanup_sub_profs) = prof
+         cleanup_sub_profs, node_tried) = prof
 
         blanc = ('    ' * level)
         print(blanc, "EquilibriumOptimizer", end=' ', file=stream)
@@ -2560,6 +2642,8 @@ class EquilibriumOptimizer(NavigatorOptimizer):
             io_toposort_timing), file=stream)
         s = sum([time_opts[o] for o in opt.get_local_optimizers()])
         print(blanc, "  time in local optimizers %.3fs" % s, file=stream)
+        s = sum([node_tried.get(o, 0) for o in opt.get_local_optimizers()])
+        print(blanc, "  nb local optimizers tried %d" % s, file=stream)
         s = sum([time_opts[o] for o in opt.global_optimizers])
         print(blanc, "  time in global optimizers %.3fs" % s, file=stream)
         s = sum([time_opts[o] for o in opt.final_optimizers])
@@ -2597,7 +2681,7 @@ class EquilibriumOptimizer(NavigatorOptimizer):
                 process_count[o] += v
         for o, count in iteritems(process_count):
             if count > 0:
-                count_opt.append((time_opts[o], count,
+                count_opt.append((time_opts[o], count, node_tried.get(o, 0),
                                   node_created[o], o))
             else:
                 not_used.append((time_opts[o], o))
@@ -2605,12 +2689,12 @@ class EquilibriumOptimizer(NavigatorOptimizer):
 
         if count_opt:
             print(blanc,
-                  '  times - times applied - nb node created - name:',
-                  file=stream)
-            count_opt.sort()
-            for (t, count, n_created, o) in count_opt[::-1]:
-                print(blanc, '  %.3fs - %d - %d - %s' % (
-                    t, count, n_created, o), file=stream)
+                  '  times - times applied - times tried - nb node created'
+                  ' - name:', file=stream)
+            count_opt.sort(key=lambda c: c[:4])
+            for (t, count, n_tried, n_created, o) in count_opt[::-1]:
+                print(blanc, '  %.3fs - %d - %d - %d - %s' % (
+                    t, count, n_tried, n_created, o), file=stream)
             print(blanc, '  %.3fs - in %d optimization that were not used (display only those with a runtime > 0)' % (
                 not_used_time, len(not_used)), file=stream)
             not_used.sort(key=lambda nu: (nu[0], str(nu[1])))
@@ -2732,6 +2816,7 @@ class EquilibriumOptimizer(NavigatorOptimizer):
         assert len(loop_timing) == max(len(prof1[1]), len(prof2[1]))
 
         node_created = merge_dict(prof1[8], prof2[8])
+        node_tried = merge_dict(prof1[12], prof2[12])
         return (new_opt,
                 loop_timing,
                 loop_process_count,
@@ -2743,7 +2828,8 @@ class EquilibriumOptimizer(NavigatorOptimizer):
                 node_created,
                 global_sub_profs,
                 final_sub_profs,
-                cleanup_sub_profs)
+                cleanup_sub_profs,
+                node_tried)
 
 #################
 #   Utilities   #
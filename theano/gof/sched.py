@@ -1,5 +1,8 @@
 from __future__ import absolute_import, print_function, division
+import heapq
 from collections import defaultdict
+
+import numpy as np
 from six import iteritems
 from theano.gof.graph import list_of_nodes
 from theano.compat import cmp
@@ -274,3 +277,267 @@ def key_to_cmp(key):
     def key_cmp(a, b):
         return cmp(key(a), key(b))
     return key_cmp
+
+
+def _alias_roots(order):
+    """
+    Map each variable computed by `order` as a view or by destroying
+    another variable, according to the view_map and destroy_map of its
+    node, to the variable that owns its memory.
+
+    """
+    root = {}
+    for node in order:
+        vmap = getattr(node.op, 'view_map', {})
+        dmap = getattr(node.op, 'destroy_map', {})
+        for o, out in enumerate(node.outputs):
+            ins = vmap.get(o, []) + dmap.get(o, [])
+            if ins:
+                inp = node.inputs[ins[0]]
+                root[out] = root.get(inp, inp)
+    return root
+
+
+def _profiled_shapes(fgraph, profile):
+    """
+    Map the variables of `fgraph` to the shapes recorded by `profile`.
+
+    The profile was usually recorded by another compilation of the same
+    graph, whose variables are different objects. So the nodes are
+    matched by their position in the toposort of their FunctionGraph, when
+    both graphs have the same number of nodes and the same op at that
+    position.
+
+    """
+    recorded = getattr(profile, 'variable_shape', None) or {}
+    shapes = {}
+    if not recorded:
+        return shapes
+    profiled_fgraphs = set(getattr(var.owner, 'fgraph', None)
+                           for var in recorded if var.owner is not None)
+    toposort = fgraph.toposort()
+    for profiled_fgraph in profiled_fgraphs:
+        if profiled_fgraph is None or profiled_fgraph is fgraph:
+            continue
+        profiled_toposort = profiled_fgraph.toposort()
+        if len(profiled_toposort) != len(toposort):
+            continue
+        for node, profiled_node in zip(toposort, profiled_toposort):
+            if node.op != profiled_node.op:
+                continue
+            for var, profiled_var in zip(node.outputs,
+                                         profiled_node.outputs):
+                if profiled_var in recorded:
+                    shapes[var] = recorded[profiled_var]
+    # The variables of `fgraph` itself, if it was profiled.
+    for var in fgraph.variables:
+        if var in recorded:
+            shapes[var] = recorded[var]
+    return shapes
+
+
+def estimate_sizes(fgraph, profile=None, unknown_dim=100):
+    """
+    Estimate the size in bytes of the variables of a FunctionGraph.
+
+    The shapes recorded by `profile` are used first. Otherwise, the
+    shapes inferred by the ShapeFeature of `fgraph`, if it has one, are
+    used, a dimension that is not a constant being estimated to
+    `unknown_dim`. The variables that are views of, or that destroy,
+    another variable don't take new memory and have a size of 0.
+
+    Parameters
+    ----------
+    fgraph : FunctionGraph
+    profile : ProfileStats, optional
+        A profile of the function, recorded with config.profile_memory,
+        so that it has the shapes of the variables.
+    unknown_dim : int
+        Estimate of the dimensions that are not known.
+
+    Returns
+    -------
+    dict
+        Maps each variable computed by a node of `fgraph` to its estimated
+        size in bytes. Variables that are not tensors have a size of 1.
+
+    """
+    from theano.tensor.basic import (get_scalar_constant_value,
+                                     NotScalarConstantError)
+
+    variable_shape = _profiled_shapes(fgraph, profile)
+    shape_of = getattr(getattr(fgraph, 'shape_feature', None),
+                       'shape_of', {})
+    aliases = _alias_roots(fgraph.apply_nodes)
+    sizes = {}
+    for node in fgraph.apply_nodes:
+        for var in node.outputs:
+            dtype = getattr(var.type, 'dtype', None)
+            ndim = getattr(var.type, 'ndim', None)
+            if var in aliases:
+                sizes[var] = 0
+                continue
+            if dtype is None or ndim is None:
+                sizes[var] = 1
+                continue
+            shape = variable_shape.get(var)
+            if shape is None:
+                shape = []
+                for i in range(ndim):
+                    dim = unknown_dim
+                    if shape_of.get(var) is not None:
+                        try:
+                            dim = int(get_scalar_constant_value(
+                                shape_of[var][i]))
+                        except NotScalarConstantError:
+                            pass
+                    elif var.type.broadcastable[i]:
+                        dim = 1
+                    shape.append(dim)
+            size = np.dtype(dtype).itemsize
+            for dim in shape:
+                size *= dim
+            sizes[var] = size
+    return sizes
+
+
+def peak_memory(order, fgraph, sizes):
+    """
+    Return the estimated peak memory, in bytes, used by the intermediate
+    results and the outputs when running the nodes in `order` with the
+    garbage collection of the VMs.
+
+    A variable is freed when all the nodes using it, or using one of its
+    views, have run, unless it is an output of `fgraph`.
+
+    Parameters
+    ----------
+    order
+        List of the Apply nodes of `fgraph`, in execution order.
+    fgraph : FunctionGraph
+    sizes : dict
+        Maps the variables to their size, see `estimate_sizes`.
+
+    """
+    root = _alias_roots(order)
+    n_users = defaultdict(int)
+    for node in order:
+        for inp in set(root.get(i, i) for i in node.inputs):
+            n_users[inp] += 1
+    outputs = set(root.get(o, o) for o in fgraph.outputs)
+    current = peak = 0
+    for node in order:
+        for out in node.outputs:
+            current += sizes.get(out, 0)
+        peak = max(peak, current)
+        for inp in set(root.get(i, i) for i in node.inputs):
+            n_users[inp] -= 1
+            if (n_users[inp] == 0 and inp.owner is not None and
+                    inp not in outputs):
+                current -= sizes.get(inp, 0)
+        for out in node.outputs:
+            # Outputs without users are freed right away.
+            if (out not in root and n_users[out] == 0 and
+                    out not in outputs):
+                current -= sizes.get(out, 0)
+    return peak
+
+
+def memory_schedule_fn(profile=None, unknown_dim=100):
+    """
+    Make a schedule function that orders the nodes to reduce the peak
+    memory used by the intermediate results.
+
+    The nodes are scheduled greedily: among the nodes whose dependencies
+    (including the ones of `fgraph.orderings()`, e.g. from a
+    DestroyHandler) have run, the one that increases the memory in use
+    the least is run first. That is the size of its outputs minus the
+    size of the variables that it is the last node to use. Ties are broken
+    by the position in `fgraph.toposort()`. The default toposort is kept
+    if its estimated peak memory is lower.
+
+    It is meant to be used with garbage collection, e.g.
+    ``VM_Linker(allow_gc=True, schedule=memory_schedule_fn())``.
+
+    Parameters
+    ----------
+    profile : ProfileStats, optional
+        A profile of the function recorded with config.profile_memory,
+        whose shapes are used to estimate the sizes of the variables.
+    unknown_dim : int
+        Estimate of the dimensions that are not known, see
+        `estimate_sizes`.
+
+    """
+    def schedule(fgraph):
+        """
+        Order nodes in a FunctionGraph to reduce the peak memory.
+
+        """
+        toposort = fgraph.toposort()
+        sizes = estimate_sizes(fgraph, profile, unknown_dim)
+        position = dict((node, i) for i, node in enumerate(toposort))
+        root = _alias_roots(toposort)
+        outputs = set(root.get(o, o) for o in fgraph.outputs)
+
+        ords = fgraph.orderings()
+        n_parents = {}
+        children = defaultdict(list)
+        n_users = defaultdict(int)
+        users = defaultdict(list)
+        for node in toposort:
+            parents = set(i.owner for i in node.inputs if i.owner)
+            parents.update(ords.get(node, []))
+            n_parents[node] = len(parents)
+            for p in parents:
+                children[p].append(node)
+            for inp in set(root.get(i, i) for i in node.inputs):
+                n_users[inp] += 1
+                users[inp].append(node)
+
+        def cost(node):
+            freed = 0
+            for inp in set(root.get(i, i) for i in node.inputs):
+                if (n_users[inp] == 1 and inp.owner is not None and
+                        inp not in outputs):
+                    freed += sizes.get(inp, 0)
+            allocated = sum(sizes.get(out, 0) for out in node.outputs)
+            return (allocated - freed, position[node])
+
+        # The cost of a ready node only decreases, when another node was
+        # the last but one to use one of its inputs. It is then pushed
+        # again, and the outdated entries are skipped.
+        ready = set()
+        heap = []
+
+        def push(node):
+            ready.add(node)
+            heapq.heappush(heap, cost(node) + (node,))
+
+        for node in toposort:
+            if n_parents[node] == 0:
+                push(node)
+        order = []
+        while heap:
+            c, pos, node = heapq.heappop(heap)
+            if node not in ready or (c, pos) != cost(node):
+                continue
+            ready.remove(node)
+            order.append(node)
+            for inp in set(root.get(i, i) for i in node.inputs):
+                n_users[inp] -= 1
+                if n_users[inp] == 1:
+                    for user in users[inp]:
+                        if user in ready:
+                            push(user)
+            for child in children[node]:
+                n_parents[child] -= 1
+                if n_parents[child] == 0:
+                    push(child)
+        assert len(order) == len(toposort)
+
+        if (peak_memory(order, fgraph, sizes) <
+                peak_memory(toposort, fgraph, sizes)):
+            return order
+        return toposort
+    return schedule
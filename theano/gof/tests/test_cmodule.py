@@ -6,10 +6,19 @@ deterministic based on the input type and the op.
 """
 from __future__ import absolute_import, print_function, division
 
+import os
+import shutil
+import tempfile
+import sys
+import threading
+
 import numpy as np
+from nose.plugins.skip import SkipTest
+from six import StringIO
 
 import theano
-from theano.gof.cmodule import GCC_compiler
+from theano.gof import compilelock
+from theano.gof.cmodule import GCC_compiler, ModuleCache
 
 
 class MyOp(theano.compile.ops.DeepCopyOp):
@@ -69,3 +78,227 @@ def test_flag_detection():
     # but was not detected because that path is not usually taken,
     # so we test it here directly.
     GCC_compiler.try_flags(["-lblas"])
+
+
+class AddConstOp(theano.Op):
+    __props__ = ('cst',)
+
+    def __init__(self, cst):
+        self.cst = cst
+
+    def make_node(self, x):
+        x = theano.tensor.as_tensor_variable(x)
+        return theano.Apply(self, [x], [x.type()])
+
+    def perform(self, node, inputs, outputs):
+        outputs[0][0] = inputs[0] + self.cst
+
+    def c_code_cache_version(self):
+        return ()
+
+    def c_code(self, node, name, inames, onames, sub):
+        iname, = inames
+        oname, = onames
+        fail = sub['fail']
+        cst = self.cst
+        return """
+        Py_XDECREF(%(oname)s);
+        %(oname)s = (PyArrayObject*)PyArray_NewCopy(%(iname)s, NPY_CORDER);
+        if (!%(oname)s) %(fail)s
+        {
+            double* data = (double*)PyArray_DATA(%(oname)s);
+            for (npy_intp i = 0; i < PyArray_SIZE(%(oname)s); ++i)
+                data[i] += %(cst)s;
+        }
+        """ % locals()
+
+
+def test_parallel_compile():
+    if not theano.config.cxx:
+        raise SkipTest("G++ not available, so we need to skip this test.")
+    x = theano.tensor.dvector('x')
+    outs = [AddConstOp(i + 0.5)(x) for i in range(4)]
+    cache = theano.gof.cc.get_module_cache()
+    nb_compiled = cache.stats[2]
+    with theano.configparser.change_flags(**{'cmodule.compile_workers': 3}):
+        f = theano.function([x], outs, mode=theano.Mode(linker='cvm'))
+    assert cache.stats[2] - nb_compiled == 4
+    for i, out in enumerate(f(np.arange(3.))):
+        assert np.allclose(out, np.arange(3.) + i + 0.5)
+
+
+def test_unity_build():
+    if not theano.config.cxx:
+        raise SkipTest("G++ not available, so we need to skip this test.")
+    x = theano.tensor.dvector('x')
+    outs = [AddConstOp(i + 20.25)(x) for i in range(3)]
+    cache = theano.gof.cc.get_module_cache()
+    nb_compiled = cache.stats[2]
+    with theano.configparser.change_flags(**{'cmodule.unity_build': 10}):
+        f = theano.function([x], outs, mode=theano.Mode(linker='cvm'))
+    assert cache.stats[2] - nb_compiled == 3
+    for i, out in enumerate(f(np.arange(3.))):
+        assert np.allclose(out, np.arange(3.) + i + 20.25)
+    # The three modules were linked in a single shared library.
+    nodes = [node for node in f.maker.fgraph.toposort()
+             if isinstance(node.op, AddConstOp)]
+    libs = [cache.module_from_key(key, lnk).__file__ for key, lnk in
+            theano.gof.cc.node_clinkers(nodes, f.maker.linker.no_recycling)]
+    assert len(set(libs)) == 3
+    if hasattr(os, 'link'):
+        assert len(set(os.stat(lib).st_ino for lib in libs)) == 1
+
+
+class DupSymbolOp(AddConstOp):
+    # The modules of two instances can't be linked together.
+    def c_support_code(self):
+        return "int theano_test_dup_symbol = 1;"
+
+
+def test_unity_build_link_error():
+    # When the modules of a group can't be linked together, they are built
+    # one by one, without printing the failed build.
+    if not theano.config.cxx:
+        raise SkipTest("G++ not available, so we need to skip this test.")
+    x = theano.tensor.dvector('x')
+    outs = [DupSymbolOp(i + 30.25)(x) for i in range(2)]
+    stdout, stderr = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = StringIO(), StringIO()
+    try:
+        with theano.configparser.change_flags(**{'cmodule.unity_build': 10}):
+            f = theano.function([x], outs, mode=theano.Mode(linker='cvm'))
+        out = sys.stdout.getvalue() + sys.stderr.getvalue()
+    finally:
+        sys.stdout, sys.stderr = stdout, stderr
+    assert '=====' not in out and 'Problem occurred' not in out, out
+    for i, out in enumerate(f(np.arange(3.))):
+        assert np.allclose(out, np.arange(3.) + i + 30.25)
+
+
+def test_module_lock_ctx():
+    lock_dir = os.path.join(theano.config.compiledir, 'module_locks', 'abc')
+    with compilelock.module_lock_ctx(['abc', 'def']):
+        assert os.path.isdir(lock_dir)
+        # The lock is reentrant.
+        with compilelock.module_lock_ctx(['abc']):
+            assert os.path.isdir(lock_dir)
+        assert os.path.isdir(lock_dir)
+    assert not os.path.exists(lock_dir)
+
+
+def test_module_lock_refresh():
+    # The module locks are refreshed while they are held, so that the other
+    # processes don't override them.
+    lock_file = os.path.join(theano.config.compiledir, 'module_locks', 'abc',
+                             'lock')
+    with compilelock.module_lock_ctx(['abc']):
+        assert compilelock._module_locks_refresher is not None
+        with open(lock_file) as f:
+            owner = f.read()
+        with compilelock._module_locks_lock:
+            compilelock._refresh_module_locks()
+        with open(lock_file) as f:
+            new_owner = f.read()
+        assert new_owner != owner
+        assert new_owner.split('_')[0] == str(os.getpid())
+
+
+def test_get_lock_threads():
+    # Only one thread of the process holds the compilation lock at a time.
+    acquired = threading.Event()
+    compilelock.get_lock()
+    try:
+        assert compilelock.lock_count() == 1
+
+        def other():
+            assert compilelock.lock_count() == 0
+            compilelock.get_lock()
+            acquired.set()
+            compilelock.release_lock()
+        thread = threading.Thread(target=other)
+        thread.start()
+        assert not acquired.wait(0.5)
+    finally:
+        compilelock.release_lock()
+    thread.join()
+    assert acquired.is_set()
+    assert compilelock.lock_count() == 0
+
+
+def test_lock_per_module():
+    if not theano.config.cxx:
+        raise SkipTest("G++ not available, so we need to skip this test.")
+    x = theano.tensor.dvector('x')
+    out = AddConstOp(10.5)(x)
+    with theano.configparser.change_flags(**{'cmodule.lock_per_module': True}):
+        f = theano.function([x], out, mode=theano.Mode(linker='cvm'))
+    assert np.allclose(f(np.arange(3.)), np.arange(3.) + 10.5)
+
+    # Another thread compiling a different module does not wait for this
+    # one, but it waits if it compiles the same module.
+    def compile_module(name, done):
+        with compilelock.module_lock_ctx([name], min_wait=0.01,
+                                         max_wait=0.02):
+            done.set()
+
+    with compilelock.module_lock_ctx(['abc']):
+        other_done = threading.Event()
+        other = threading.Thread(target=compile_module,
+                                 args=('def', other_done))
+        other.start()
+        assert other_done.wait(5)
+        other.join()
+
+        same_done = threading.Event()
+        same = threading.Thread(target=compile_module,
+                                args=('abc', same_done))
+        same.start()
+        assert not same_done.wait(0.5)
+    assert same_done.wait(5)
+    same.join()
+
+
+def test_cache_index():
+    if not theano.config.cxx:
+        raise SkipTest("G++ not available, so we need to skip this test.")
+    dirname = tempfile.mkdtemp(dir=theano.config.compiledir)
+
+    def linker():
+        x, y = theano.tensor.dvectors('xy')
+        fgraph = theano.gof.FunctionGraph([x, y], [x * y + 2])
+        return theano.gof.cc.CLinker().accept(fgraph)
+
+    try:
+        # The index is written even if it is not used.
+        cache = ModuleCache(dirname)
+        lnk = linker()
+        key = lnk.cmodule_key()
+        assert key[0]
+        cache.module_from_key(key, lnk)
+        assert cache.stats[2] == 1
+        with open(cache.index_file) as f:
+            lines = f.readlines()
+        assert len(lines) == 2
+
+        # Rebuilding the index keeps the entries appended by other
+        # processes, if their module still exists.
+        subdir = lines[0].split()[1]
+        with open(cache.index_file, 'a') as f:
+            f.write('appended %s\n' % subdir)
+            f.write('deleted tmpdeleted\n')
+        with compilelock.lock_ctx():
+            cache._rebuild_index()
+        with open(cache.index_file) as f:
+            assert (sorted(f.readlines()) ==
+                    sorted(lines + ['appended %s\n' % subdir]))
+
+        with theano.configparser.change_flags(**{'cmodule.use_index': True}):
+            # A new cache only loads the entries it looks up.
+            cache = ModuleCache(dirname)
+            assert not cache.entry_from_key
+            lnk = linker()
+            cache.module_from_key(lnk.cmodule_key(), lnk)
+            assert cache.stats == [0, 1, 0]
+            assert len(cache.entry_from_key) == 1
+    finally:
+        shutil.rmtree(dirname, ignore_errors=True)
@@ -477,3 +477,36 @@ def test_multiple_inplace():
     OpSubOptimizer(multiple_in_place_1, multiple_in_place_0_1, fail).optimize(g)
     consistent(g)
     assert fail.failures == 1
+
+
+def test_incremental_order():
+    # The DestroyHandler keeps a topological order of the data dependencies
+    # and only looks for cycles around the edges that go backward.
+    def check_order(g):
+        position = g.destroy_handler.position
+        assert set(position) == g.apply_nodes
+        for node in g.apply_nodes:
+            for inp in node.inputs:
+                if inp.owner is not None:
+                    assert position[inp.owner] < position[node]
+
+    x, y, z = inputs()
+    e0 = sigmoid(x)
+    e1 = add(e0, y)
+    e2 = dot(e1, z)
+    g = Env([x, y, z], [e2, add(y, z)])
+    check_order(g)
+    g.replace_validate(e0, add_in_place(dot(y, z), x))
+    consistent(g)
+    check_order(g)
+
+    # A cycle in the data dependencies.
+    try:
+        g.replace_validate(y, e2)
+        raise Exception("Shouldn't have reached this point.")
+    except InconsistencyError:
+        pass
+    assert not g.destroy_handler.order_valid
+    consistent(g)
+    assert g.destroy_handler.order_valid
+    check_order(g)
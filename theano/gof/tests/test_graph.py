@@ -6,13 +6,15 @@ import unittest
 from nose.plugins.skip import SkipTest
 import numpy as np
 
+import theano
 from theano import (
     sparse,
     shared, tensor)
 from theano.gof.graph import (
     Apply,
     as_string, clone, general_toposort, inputs, io_toposort,
-    is_same_graph, Variable)
+    is_same_graph, structural_hash, Variable)
+from theano.gof import utils
 from theano.gof.op import Op
 from theano.gof.type import Type
 from theano.sandbox.cuda.var import (
@@ -306,6 +308,29 @@ class TestIsSameGraph(unittest.TestCase):
                    debug=False)
 
 
+###################
+# structural_hash #
+###################
+
+
+def test_structural_hash():
+    def graph_hash(const=2):
+        x, y = tensor.matrices('x', 'y')
+        return structural_hash([x, y], [tensor.dot(x, y) * const, x + y])
+
+    # Names and identities of the variables do not matter.
+    assert graph_hash() == graph_hash()
+    # Constants do.
+    assert graph_hash() != graph_hash(3)
+
+    x, y = tensor.matrices('x', 'y')
+    out = [tensor.dot(x, y)]
+    # The position of the inputs does.
+    assert structural_hash([x, y], out) != structural_hash([y, x], out)
+    assert (structural_hash([x, y], out) !=
+            structural_hash([x, y], [tensor.dot(y, x)]))
+
+
 ################
 # eval         #
 ################
@@ -326,6 +351,106 @@ class TestEval(unittest.TestCase):
                          "temporary functions must not be serialized")
 
 
+class TestSlots(unittest.TestCase):
+
+    def test_no_dict(self):
+        r1, r2 = MyVariable(1), MyVariable(2)
+        node = MyOp.make_node(r1, r2)
+        for n in [r1, r2, node, node.outputs[0]]:
+            self.assertEqual(n.__dict__, {})
+            self.assertTrue(n._tag is None)
+        node.tag.trace = 'a'
+        self.assertEqual(node.tag.trace, 'a')
+        self.assertEqual(node.__dict__, {})
+
+    def test_clone_tag(self):
+        r1, r2 = MyVariable(1), MyVariable(2)
+        node = MyOp.make_node(r1, r2)
+        # Cloning does not create the tags that were not used.
+        for n in [r1, node, node.outputs[0]]:
+            self.assertTrue(n.clone()._tag is None)
+            self.assertTrue(n._tag is None)
+        node.tag.trace = 'a'
+        cp = node.clone()
+        self.assertEqual(cp.tag.trace, 'a')
+        self.assertFalse(cp.tag is node.tag)
+
+    def test_pickle(self):
+        x = tensor.vector('x')
+        y = (x * 2).sum()
+        y.tag.test = 1
+        y.owner.extra = 'b'
+        y2 = pickle.loads(pickle.dumps(y))
+        self.assertEqual(y2.name, y.name)
+        self.assertEqual(y2.auto_name, y.auto_name)
+        self.assertEqual(y2.tag.test, 1)
+        self.assertEqual(y2.owner.extra, 'b')
+        self.assertEqual(y2.owner.outputs, [y2])
+        self.assertEqual(y2.owner.inputs[0].owner.inputs[0].name, 'x')
+
+        c = tensor.constant(3.)
+        self.assertEqual(pickle.loads(pickle.dumps(c)).data, 3.)
+
+    def test_dict_state(self):
+        # Pickles made before nodes used slots store all the attributes
+        # in the instance dictionary.
+        tag = utils.scratchpad()
+        tag.trace = 'a'
+        r = Variable.__new__(Variable)
+        r.__setstate__({'type': MyType(1), 'owner': None, 'index': None,
+                        'name': 'r', 'auto_name': 'auto_7',
+                        'tag': tag})
+        self.assertEqual(r.auto_name, 'auto_7')
+        self.assertEqual(r.tag.trace, 'a')
+        self.assertEqual(r.__dict__, {})
+
+
+class TestHashConsing(unittest.TestCase):
+
+    @theano.configparser.change_flags(hash_consing=True)
+    def test_shared(self):
+        r1, r2 = MyVariable(1), MyVariable(2)
+        o = MyOp(r1, r2)
+        assert MyOp(r1, r2) is o
+        assert MyOp(r2, r1) is not o
+
+        x = tensor.vector('x')
+        y = tensor.exp(x) + 1
+        assert tensor.exp(x) + 1 is y
+        assert tensor.exp(x) + 2 is not y
+        # Inplace ops are never shared
+        z = tensor.exp(x)
+        assert tensor.inc_subtensor(z[1:], 1, inplace=True) is not \
+            tensor.inc_subtensor(z[1:], 1, inplace=True)
+
+    @theano.configparser.change_flags(hash_consing=True)
+    def test_changed_inputs(self):
+        x, w = tensor.dscalars('xw')
+        y = tensor.exp(x) + w
+        fg = theano.gof.FunctionGraph([x, w], [y], clone=False)
+        fg.replace(w, tensor.sqr(w))
+        fg.disown()
+        # y now computes exp(x) + sqr(w), so it is not shared anymore.
+        z = tensor.exp(x) + w
+        assert z is not y
+        assert theano.function([x, w], z)(0, 3) == 4
+        assert tensor.exp(x) + w is z
+
+    def test_grad(self):
+        def n_nodes():
+            x = tensor.vector('x')
+            c = (tensor.exp(x) ** 2).sum() + tensor.exp(x).sum()
+            return len(io_toposort([x], [theano.grad(c, x)]))
+
+        n = n_nodes()
+        with theano.configparser.change_flags(hash_consing=True):
+            assert n_nodes() < n
+
+    def test_off(self):
+        r1, r2 = MyVariable(1), MyVariable(2)
+        assert MyOp(r1, r2) is not MyOp(r1, r2)
+
+
 ################
 # autoname     #
 ################
@@ -1,5 +1,6 @@
 from __future__ import absolute_import, print_function, division
 import os
+import shutil
 import numpy as np
 import theano
 import theano.tensor as T
@@ -8,8 +9,9 @@ floatX = 'float32'
 
 
 def test_graph_opt_caching():
-    opt_db_file = theano.config.compiledir + '/optimized_graphs.pkl'
-    os.system('rm %s' % opt_db_file)
+    cache_dir = os.path.join(theano.config.compiledir, 'optimized_graphs')
+    if os.path.isdir(cache_dir):
+        shutil.rmtree(cache_dir)
 
     mode = theano.config.mode
     if mode in ["DEBUG_MODE", "DebugMode"]:
@@ -23,17 +25,30 @@ def test_graph_opt_caching():
         d = theano.shared(np.ones((10, 10), dtype=floatX))
         e = T.sum(T.sum(T.sum(a ** 2 + b) + c) + d)
         f1 = theano.function([a, b], e, mode=mode)
+        assert len(os.listdir(cache_dir)) == 1
 
         m = T.fmatrix('x1')
         n = T.fmatrix('x2')
         p = theano.shared(np.ones((10, 10), dtype=floatX))
-        q = theano.shared(np.ones((10, 10), dtype=floatX))
+        q = theano.shared(2 * np.ones((10, 10), dtype=floatX))
         j = T.sum(T.sum(T.sum(m ** 2 + n) + p) + q)
         f2 = theano.function([m, n], j, mode=mode)
+        # The optimized graph of f1 was reused for f2.
+        assert len(os.listdir(cache_dir)) == 1
 
         in1 = np.ones((10, 10), dtype=floatX)
         in2 = np.ones((10, 10), dtype=floatX)
-        assert f1(in1, in2) == f2(in1, in2)
+        assert f1(in1, in2) == 2010100
+        # f2 uses its own shared variables.
+        assert f2(in1, in2) == 2010200
+        q.set_value(3 * np.ones((10, 10), dtype=floatX))
+        assert f2(in1, in2) == 2010300
+        assert f1(in1, in2) == 2010100
+
+        # A different graph gets its own entry.
+        f3 = theano.function([a, b], e * 2, mode=mode)
+        assert len(os.listdir(cache_dir)) == 2
+        assert f3(in1, in2) == 2 * 2010100
     finally:
         theano.config.cache_optimizations = default
 
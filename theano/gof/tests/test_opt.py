@@ -571,6 +571,30 @@ class TestEquilibrium(object):
         opt.optimize(g)
         assert str(g) == '[Op2(x, y)]'
 
+    def test_worklist(self):
+        def optimize(worklist):
+            x, y, z = map(MyVariable, 'xyz')
+            e = op1(op1(op3(x, y)))
+            for i in range(20):
+                e = op1(e, z)
+            g = FunctionGraph([x, y, z], [e])
+            opt = EquilibriumOptimizer(
+                [PatternSub((op1, (op2, 'x', 'y')), (op4, 'x', 'y')),
+                 PatternSub((op3, 'x', 'y'), (op4, 'x', 'y')),
+                 PatternSub((op4, 'x', 'y'), (op5, 'x', 'y')),
+                 PatternSub((op5, 'x', 'y'), (op6, 'x', 'y')),
+                 PatternSub((op6, 'x', 'y'), (op2, 'x', 'y'))
+                 ],
+                max_use_ratio=10, worklist=worklist)
+            prof = opt.optimize(g)
+            return str(g), sum(prof[-1].values())
+
+        g, n_tried = optimize(False)
+        g_worklist, n_tried_worklist = optimize(True)
+        assert g == g_worklist
+        assert '[Op1(Op1(Op1(' in g and 'Op1(Op2(x, y), z), z)' in g
+        assert n_tried_worklist < n_tried / 2
+
     @theano.configparser.change_flags(on_opt_error='ignore')
     def test_low_use_ratio(self):
         x, y, z = map(MyVariable, 'xyz')
@@ -1,6 +1,11 @@
 from __future__ import absolute_import, print_function, division
+import numpy as np
+
+import theano
 from theano.gof.sched import (make_dependence_cmp, sort_apply_nodes,
-                              reverse_dict, _toposort, posort)
+                              reverse_dict, _toposort, posort,
+                              estimate_sizes, peak_memory,
+                              memory_schedule_fn)
 
 from theano import tensor
 from theano.gof.graph import io_toposort
@@ -68,3 +73,69 @@ def test_posort():
             lambda a, b: a - b]
     assert (posort(l, *cmps) ==
             [10, 1, 11, 2, 12, 3, 13, 4, 14, 5, 15, 6, 16, 7, 17, 8, 18, 9, 19])
+
+
+def test_memory_schedule():
+    x = tensor.vector('x')
+    # Independent branches each making a large temporary that is reduced
+    # to a scalar. The default toposort computes all the temporaries
+    # first, while running the branches one after the other keeps only
+    # one of them alive.
+    sums = [tensor.outer(x, x + i).sum() for i in range(4)]
+    out = sums[0] * sums[1] + sums[2] * sums[3]
+
+    fgraph = theano.FunctionGraph([x], [out])
+    order = memory_schedule_fn(unknown_dim=10)(fgraph)
+    assert set(order) == set(fgraph.apply_nodes)
+    seen = set()
+    for node in order:
+        for i in node.inputs:
+            assert i.owner is None or i.owner in seen
+        seen.add(node)
+    sizes = estimate_sizes(fgraph, unknown_dim=10)
+    assert (peak_memory(order, fgraph, sizes) <
+            peak_memory(fgraph.toposort(), fgraph, sizes))
+
+    linker = theano.gof.vm.VM_Linker(allow_gc=True, use_cloop=False,
+                                     schedule=memory_schedule_fn())
+    mode = theano.Mode(linker=linker, optimizer='fast_run')
+    f = theano.function([x], out, mode=mode)
+    ords = f.maker.fgraph.orderings()
+    seen = set()
+    for node in f.maker.linker.schedule(f.maker.fgraph):
+        assert all(p in seen for p in ords.get(node, []))
+        seen.add(node)
+    xv = np.arange(3).astype(theano.config.floatX)
+    s = [np.outer(xv, xv + i).sum() for i in range(4)]
+    assert np.allclose(f(xv), s[0] * s[1] + s[2] * s[3])
+
+
+def test_estimate_sizes_profile():
+    # The shapes recorded by the profile of another compilation of the
+    # same graph are used.
+    x = tensor.vector('x')
+    y = tensor.exp(x) * 2
+    mode = theano.Mode(linker=theano.gof.vm.VM_Linker(use_cloop=False),
+                       optimizer='fast_run')
+    with theano.configparser.change_flags(profile=True, profile_memory=True):
+        profile = theano.compile.ProfileStats(False)
+        f = theano.function([x], y, mode=mode, profile=profile)
+        f(np.zeros(7, dtype=x.dtype))
+    g = theano.function([x], y, mode=mode)
+    out = g.maker.fgraph.outputs[0]
+    itemsize = np.dtype(x.dtype).itemsize
+    assert estimate_sizes(g.maker.fgraph, unknown_dim=10)[out] == (
+        10 * itemsize)
+    assert estimate_sizes(g.maker.fgraph, profile)[out] == 7 * itemsize
+
+
+def test_estimate_sizes():
+    x = tensor.matrix('x')
+    y = tensor.exp(x[:, :3])
+    fgraph = theano.FunctionGraph([x], [y.dimshuffle(1, 0)], clone=False)
+    sizes = estimate_sizes(fgraph, unknown_dim=10)
+    itemsize = np.dtype(x.dtype).itemsize
+    assert sizes[y] == 100 * itemsize
+    # Views don't take new memory.
+    assert sizes[y.owner.inputs[0]] == 0
+    assert sizes[fgraph.outputs[0]] == 0
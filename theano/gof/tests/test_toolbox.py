@@ -1,11 +1,14 @@
 from __future__ import absolute_import, print_function, division
 
+from collections import OrderedDict
+
 from theano.gof.graph import Variable, Apply
 from theano.gof.type import Type
 from theano.gof.op import Op
 
 from theano.gof.fg import FunctionGraph
-from theano.gof.toolbox import NodeFinder
+from theano.gof.graph import io_toposort
+from theano.gof.toolbox import Feature, IncrementalToposort, NodeFinder
 
 
 def as_variable(x):
@@ -86,3 +89,80 @@ class TestNodeFinder:
         for type, num in ((add, 4), (sigmoid, 3), (dot, 1)):
             if not len([t for t in g.get_nodes(type)]) == num:
                 raise Exception("Expected: %i times %s" % (num, type))
+
+
+class TestIncrementalToposort:
+
+    def check_order(self, g):
+        order = g.toposort()
+        assert set(order) == g.apply_nodes
+        assert len(order) == len(g.apply_nodes)
+        position = dict((node, i) for i, node in enumerate(order))
+        for node in order:
+            for inp in node.inputs:
+                if inp.owner is not None:
+                    assert position[inp.owner] < position[node]
+
+    def test_replace(self):
+        x, y, z = inputs()
+        e0 = dot(y, z)
+        e1 = sigmoid(x)
+        e = add(add(e1, sigmoid(sigmoid(z))), dot(add(x, y), e0))
+        g = FunctionGraph([x, y, z], [e], clone=False)
+        g.attach_feature(IncrementalToposort())
+        assert g.toposort() == io_toposort(g.inputs, g.outputs)
+
+        # e0 is computed before e1, so the nodes must be reordered.
+        g.replace(e0, add(e1, sigmoid(e1)))
+        self.check_order(g)
+        g.replace(e1, dot(x, z))
+        assert g.incremental_toposort.valid
+        self.check_order(g)
+
+    def test_cycle(self):
+        x, y, z = inputs()
+        e0 = sigmoid(x)
+        e1 = add(e0, y)
+        e = dot(e1, z)
+        g = FunctionGraph([x, y, z], [e], clone=False)
+        g.attach_feature(IncrementalToposort())
+        # Make a cycle, then revert it.
+        g.change_input(e0.owner, 0, e1)
+        assert not g.incremental_toposort.valid
+        g.change_input(e0.owner, 0, x)
+        self.check_order(g)
+        assert g.incremental_toposort.valid
+
+    def test_clone(self):
+        x, y, z = inputs()
+        g = FunctionGraph([x, y, z], [add(sigmoid(x), dot(y, z))])
+        feature = IncrementalToposort()
+        g.attach_feature(feature)
+        g2 = g.clone()
+        assert g2.incremental_toposort is not feature
+        self.check_order(g2)
+        assert g.incremental_toposort is feature
+        assert feature in g._features
+
+    def test_cache(self):
+        x, y, z = inputs()
+        e0 = sigmoid(x)
+        e1 = sigmoid(y)
+        g = FunctionGraph([x, y, z], [dot(add(e0, e1), z)], clone=False)
+        g.attach_feature(IncrementalToposort())
+        order = g.toposort()
+        assert g.toposort() is order
+        g.replace(e0, sigmoid(z))
+        assert g.toposort() is not order
+        self.check_order(g)
+        order = g.toposort()
+
+        # The orderings of a new feature are taken into account.
+        first, second = [n for n in order if n.op == sigmoid]
+
+        class Orderings(Feature):
+            def orderings(self, fgraph):
+                return OrderedDict([(first, [second])])
+        g.attach_feature(Orderings())
+        new_order = g.toposort()
+        assert new_order.index(second) < new_order.index(first)
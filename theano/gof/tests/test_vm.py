@@ -1,6 +1,7 @@
 from __future__ import absolute_import, print_function, division
 import gc
 import sys
+import threading
 import time
 import unittest
 
@@ -274,6 +275,101 @@ def test_allow_gc_cvm():
     assert f.fn.storage_map[n][0] is None
 
 
+class Rendezvous(theano.Op):
+    """
+    Copy its input, after waiting for the Op named `other` to start.
+
+    """
+    __props__ = ('me', 'other')
+    events = {}
+
+    def __init__(self, me, other):
+        self.me = me
+        self.other = other
+
+    def make_node(self, x):
+        return theano.Apply(self, [x], [x.type()])
+
+    def perform(self, node, inputs, outputs):
+        self.events[self.me].set()
+        assert self.events[self.other].wait(10)
+        outputs[0][0] = inputs[0].copy()
+
+
+def test_parallel_loop():
+    x = tensor.vector('x')
+    # The two branches can only succeed if they run concurrently.
+    Rendezvous.events = {'a': threading.Event(), 'b': threading.Event()}
+    y = Rendezvous('a', 'b')(x) + Rendezvous('b', 'a')(x * 2)
+    f = function([x], y, mode=Mode(
+        optimizer=None, linker=vm.VM_Linker(threads=2, use_cloop=True)))
+    assert isinstance(f.fn, vm.ParallelLoop)
+    assert np.allclose(f([1, 2]), [3, 6])
+
+
+def test_parallel_loop_destroy():
+    # The inplace nodes must run after the other users of their inputs.
+    x = tensor.matrix('x')
+    a = tensor.exp(x)
+    outs = [tensor.tanh(a).sum(), (a + 1) * 3, tensor.dot(a, a.T),
+            tensor.nnet.sigmoid(a).sum(axis=0)]
+    x_val = np.random.RandomState(1).rand(20, 20).astype(x.dtype)
+    f = function([x], outs, mode=Mode(linker=vm.VM_Linker(threads=1)))
+    expected = f(x_val)
+    for allow_gc in [True, False]:
+        linker = vm.VM_Linker(threads=4, allow_gc=allow_gc)
+        f = function([x], outs, mode=Mode(linker=linker))
+        assert isinstance(f.fn, vm.ParallelLoop)
+        for i in range(10):
+            for out, exp in zip(f(x_val), expected):
+                assert np.allclose(out, exp)
+        intermediate = [v for v in f.maker.fgraph.variables
+                        if v.owner and v not in f.maker.fgraph.outputs]
+        assert intermediate
+        assert all((f.fn.storage_map[v][0] is None) == allow_gc
+                   for v in intermediate)
+
+
+def test_memory_plan():
+    x = tensor.matrix('x')
+    ws = [theano.shared(np.random.RandomState(i).rand(20, 20) / 10)
+          for i in range(4)]
+    h = x
+    for w in ws:
+        h = tensor.tanh(tensor.dot(h, w)) + 1
+    outs = [h.sum(), h.T]
+    f_ref = function([x], outs, mode=Mode(linker=vm.VM_Linker()))
+    for allow_gc in [True, False]:
+        linker = vm.VM_Linker(memory_plan=True, allow_gc=allow_gc)
+        f = function([x], outs, mode=Mode(linker=linker))
+        assert isinstance(f.fn, vm.ArenaLoop)
+        for shape in [(20, 20), (5, 20), (20, 20)]:
+            x_val = np.random.rand(*shape)
+            for i in range(2):
+                for out, exp in zip(f(x_val), f_ref(x_val)):
+                    assert np.allclose(out, exp)
+        assert len(f.fn.plans) == 2
+        # The intermediate results that are not alive at the same time
+        # share the buffer.
+        assert f.fn.arena.nbytes < sum(view.nbytes
+                                       for storage, view in f.fn.views)
+        # h and the variables it is a view of are returned to the user.
+        for var, storage in f.fn.planned:
+            assert var not in f.maker.fgraph.outputs
+
+
+def test_plan_memory():
+    a, b, c, d = 'abcd'
+    intervals = {a: (0, 1), b: (1, 2), c: (2, 3), d: (0, 3)}
+    nbytes = {a: 100, b: 100, c: 100, d: 10}
+    offsets, size = vm.plan_memory(intervals, nbytes, alignment=64)
+    # a and c are not alive at the same time.
+    assert offsets[a] == offsets[c] == 0
+    assert offsets[b] == 128
+    assert offsets[d] == 256
+    assert size == 266
+
+
 run_memory_usage_tests = False
 if run_memory_usage_tests:
     # these are not normal unit tests, do not run them as part of standard
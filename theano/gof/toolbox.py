@@ -1,11 +1,14 @@
 from __future__ import absolute_import, print_function, division
 from functools import partial
+from itertools import chain
 from collections import OrderedDict
 
 import sys
 import time
 import inspect
 
+from six import iteritems
+
 import theano
 from theano import config
 from theano.gof import graph
@@ -111,6 +114,15 @@ class Feature(object):
         """
         return OrderedDict()
 
+    def clone(self):
+        """
+        Called by FunctionGraph.clone_get_equiv. It should return the
+        feature to attach to the clone of the FunctionGraph. By default,
+        the same feature is attached to both graphs.
+
+        """
+        return self
+
 
 class Bookkeeper(Feature):
 
@@ -570,3 +582,193 @@ class NoOutputFromInplace(Feature):
                     "operations. This has prevented output ", out, " from ",
                     "being computed by modifying another variable ",
                     "inplace.")
+
+
+class IncrementalToposort(Feature):
+    """
+    Keep a topological order of the nodes of a FunctionGraph up to date
+    while it is modified, instead of sorting the whole graph at each call
+    of `FunctionGraph.toposort`.
+
+    Imported nodes are appended to the order. When `change_input` makes a
+    node use the output of a node that comes after it, only the nodes
+    between the two that depend on them are reordered (Pearce and Kelly,
+    "A dynamic topological sort algorithm for directed acyclic graphs",
+    2006). If the change creates a cycle, the order is rebuilt at the next
+    query, once the change has been reverted.
+
+    It adds `fgraph.incremental_toposort`, used by `FunctionGraph.toposort`
+    and by the TopoOptimizer and EquilibriumOptimizer. The order does not
+    take the orderings of the features into account: `fgraph_toposort`
+    checks that it satisfies them and sorts the whole graph otherwise.
+    The orders are cached until the graph or its features change, so
+    repeated queries don't copy or check them again.
+
+    """
+
+    def __init__(self):
+        self.fgraph = None
+
+    def clone(self):
+        # Each FunctionGraph has its own order.
+        return IncrementalToposort()
+
+    def on_attach(self, fgraph):
+        if hasattr(fgraph, 'incremental_toposort'):
+            raise AlreadyThere("IncrementalToposort is already present")
+        if self.fgraph is not None:
+            raise ValueError("IncrementalToposort serves another "
+                             "FunctionGraph")
+        self.fgraph = fgraph
+        fgraph.incremental_toposort = self
+        self.rebuild()
+
+    def on_detach(self, fgraph):
+        self.fgraph = None
+        del fgraph.incremental_toposort
+
+    def rebuild(self):
+        """Sort the whole graph again."""
+        fgraph = self.fgraph
+        self.order = graph.io_toposort(fgraph.inputs, fgraph.outputs)
+        self.position = dict((node, i) for i, node in enumerate(self.order))
+        self.n_removed = 0
+        self.valid = True
+        self.clear_cache()
+
+    def clear_cache(self):
+        """
+        Forget the orders returned by the queries. This is done when the
+        graph changes, and by `FunctionGraph` when its features change.
+
+        """
+        self.sorted = None
+        self.fgraph_order = None
+
+    def on_import(self, fgraph, node, reason):
+        self.clear_cache()
+        if node in self.position:
+            # Attached before the FunctionGraph imported its nodes.
+            return
+        # The inputs of an imported node are already in the graph.
+        self.position[node] = len(self.order)
+        self.order.append(node)
+
+    def on_prune(self, fgraph, node, reason):
+        self.clear_cache()
+        if not self.valid:
+            return
+        self.order[self.position.pop(node)] = None
+        self.n_removed += 1
+
+    def on_change_input(self, fgraph, node, i, r, new_r, reason):
+        # The orderings of the features may change even if the order is
+        # still valid.
+        self.clear_cache()
+        if not self.valid or node == 'output' or new_r.owner is None:
+            return
+        position = self.position
+        lower = position[node]
+        upper = position[new_r.owner]
+        if upper < lower:
+            return
+
+        # The nodes after `node` and before `new_r.owner` that depend on
+        # `node`.
+        forward = []
+        seen = set([node])
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            forward.append(n)
+            for out in n.outputs:
+                for client, _ in out.clients:
+                    if client == 'output' or client in seen:
+                        continue
+                    if client is new_r.owner:
+                        # There is a cycle, the change will be reverted.
+                        self.valid = False
+                        return
+                    if position[client] < upper:
+                        seen.add(client)
+                        stack.append(client)
+
+        # The nodes between the two on which `new_r.owner` depends.
+        backward = []
+        seen = set([new_r.owner])
+        stack = [new_r.owner]
+        while stack:
+            n = stack.pop()
+            backward.append(n)
+            for inp in n.inputs:
+                owner = inp.owner
+                if (owner is not None and owner not in seen and
+                        position[owner] > lower):
+                    seen.add(owner)
+                    stack.append(owner)
+
+        # Put the backward nodes before the forward ones, in the positions
+        # they used.
+        backward.sort(key=position.__getitem__)
+        forward.sort(key=position.__getitem__)
+        slots = sorted(position[n] for n in chain(backward, forward))
+        for slot, n in zip(slots, chain(backward, forward)):
+            position[n] = slot
+            self.order[slot] = n
+
+    def toposort(self):
+        """
+        Return the nodes of the graph in a topological order, without the
+        orderings of the features.
+
+        The same list is returned until the graph changes, it must not be
+        modified.
+
+        """
+        if self.sorted is None:
+            if not self.valid:
+                self.rebuild()
+            elif self.n_removed > len(self.position):
+                self.order = [n for n in self.order if n is not None]
+                self.position = dict((n, i) for i, n in enumerate(self.order))
+                self.n_removed = 0
+            if self.n_removed:
+                self.sorted = [n for n in self.order if n is not None]
+            else:
+                self.sorted = list(self.order)
+        return self.sorted
+
+    def fgraph_toposort(self):
+        """
+        Return the nodes of the graph in a topological order that satisfies
+        the orderings of the features, for `FunctionGraph.toposort`.
+
+        The same list is returned until the graph or its features change,
+        it must not be modified.
+
+        """
+        if self.fgraph_order is None:
+            fgraph = self.fgraph
+            ords = fgraph.orderings()
+            if self.respects(ords):
+                self.fgraph_order = self.toposort()
+            else:
+                self.fgraph_order = graph.io_toposort(
+                    fgraph.inputs, fgraph.outputs, ords)
+        return self.fgraph_order
+
+    def respects(self, orderings):
+        """
+        Return True if the order satisfies `orderings`, a dict that maps
+        nodes to the nodes that must come before them.
+
+        """
+        if not self.valid:
+            self.rebuild()
+        position = self.position
+        for node, prereqs in iteritems(orderings):
+            p = position[node]
+            for prereq in prereqs:
+                if position[prereq] > p:
+                    return False
+        return True
@@ -9,18 +9,23 @@ from __future__ import absolute_import, print_function, division
 
 from . import link
 from collections import defaultdict
+from multiprocessing.pool import ThreadPool
 import logging
 import os
 import sys
+import threading
 import time
 import warnings
 
+import numpy as np
+
 from theano.configparser import (config, _config_var_list)
 
 import theano.gof.cmodule
+import theano.gof.cc
 
 from six import iteritems, itervalues
-from six.moves import xrange
+from six.moves import queue, xrange
 
 logger = logging.getLogger(__name__)
 
@@ -114,6 +119,102 @@ def calculate_reallocate_info(order, fgraph, storage_map, compute_map_re,
     return reallocated_info
 
 
+def liveness_intervals(order, fgraph, excluded=()):
+    """
+    Compute the variables of a schedule whose memory can be planned and
+    the interval of the schedule during which each of them is alive.
+
+    A variable that is a view of another one, or that is computed by
+    destroying another one (according to the view_map and destroy_map of
+    the nodes), shares its memory. So it is not planned, but keeps the
+    variable that owns the memory alive. The variables whose memory
+    escapes, because one of the variables sharing it is an output of
+    `fgraph` or is in `excluded`, are not planned either.
+
+    Parameters
+    ----------
+    order
+        List of Apply nodes, in execution order.
+    fgraph
+        The FunctionGraph of the nodes.
+    excluded
+        Variables whose storage can't be planned, e.g. the no_recycling
+        variables given to the linker.
+
+    Returns
+    -------
+    dict
+        Maps each planned variable to a (first, last) tuple, the indices
+        in `order` of the node computing it and of the last node using it
+        or one of its views.
+
+    """
+    alias_of = {}
+    intervals = {}
+    for idx, node in enumerate(order):
+        vmap = getattr(node.op, 'view_map', {})
+        dmap = getattr(node.op, 'destroy_map', {})
+        for i, inp in enumerate(node.inputs):
+            root = alias_of.get(inp, inp)
+            if root in intervals:
+                intervals[root] = (intervals[root][0], idx)
+        for o, out in enumerate(node.outputs):
+            ins = vmap.get(o, []) + dmap.get(o, [])
+            if ins:
+                inp = node.inputs[ins[0]]
+                alias_of[out] = alias_of.get(inp, inp)
+            elif isinstance(out.type, theano.tensor.TensorType):
+                intervals[out] = (idx, idx)
+    escaped = set(alias_of.get(v, v) for v in
+                  list(fgraph.outputs) + list(excluded))
+    return dict((var, interval) for var, interval in iteritems(intervals)
+                if var not in escaped)
+
+
+def plan_memory(intervals, nbytes, alignment=64):
+    """
+    Assign to each variable an offset in a single buffer, so that the
+    variables alive at the same time don't overlap.
+
+    The biggest variables are placed first, each one at the lowest offset
+    that does not overlap the memory of the placed variables whose
+    liveness interval intersects its own.
+
+    Parameters
+    ----------
+    intervals : dict
+        Maps each variable to its liveness interval, as returned by
+        `liveness_intervals`.
+    nbytes : dict
+        Maps each variable to place to its size in bytes.
+    alignment : int
+        The offsets are multiples of `alignment`.
+
+    Returns
+    -------
+    tuple
+        (offsets, size), the dict mapping each variable of `nbytes` to its
+        offset and the size of the buffer.
+
+    """
+    placed = []
+    offsets = {}
+    size = 0
+    for var in sorted(nbytes, key=lambda v: (-nbytes[v], intervals[v])):
+        first, last = intervals[var]
+        conflicts = sorted((offset, offset + n) for (offset, n, f, l)
+                           in placed if f <= last and first <= l)
+        offset = 0
+        for start, end in conflicts:
+            if offset + nbytes[var] <= start:
+                break
+            offset = max(offset, -(-end // alignment) * alignment)
+        placed.append((offset, nbytes[var], first, last))
+        offsets[var] = offset
+        size = max(size, offset + nbytes[var])
+    return offsets, size
+
+
 class VM(object):
     """
     A VM object's __call__ method evaluates a Theano program.
@@ -146,6 +247,14 @@ class VM(object):
         List of floats, one for each thunk. call_times[i] is the amount of
         runtime spent on thunks[i] in the course of computations performed by
         call_with_timers().
+    timeline
+        None, or a list to which the timed calls append a tuple
+        (i, start, end) each time thunks[i] runs. ParallelLoop adds the
+        identifier of the thread that ran it as a fourth element.
+    skip_profile : bool
+        True during the calls that a sampling profile does not record. The
+        VMs then do not time or count the calls of the thunks, nor record
+        the shapes of the outputs.
 
     need_update_inputs : bool
         True indicates that Function.__call__ must implement the feedback from
@@ -154,6 +263,8 @@ class VM(object):
 
     """
 
+    skip_profile = False
+
     def __init__(self, nodes, thunks, pre_call_clear):
 
         if len(nodes) != len(thunks):
@@ -164,6 +275,7 @@ class VM(object):
         self.call_counts = [0] * len(nodes)
         self.call_times = [0] * len(nodes)
         self.time_thunks = False
+        self.timeline = None
 
         # This variable (self.need_update_inputs) is overshadowed by
         # CLazyLinker in CVM which has an attribute of the same name that
@@ -194,16 +306,22 @@ class VM(object):
     def update_profile(self, profile):
         """
         Accumulate into the profile object
-        """
-        for node, thunk, t, c in zip(self.nodes, self.thunks,
-                                     self.call_times, self.call_counts):
-            profile.apply_time.setdefault(node, 0.0)
-            profile.apply_time[node] += t
 
-            profile.apply_callcount.setdefault(node, 0)
-            profile.apply_callcount[node] += c
+        When the profile only times 1 in `profile.sample` calls, the times
+        and call counts are scaled to estimate those of all the calls.
 
-            profile.apply_cimpl[node] = hasattr(thunk, 'cthunk')
+        """
+        sample = getattr(profile, 'sample', 1)
+        apply_time = profile.apply_time
+        apply_callcount = profile.apply_callcount
+        for node, t, c in zip(self.nodes, self.call_times, self.call_counts):
+            apply_time[node] = apply_time.get(node, 0.0) + t * sample
+            apply_callcount[node] = apply_callcount.get(node, 0) + c * sample
+
+        apply_cimpl = profile.apply_cimpl
+        if self.nodes and self.nodes[-1] not in apply_cimpl:
+            for node, thunk in zip(self.nodes, self.thunks):
+                apply_cimpl[node] = hasattr(thunk, 'cthunk')
 
         if hasattr(self, 'variable_shape'):
             profile.variable_shape = self.variable_shape.copy()
@@ -218,10 +336,18 @@ class VM(object):
         if hasattr(self, 'dependencies'):
             profile.dependencies = self.dependencies
 
+        if getattr(profile, 'timeline', None) is not None and self.timeline:
+            tid = threading.current_thread().ident
+            profile.timeline.append(
+                [(self.nodes[event[0]], event[1], event[2],
+                  event[3] if len(event) > 3 else tid)
+                 for event in self.timeline])
+            del self.timeline[:]
+
         # clear the timer info out of the buffers
-        for i in xrange(len(self.call_times)):
-            self.call_times[i] = 0.0
-            self.call_counts[i] = 0
+        n = len(self.call_times)
+        self.call_times[:] = [0.0] * n
+        self.call_counts[:] = [0] * n
 
 
 class Loop(VM):
@@ -245,6 +371,8 @@ class Loop(VM):
                     t1 = time.time()
                     self.call_counts[i] += 1
                     self.call_times[i] += t1 - t0
+                    if self.timeline is not None:
+                        self.timeline.append((i, t0, t1))
             except:
                 link.raise_with_op(node, thunk)
         else:
@@ -286,6 +414,8 @@ class LoopGC(VM):
                     t1 = time.time()
                     self.call_counts[i] += 1
                     self.call_times[i] += t1 - t0
+                    if self.timeline is not None:
+                        self.timeline.append((i, t0, t1))
                     for old_s in old_storage:
                         old_s[0] = None
                     i += 1
@@ -304,6 +434,311 @@ class LoopGC(VM):
                 link.raise_with_op(node, thunk)
 
 
+class ArenaLoop(VM):
+    """
+    Unconditional start-to-finish program execution in Python, with the
+    intermediate results stored in a single preallocated buffer.
+
+    The first call for given shapes and dtypes of the inputs records the
+    size of the intermediate results. Their offsets in the buffer are then
+    planned from their liveness, see `liveness_intervals` and
+    `plan_memory`. The following calls with the same input signature put
+    views of the buffer in the storage of the intermediate results before
+    running the thunks. The thunks that reuse their output storage when it
+    has the right shape, as most C thunks do, then compute in place
+    instead of allocating new arrays. The buffer is shared by all the
+    signatures and grows to the biggest plan.
+
+    The outputs of the graph, and the variables that share their memory,
+    are never planned, as they are returned to the user.
+
+    Parameters
+    ----------
+    nodes
+        A list of nodes in toposort order.
+    thunks
+        A list of thunks to execute those nodes, in toposort order.
+    pre_call_clear
+        A list of containers to empty at the beginning of each call.
+    storage_map
+        Maps each variable of the graph to its storage.
+    fgraph
+        The FunctionGraph of the nodes.
+    no_recycling
+        Variables whose storage can't be planned.
+    post_thunk_clear
+        If not None, the list of the storage to free after each thunk, as
+        for LoopGC. The planned variables are never freed.
+
+    """
+
+    def __init__(self, nodes, thunks, pre_call_clear, storage_map, fgraph,
+                 no_recycling, post_thunk_clear=None):
+        super(ArenaLoop, self).__init__(nodes, thunks, pre_call_clear)
+        self.intervals = liveness_intervals(nodes, fgraph, no_recycling)
+        self.planned = [(var, storage_map[var]) for var in self.intervals]
+        self.input_storage = [storage_map[var] for var in fgraph.inputs]
+        if post_thunk_clear is not None:
+            planned = set(id(storage) for var, storage in self.planned)
+            post_thunk_clear = [[s for s in old_storage
+                                 if id(s) not in planned]
+                                for old_storage in post_thunk_clear]
+        else:
+            post_thunk_clear = [[] for node in nodes]
+        self.post_thunk_clear = post_thunk_clear
+        # Some other part of Theano query that information
+        self.allow_gc = False
+        # Maps each input signature to a list of (storage, shape, dtype,
+        # offset) of the planned variables.
+        self.plans = {}
+        self.arena = None
+        # The views of the arena for the plan of the previous call.
+        self.views = None
+        self.views_signature = None
+
+    def signature(self):
+        """
+        Return the shapes and dtypes of the current inputs.
+
+        """
+        return tuple((getattr(s[0], 'shape', None),
+                      getattr(s[0], 'dtype', None))
+                     for s in self.input_storage)
+
+    def make_plan(self, signature):
+        """
+        Plan the storage of the intermediate results, whose values are
+        those computed by the last call.
+
+        """
+        nbytes = {}
+        values = {}
+        for var, storage in self.planned:
+            value = storage[0]
+            if (isinstance(value, np.ndarray) and
+                    value.dtype == np.dtype(var.type.dtype)):
+                nbytes[var] = max(value.nbytes, 1)
+                values[var] = value
+        offsets, size = plan_memory(self.intervals, nbytes)
+        if self.arena is None or self.arena.nbytes < size:
+            self.arena = np.empty(size, dtype='uint8')
+            self.views_signature = None
+        self.plans[signature] = [
+            (storage, values[var].shape, values[var].dtype, offsets[var])
+            for var, storage in self.planned if var in offsets]
+
+    def __call__(self):
+        for cont in self.pre_call_clear:
+            cont[0] = None
+        signature = self.signature()
+        plan = self.plans.get(signature)
+        if plan is not None:
+            if self.views_signature != signature:
+                self.views = [
+                    (storage, np.ndarray(shape, dtype, buffer=self.arena,
+                                         offset=offset))
+                    for storage, shape, dtype, offset in plan]
+                self.views_signature = signature
+            for storage, view in self.views:
+                storage[0] = view
+        try:
+            if self.time_thunks:
+                for i, (thunk, node, old_storage) in enumerate(
+                        zip(self.thunks, self.nodes, self.post_thunk_clear)):
+                    t0 = time.time()
+                    thunk()
+                    t1 = time.time()
+                    self.call_counts[i] += 1
+                    self.call_times[i] += t1 - t0
+                    if self.timeline is not None:
+                        self.timeline.append((i, t0, t1))
+                    for old_s in old_storage:
+                        old_s[0] = None
+            else:
+                for thunk, node, old_storage in zip(self.thunks, self.nodes,
+                                                    self.post_thunk_clear):
+                    thunk()
+                    for old_s in old_storage:
+                        old_s[0] = None
+        except:
+            link.raise_with_op(node, thunk)
+        if plan is None:
+            self.make_plan(signature)
+
+
+# The thread pools shared by the ParallelLoop VMs, by number of threads.
+_thread_pools = {}
+_thread_pools_lock = threading.Lock()
+# Tells if the current thread is running a thunk for a ParallelLoop.
+_thread_state = threading.local()
+
+
+def get_thread_pool(n_threads):
+    """
+    Return the pool of `n_threads` threads shared by the ParallelLoop VMs.
+
+    """
+    with _thread_pools_lock:
+        pool = _thread_pools.get(n_threads)
+        if pool is None:
+            pool = _thread_pools[n_threads] = ThreadPool(n_threads)
+        return pool
+
+
+class ParallelLoop(VM):
+    """
+    Unconditional program execution in Python, running the thunks of
+    independent nodes concurrently on a pool of threads.
+
+    A node is run as soon as the nodes computing its inputs are done, as
+    well as the nodes that must run before it according to
+    `fgraph.orderings()`, e.g. because it destroys one of their inputs.
+    Garbage collection is possible on intermediate results: a variable is
+    freed when all the nodes using it are done.
+
+    Only the thunks that release the GIL really run in parallel. This is
+    the case of most NumPy calls and, when Theano is linked with a BLAS
+    library, of the C code of the BLAS ops (Gemm, Dot22, Gemv, Ger),
+    CorrMM, Corr3dMM and Pool.
+
+    Parameters
+    ----------
+    nodes
+        A list of nodes in toposort order.
+    thunks
+        A list of thunks to execute those nodes, in toposort order.
+    pre_call_clear
+        A list of containers to empty at the beginning of each call.
+    storage_map
+        Maps each variable of the graph to its storage.
+    fgraph
+        The FunctionGraph of the nodes.
+    n_threads : int
+        Number of threads running the thunks. If it is lower than 2, the
+        thunks are run by the calling thread.
+    allow_gc : bool
+        If True, free the intermediate results when they are not needed
+        anymore.
+
+    """
+
+    def __init__(self, nodes, thunks, pre_call_clear, storage_map, fgraph,
+                 n_threads, allow_gc):
+        super(ParallelLoop, self).__init__(nodes, thunks, pre_call_clear)
+        self.n_threads = n_threads
+        # Some other part of Theano query that information
+        self.allow_gc = allow_gc
+
+        node_idx = dict((node, i) for i, node in enumerate(nodes))
+        ords = fgraph.orderings()
+        # The nodes to run after each node and the number of nodes to run
+        # before each node.
+        self.children = [[] for node in nodes]
+        self.n_parents = []
+        for i, node in enumerate(nodes):
+            parents = set(node_idx[inp.owner] for inp in node.inputs
+                          if inp.owner)
+            parents.update(node_idx[prereq] for prereq in ords.get(node, []))
+            for p in parents:
+                self.children[p].append(i)
+            self.n_parents.append(len(parents))
+
+        # The storage that can be freed, the number of nodes using each of
+        # them and the ones used by each node.
+        self.gc_storage = []
+        self.gc_n_users = []
+        self.post_thunk_clear = [[] for node in nodes]
+        if allow_gc:
+            outputs = set(fgraph.outputs)
+            gc_idx = {}
+            for i, node in enumerate(nodes):
+                for inp in set(node.inputs):
+                    if inp.owner is None or inp in outputs:
+                        continue
+                    if inp not in gc_idx:
+                        gc_idx[inp] = len(self.gc_storage)
+                        self.gc_storage.append(storage_map[inp])
+                        self.gc_n_users.append(0)
+                    self.gc_n_users[gc_idx[inp]] += 1
+                    self.post_thunk_clear[i].append(gc_idx[inp])
+
+    def run_thunk(self, i):
+        """
+        Run the thunk of the i-th node.
+
+        Returns
+        -------
+        tuple
+            (i, exc_info), exc_info being None if the thunk succeeded.
+
+        """
+        in_worker = getattr(_thread_state, 'in_worker', False)
+        _thread_state.in_worker = True
+        try:
+            if self.time_thunks:
+                t0 = time.time()
+                self.thunks[i]()
+                t1 = time.time()
+                self.call_times[i] += t1 - t0
+                self.call_counts[i] += 1
+                if self.timeline is not None:
+                    self.timeline.append(
+                        (i, t0, t1, threading.current_thread().ident))
+            else:
+                self.thunks[i]()
+            return i, None
+        except:
+            return i, sys.exc_info()
+        finally:
+            _thread_state.in_worker = in_worker
+
+    def __call__(self):
+        for cont in self.pre_call_clear:
+            cont[0] = None
+        if (self.n_threads < 2 or
+                getattr(_thread_state, 'in_worker', False)):
+            # Waiting for the pool from one of its threads, e.g. if this is
+            # the inner function of a Scan run by another ParallelLoop,
+            # could deadlock. So the calling thread runs the thunks.
+            pool = None
+        else:
+            pool = get_thread_pool(self.n_threads)
+        n_parents = list(self.n_parents)
+        gc_n_users = list(self.gc_n_users)
+        ready = [i for i, n in enumerate(n_parents) if n == 0]
+        done = queue.Queue()
+        n_running = 0
+        error = None
+        while n_running or (ready and error is None):
+            if error is None:
+                for i in ready:
+                    if pool is None:
+                        done.put(self.run_thunk(i))
+                    else:
+                        pool.apply_async(self.run_thunk, (i,),
+                                         callback=done.put)
+                n_running += len(ready)
+                ready = []
+            i, exc_info = done.get()
+            n_running -= 1
+            if exc_info is not None:
+                # Wait for the running thunks, but don't start new ones.
+                if error is None:
+                    error = (i, exc_info)
+                continue
+            for j in self.children[i]:
+                n_parents[j] -= 1
+                if n_parents[j] == 0:
+                    ready.append(j)
+            for k in self.post_thunk_clear[i]:
+                gc_n_users[k] -= 1
+                if gc_n_users[k] == 0:
+                    self.gc_storage[k][0] = None
+        if error is not None:
+            i, exc_info = error
+            link.raise_with_op(self.nodes[i], self.thunks[i], exc_info)
+
+
 class Stack(VM):
     """
     Finish-to-start evalution order of thunks.
@@ -386,15 +821,22 @@ class Stack(VM):
 
         """
         idx = self.node_idx[node]
-        t0 = time.time()
-        rval = self.thunks[idx]()
+        if self.skip_profile:
+            # The calls that a sampling profile does not record are not
+            # timed.
+            rval = self.thunks[idx]()
+            dt = 0
+        else:
+            t0 = time.time()
+            rval = self.thunks[idx]()
+            # Some thunks on some computers run faster than the granularity
+            # of the time.time clock.
+            # Profile output looks buggy if a node has run but takes 0 time.
+            # (and profile code might hide real bugs if it rounds up 0)
+            dt = max(time.time() - t0, 1e-10)
+            if self.timeline is not None and self.time_thunks:
+                self.timeline.append((idx, t0, t0 + dt))
         self.node_executed_order.append(node)
-
-        # Some thunks on some computers run faster than the granularity
-        # of the time.time clock.
-        # Profile output looks buggy if a node has run but takes 0 time.
-        # (and profile code might hide real bugs if it rounds up 0)
-        dt = max(time.time() - t0, 1e-10)
         if self.callback is not None:
             self.callback(
                 node=node,
@@ -482,7 +924,8 @@ class Stack(VM):
                     try:
                         _, dt = self.run_thunk_of_node(current_apply)
                         del _
-                        if config.profile or config.print_global_stats:
+                        if ((config.profile or config.print_global_stats) and
+                                not self.skip_profile):
                             current_idx = self.node_idx[current_apply]
                             self.call_counts[current_idx] += 1
                             self.call_times[current_idx] += dt
@@ -578,8 +1021,9 @@ class Stack(VM):
                 try:
                     requires, dt = self.run_thunk_of_node(current_apply)
                     current_idx = self.node_idx[current_apply]
-                    self.call_counts[current_idx] += 1
-                    self.call_times[current_idx] += dt
+                    if not self.skip_profile:
+                        self.call_counts[current_idx] += 1
+                        self.call_times[current_idx] += dt
 
                 except Exception:
                     link.raise_with_op(
@@ -713,12 +1157,23 @@ class VM_Linker(link.LocalLinker):
     allow_partial_eval
         If True, enforces usage of Stack or CVM, to allow for partial
         evaluation of functions (calculating a subset of outputs).
+    threads
+        Number of threads used to run the independent nodes concurrently
+        with a ParallelLoop, for graphs without lazy nodes. It takes
+        precedence over use_cloop. When None, use the Theano flag
+        vm.threads value.
+    memory_plan
+        If True, store the intermediate results in a single buffer planned
+        from their liveness with an ArenaLoop, for graphs without lazy
+        nodes when a single thread is used. It takes precedence over
+        use_cloop. When None, use the Theano flag vm.memory_plan value.
 
     """
 
     def __init__(self, allow_gc=None, use_cloop=False, callback=None,
                  callback_input=None, lazy=None, schedule=None,
-                 c_thunks=None, allow_partial_eval=None):
+                 c_thunks=None, allow_partial_eval=None, threads=None,
+                 memory_plan=None):
         # Note: if more parameters are added to __init__, make sure to forward
         # them in the "type(self)(...)" call in the "accept" method below.
         if allow_gc is None:
@@ -733,6 +1188,8 @@ class VM_Linker(link.LocalLinker):
             c_thunks = bool(theano.config.cxx)
         self.c_thunks = c_thunks
         self.allow_partial_eval = allow_partial_eval
+        self.threads = threads
+        self.memory_plan = memory_plan
         self.updated_vars = {}
         if schedule:
             self.schedule = schedule
@@ -786,7 +1243,9 @@ class VM_Linker(link.LocalLinker):
                 lazy=self.lazy,
                 schedule=self.schedule,
                 c_thunks=self.c_thunks,
-                allow_partial_eval=self.allow_partial_eval
+                allow_partial_eval=self.allow_partial_eval,
+                threads=self.threads,
+                memory_plan=self.memory_plan
             ).accept(fgraph, no_recycling, profile)
         self.fgraph = fgraph
         self.no_recycling = no_recycling
@@ -794,6 +1253,25 @@ class VM_Linker(link.LocalLinker):
 
         return self
 
+    def get_threads(self):
+        """
+        Return the number of threads used to run the nodes.
+
+        """
+        if self.threads is None:
+            return config.vm.threads
+        return self.threads
+
+    def get_memory_plan(self):
+        """
+        Return True if the intermediate results are stored in a planned
+        buffer.
+
+        """
+        if self.memory_plan is None:
+            return config.vm.memory_plan
+        return self.memory_plan
+
     def accept_var_updates(self, updated_vars):
         self.updated_vars = updated_vars
         # This method simply records in the linker which variables have update
@@ -855,6 +1333,12 @@ class VM_Linker(link.LocalLinker):
 
         pre_call_clear = [storage_map[v] for v in self.no_recycling]
 
+        lazy = self.lazy
+        if lazy is None:
+            lazy = config.vm.lazy
+        if lazy is None:
+            lazy = not all([(not th.lazy) for th in thunks])
+
         if (self.callback is not None or self.callback_input is not None or
                 ((config.profile or config.print_global_stats) and config.profile_memory) or
                 (self.allow_partial_eval and not self.use_cloop)):
@@ -879,6 +1363,16 @@ class VM_Linker(link.LocalLinker):
                 dependencies=deps,
                 callback=self.callback,
                 callback_input=self.callback_input)
+        elif self.get_threads() > 1 and not lazy:
+            vm = ParallelLoop(
+                nodes, thunks, pre_call_clear,
+                storage_map, self.fgraph,
+                self.get_threads(), self.allow_gc)
+        elif self.get_memory_plan() and not lazy:
+            vm = ArenaLoop(
+                nodes, thunks, pre_call_clear,
+                storage_map, self.fgraph, self.no_recycling,
+                post_thunk_clear)
         elif self.use_cloop:
             # create a map from nodes to ints and vars to ints
             nodes_idx = {}
@@ -989,11 +1483,6 @@ class VM_Linker(link.LocalLinker):
             )
             assert c0 == sys.getrefcount(node_n_inputs)
         else:
-            lazy = self.lazy
-            if lazy is None:
-                lazy = config.vm.lazy
-            if lazy is None:
-                lazy = not all([(not th.lazy) for th in thunks])
             if not lazy:
                 # there is no conditional in the graph
                 if self.allow_gc:
@@ -1053,6 +1542,9 @@ class VM_Linker(link.LocalLinker):
         impl = None
         if self.c_thunks is False:
             impl = 'py'
+        else:
+            theano.gof.cc.precompile_nodes(order, storage_map, compute_map,
+                                           no_recycling)
         for node in order:
             try:
                 thunk_start = time.time()
@@ -1086,8 +1578,10 @@ class VM_Linker(link.LocalLinker):
             lazy = config.vm.lazy
         if lazy is None:
             lazy = not all([(not th.lazy) for th in thunks])
+        # The reuse of the storage relies on the nodes being run in order.
         if not (lazy or ((config.profile or config.print_global_stats) and config.profile_memory) or
-                self.use_cloop or self.callback or self.callback_input):
+                self.use_cloop or self.callback or self.callback_input or
+                self.get_threads() > 1 or self.get_memory_plan()):
             for pair in itervalues(reallocated_info):
                 storage_map[pair[1]] = storage_map[pair[0]]
 
@@ -1133,3 +1627,7 @@ class VM_Linker(link.LocalLinker):
             self.allow_partial_eval = None
         if not hasattr(self, 'callback_input'):
             self.callback_input = None
+        if not hasattr(self, 'threads'):
+            self.threads = None
+        if not hasattr(self, 'memory_plan'):
+            self.memory_plan = None
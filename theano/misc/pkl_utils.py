@@ -8,6 +8,7 @@ from __future__ import absolute_import, print_function, division
 import numpy as np
 import os
 import pickle
+import shutil
 import sys
 import tempfile
 import zipfile
@@ -23,6 +24,7 @@ except ImportError:
 
 import theano
 from theano import config
+from theano.configparser import change_flags
 from theano.compat import PY3
 from six import string_types
 from theano.compile.sharedvalue import SharedVariable
@@ -374,6 +376,162 @@ def load(f, persistent_load=PersistentNdarrayLoad):
         return p.load()
 
 
+def _function_module_dirs(fn, dirs):
+    """Add to `dirs` the cache directories of the C modules used by `fn`.
+
+    The inner functions of Ops like Scan are visited too. Only the modules
+    with a versioned key can be found in the cache.
+
+    """
+    cache = theano.gof.cc.get_module_cache()
+    maker = fn.maker
+    linker = maker.linker
+    if hasattr(linker, 'cmodule_key'):
+        keys = [linker.cmodule_key()]
+    else:
+        keys = [key for key, lnk in theano.gof.cc.node_clinkers(
+            maker.fgraph.toposort(), linker.no_recycling)]
+    for key in keys:
+        entry = cache.entry_from_key.get(key)
+        if entry is not None and key[0]:
+            dirs.add(os.path.dirname(entry))
+    for node in maker.fgraph.apply_nodes:
+        attr = theano.gof.op.ops_with_inner_function.get(type(node.op))
+        inner = getattr(node.op, attr, None) if attr else None
+        if isinstance(inner, theano.compile.Function):
+            _function_module_dirs(inner, dirs)
+
+
+# The extension modules that Theano compiles in the root of the compilation
+# directory, instead of in the module cache.
+_base_modules = ('lazylinker_ext', 'cutils_ext', 'scan_perform')
+
+
+def _base_module_file(compiledir, name):
+    # The path of the shared library of the base module `name`.
+    return os.path.join(compiledir, name, '%s.%s' % (
+        name, theano.gof.cmodule.get_lib_extension()))
+
+
+def dump_function(fn, file_handler, protocol=DEFAULT_PROTOCOL):
+    """Save a compiled function with the C modules it uses to a zip file.
+
+    The function can then be loaded with :func:`load_function` in a new
+    process, without optimizing its graph again nor compiling C code, even
+    if the compilation directory of that process is empty.
+
+    :param fn: The function to save.
+    :type fn: :class:`theano.compile.function_module.Function`
+
+    :param file_handler: The file handle to save the function to.
+    :type file_handler: file
+
+    :param protocol: The pickling protocol to use.
+    :type protocol: int, optional
+
+    .. note::
+        The modules are only reused if the loading process has the same
+        platform, compiler, compilation flags and NumPy ABI version, since
+        they are part of the module keys. Otherwise they are recompiled.
+        Modules without a versioned key are not saved.
+
+    .. note::
+        The base extension modules of Theano (`lazylinker_ext`,
+        `cutils_ext` and `scan_perform`) are saved too, in `base/`.
+        :func:`load_function` adds the missing ones to the compilation
+        directory, but `lazylinker_ext` and `cutils_ext` are compiled
+        when Theano is imported, before it runs. For a process with an
+        empty compilation directory to never run the compiler, extract
+        the files of `base/` in its compilation directory before
+        importing Theano, e.g. `base/cutils_ext/cutils_ext.so` to
+        `<compiledir>/cutils_ext/cutils_ext.so`. This only needs the
+        `zipfile` module.
+
+    .. note::
+        The zip file contains the pickled function, `pkl`, the cache
+        directory of each module, in `modules/`, and the base modules, in
+        `base/`.
+
+    """
+    dirs = set()
+    _function_module_dirs(fn, dirs)
+    base_dirs = [os.path.join(config.compiledir, name) for name in
+                 _base_modules
+                 if os.path.exists(_base_module_file(config.compiledir,
+                                                     name))]
+    with closing(zipfile.ZipFile(file_handler, 'w', zipfile.ZIP_DEFLATED,
+                                 allowZip64=True)) as zip_file:
+        def func(f):
+            pickle.Pickler(f, protocol=protocol).dump(fn)
+        zipadd(func, zip_file, 'pkl')
+        for prefix, ds in [('modules', sorted(dirs)), ('base', base_dirs)]:
+            for d in ds:
+                for name in os.listdir(d):
+                    path = os.path.join(d, name)
+                    if os.path.isfile(path) and not name.endswith('.pyc'):
+                        zip_file.write(path, arcname='/'.join(
+                            [prefix, os.path.basename(d), name]))
+
+
+def load_function(f):
+    """Load a function saved by :func:`dump_function`.
+
+    The C modules stored in the file are added to the compilation
+    directory, unless a directory with the same name is already there.
+    So are the base modules missing from it, see :func:`dump_function`.
+    The graph of the function is not optimized again.
+
+    :param f: The file handle to the zip file to load the function from.
+    :type f: file
+
+    """
+    cache = theano.gof.cc.get_module_cache()
+    with closing(zipfile.ZipFile(f, 'r')) as zip_file:
+        modules = defaultdict(list)
+        base = defaultdict(list)
+        for name in zip_file.namelist():
+            if name.startswith('modules/'):
+                _, subdir, filename = name.split('/')
+                modules[subdir].append(filename)
+            elif name.startswith('base/'):
+                _, subdir, filename = name.split('/')
+                base[subdir].append(filename)
+        for subdir, filenames in base.items():
+            if (subdir not in _base_modules or os.path.exists(
+                    _base_module_file(cache.dirname, subdir))):
+                continue
+            root = os.path.join(cache.dirname, subdir)
+            lib = os.path.basename(_base_module_file(cache.dirname, subdir))
+            with theano.gof.compilelock.lock_ctx():
+                if not os.path.isdir(root):
+                    os.mkdir(root)
+                # The shared library is written last, so that a module
+                # whose library is there is complete.
+                for filename in sorted(filenames, key=lambda n: n == lib):
+                    with open(os.path.join(root, filename), 'wb') as out:
+                        out.write(zip_file.read(
+                            '/'.join(['base', subdir, filename])))
+        for subdir, filenames in modules.items():
+            root = os.path.join(cache.dirname, subdir)
+            if not os.path.exists(root):
+                # Extract next to the final location and rename, so that
+                # other processes never see a partial module.
+                tmp_dir = tempfile.mkdtemp(dir=cache.dirname)
+                for filename in filenames:
+                    with open(os.path.join(tmp_dir, filename), 'wb') as out:
+                        out.write(zip_file.read(
+                            '/'.join(['modules', subdir, filename])))
+                try:
+                    os.rename(tmp_dir, root)
+                except OSError:
+                    # Another process extracted it at the same time.
+                    shutil.rmtree(tmp_dir, ignore_errors=True)
+            cache.add_module_dir(root, add_to_index=True)
+
+        with change_flags(reoptimize_unpickled_function=False):
+            return pickle.loads(zip_file.read('pkl'))
+
+
 def zipadd(func, zip_file, name):
     """Calls a function with a file object, saving it to a zip file.
 
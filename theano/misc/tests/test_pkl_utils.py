@@ -1,7 +1,11 @@
 from __future__ import absolute_import, print_function, division
+import json
 import os
 import shutil
+import subprocess
+import sys
 import unittest
+import zipfile
 from tempfile import mkdtemp
 
 import numpy as np
@@ -13,7 +17,48 @@ import theano.sandbox.cuda as cuda_ndarray
 from theano.sandbox.cuda.type import CudaNdarrayType
 from theano.sandbox.cuda.var import CudaNdarraySharedVariable
 from theano.sandbox.rng_mrg import MRG_RandomStreams
-from theano.misc.pkl_utils import dump, load, StripPickler
+from theano.misc.pkl_utils import (dump, load, dump_function, load_function,
+                                   StripPickler)
+
+
+# Loads the function saved in the file sys.argv[1], while any compilation of
+# a C module makes the process fail.
+LOAD_FUNCTION_SCRIPT = """
+import json
+import os
+import sys
+import zipfile
+
+# Extract the base modules before importing Theano, which would compile
+# them.
+compiledir = sys.argv[2]
+stamps = {}
+with zipfile.ZipFile(sys.argv[1]) as zip_file:
+    for name in zip_file.namelist():
+        if name.startswith('base/'):
+            path = os.path.join(compiledir, *name.split('/')[1:])
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, 'wb') as f:
+                f.write(zip_file.read(name))
+            stamps[path] = os.stat(path).st_mtime
+
+import numpy as np
+import theano
+from theano.misc.pkl_utils import load_function
+
+
+def compile_str(*args, **kwargs):
+    raise AssertionError('A C module was compiled.')
+theano.gof.cmodule.GCC_compiler.compile_str = staticmethod(compile_str)
+with open(sys.argv[1], 'rb') as f:
+    fn = load_function(f)
+assert theano.compile.profiling.total_graph_opt_time == 0
+assert any(hasattr(thunk, 'cthunk') for thunk in fn.fn.thunks)
+assert all(os.stat(path).st_mtime == stamp
+           for path, stamp in stamps.items())
+print(json.dumps([fn(np.zeros(3)).tolist(), fn(np.zeros(3)).tolist()]))
+"""
 
 
 class T_dump_load(unittest.TestCase):
@@ -70,6 +115,37 @@ class T_dump_load(unittest.TestCase):
             foo_1, foo_2, foo_3, array = load(f)
         assert array == np.array(3)
 
+    def test_dump_load_function(self):
+        if not theano.config.cxx:
+            raise SkipTest("G++ not available, so we need to skip this test.")
+        x = theano.tensor.dvector('x')
+        w = theano.shared(np.arange(3.), name='w')
+        fn = theano.function([x], theano.tensor.exp(x) * w,
+                             updates=[(w, w + 1)],
+                             mode=theano.Mode(linker='cvm',
+                                              optimizer='fast_run'))
+        with open('fn.zip', 'wb') as f:
+            dump_function(fn, f)
+        names = zipfile.ZipFile('fn.zip').namelist()
+        assert 'pkl' in names
+        assert any(name.startswith('modules/') for name in names)
+        assert any(name.startswith('base/lazylinker_ext/') for name in names)
+
+        # Load it in a new process with an empty compilation directory,
+        # without running the compiler.
+        compiledir = os.path.join(self.tmpdir, 'cache')
+        env = dict(os.environ)
+        env['THEANO_FLAGS'] = '%s,compiledir=%s' % (
+            env.get('THEANO_FLAGS', ''), compiledir)
+        env['PYTHONPATH'] = os.pathsep.join(
+            [os.path.dirname(os.path.dirname(theano.__file__))] +
+            env.get('PYTHONPATH', '').split(os.pathsep))
+        out = subprocess.check_output(
+            [sys.executable, '-c', LOAD_FUNCTION_SCRIPT,
+             os.path.abspath('fn.zip'), compiledir], env=env)
+        outputs = json.loads(out.decode().strip().splitlines()[-1])
+        np.testing.assert_allclose(outputs, [np.arange(3.), np.arange(3.) + 1])
+
 
 class TestStripPickler(unittest.TestCase):
     def setUp(self):
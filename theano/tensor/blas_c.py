@@ -251,18 +251,22 @@ def ger_c_code(A, a, x, y, Z, destructive, fail):
                 if (PyArray_DESCR(%(Z)s)->type_num == NPY_FLOAT)
                 {
                     float alpha = ((dtype_%(a)s*)PyArray_DATA(%(a)s))[0];
+                    THEANO_BLAS_BEGIN_NOGIL
                     sger_(&Nz0, &Nz1, &alpha,
                         (float*)x_data, &Sx,
                         (float*)y_data, &Sy,
                         (float*)(PyArray_DATA(%(Z)s)), &Sz1);
+                    THEANO_BLAS_END_NOGIL
                 }
                 else if (PyArray_DESCR(%(Z)s)->type_num == NPY_DOUBLE)
                 {
                     double alpha = ((dtype_%(a)s*)PyArray_DATA(%(a)s))[0];
+                    THEANO_BLAS_BEGIN_NOGIL
                     dger_(&Nz0, &Nz1, &alpha,
                         (double*)x_data, &Sx,
                         (double*)y_data, &Sy,
                         (double*)(PyArray_DATA(%(Z)s)), &Sz1);
+                    THEANO_BLAS_END_NOGIL
 
 
                 }
@@ -277,18 +281,22 @@ def ger_c_code(A, a, x, y, Z, destructive, fail):
                 if (PyArray_DESCR(%(Z)s)->type_num == NPY_FLOAT)
                 {
                     float alpha = ((dtype_%(a)s*)(PyArray_DATA(%(a)s)))[0];
+                    THEANO_BLAS_BEGIN_NOGIL
                     sger_(&Nz1, &Nz0, &alpha,
                         (float*)y_data, &Sy,
                         (float*)x_data, &Sx,
                         (float*)(PyArray_DATA(%(Z)s)), &Sz0);
+                    THEANO_BLAS_END_NOGIL
                 }
                 else if (PyArray_DESCR(%(Z)s)->type_num == NPY_DOUBLE)
                 {
                     double alpha = ((dtype_%(a)s*)PyArray_DATA(%(a)s))[0];
+                    THEANO_BLAS_BEGIN_NOGIL
                     dger_(&Nz1, &Nz0, &alpha,
                         (double*)y_data, &Sy,
                         (double*)x_data, &Sx,
                         (double*)(PyArray_DATA(%(Z)s)), &Sz0);
+                    THEANO_BLAS_END_NOGIL
                 }
                 else
                 {
@@ -479,22 +487,26 @@ def gemv_c_code(y, A, x, z, alpha, beta, destructive, fail,
                 if (PyArray_DESCR(%(A)s)->type_num == NPY_FLOAT)
                 {
                     float alpha = ((dtype_%(alpha)s*)PyArray_DATA(%(alpha)s))[0];
+                    THEANO_BLAS_BEGIN_NOGIL
                     sgemv_(&NOTRANS, &NA0, &NA1,
                         &alpha,
                         (float*)(PyArray_DATA(%(A)s)), &SA1,
                         (float*)x_data, &Sx,
                         &fbeta,
                         (float*)z_data, &Sz);
+                    THEANO_BLAS_END_NOGIL
                 }
                 else if (PyArray_DESCR(%(A)s)->type_num == NPY_DOUBLE)
                 {
                     double alpha = ((dtype_%(alpha)s*)PyArray_DATA(%(alpha)s))[0];
+                    THEANO_BLAS_BEGIN_NOGIL
                     dgemv_(&NOTRANS, &NA0, &NA1,
                         &alpha,
                         (double*)(PyArray_DATA(%(A)s)), &SA1,
                         (double*)x_data, &Sx,
                         &dbeta,
                         (double*)z_data, &Sz);
+                    THEANO_BLAS_END_NOGIL
                 }
                 else
                 {
@@ -525,12 +537,14 @@ def gemv_c_code(y, A, x, z, alpha, beta, destructive, fail,
                     }
                     else
                     {
+                        THEANO_BLAS_BEGIN_NOGIL
                         sgemv_(&TRANS, &NA1, &NA0,
                             &alpha,
                             (float*)(PyArray_DATA(%(A)s)), &SA0,
                             (float*)x_data, &Sx,
                             &fbeta,
                             (float*)z_data, &Sz);
+                        THEANO_BLAS_END_NOGIL
                     }
                 }
                 else if (PyArray_DESCR(%(A)s)->type_num == NPY_DOUBLE)
@@ -553,12 +567,14 @@ def gemv_c_code(y, A, x, z, alpha, beta, destructive, fail,
                     }
                     else
                     {
+                        THEANO_BLAS_BEGIN_NOGIL
                         dgemv_(&TRANS, &NA1, &NA0,
                             &alpha,
                             (double*)(PyArray_DATA(%(A)s)), &SA0,
                             (double*)x_data, &Sx,
                             &dbeta,
                             (double*)z_data, &Sz);
+                        THEANO_BLAS_END_NOGIL
                     }
                 }
                 else
@@ -984,6 +984,20 @@ def blas_header_text():
                     }
                     """)
 
+    # The BLAS calls don't need the GIL, so other threads can run during
+    # them, e.g. the other thunks of a ParallelLoop. The NumPy
+    # implementation of gemm used without BLAS library needs it.
+    if config.blas.ldflags:
+        nogil = ("Py_BEGIN_ALLOW_THREADS", "Py_END_ALLOW_THREADS")
+    else:
+        nogil = ("{", "}")
+    header += textwrap.dedent("""\
+            #ifndef THEANO_BLAS_BEGIN_NOGIL
+            #define THEANO_BLAS_BEGIN_NOGIL %s
+            #define THEANO_BLAS_END_NOGIL %s
+            #endif
+            """ % nogil)
+
     return (header % {'const': const}) + gemm_code
 
 
@@ -1032,7 +1046,7 @@ def openblas_threads_text():
 
 def blas_header_version():
     # Version for the base header
-    version = (1,)
+    version = (2,)
     if detect_macos_sdot_bug():
         if detect_macos_sdot_bug.fix_works:
             # Version with fix
@@ -1,10 +1,15 @@
 from __future__ import absolute_import, print_function, division
+import atexit
+import mmap
+import os
+import tempfile
 import traceback
 
 import numpy
 from six import integer_types
 
 import theano.tensor.basic
+from theano.gof import Container
 from theano.tensor.basic import TensorType, _tensor_py_operators
 from theano.compile import shared_constructor, SharedVariable
 
@@ -57,6 +62,417 @@ def tensor_constructor(value, name=None, strict=False, allow_downcast=None,
                                 allow_downcast=allow_downcast)
 
 
+# The files created by shared_memory_constructor, removed when the process
+# that created them exits.
+_shared_memory_files = []
+
+
+@atexit.register
+def _remove_shared_memory_files():
+    for pid, path in _shared_memory_files:
+        # Forked processes must not remove the files of their parent.
+        if pid == os.getpid() and os.path.exists(path):
+            os.remove(path)
+
+
+class BufferContainer(Container):
+    """
+    Container whose value is always stored in the same buffer.
+
+    New values, including the ones computed by the updates of a Function,
+    are copied into the buffer, so that the other views of the buffer, or
+    the other processes mapping it, see them. They must thus keep the shape
+    of the buffer.
+
+    Parameters
+    ----------
+    view_of : tuple
+        ``(container, offset)`` if the buffer is a view of the flat buffer
+        of another BufferContainer, starting at element `offset`. It is
+        used to make the view again when unpickled.
+
+    Attributes
+    ----------
+    memory_root : Container
+        The container owning the memory of the buffer. Functions don't
+        update inplace a shared variable whose container has the same
+        `memory_root` as the one of another shared variable they use.
+
+    """
+
+    def __init__(self, r, storage, readonly=False, strict=False,
+                 allow_downcast=None, name=None, view_of=None):
+        super(BufferContainer, self).__init__(
+            r, storage, readonly=readonly, strict=strict,
+            allow_downcast=allow_downcast, name=name)
+        self.buffer = storage[0]
+        self.view_of = view_of
+
+    @property
+    def memory_root(self):
+        if self.view_of is None:
+            return self
+        return self.view_of[0].memory_root
+
+    def __set__(self, value):
+        super(BufferContainer, self).__set__(value)
+        self.sync()
+    data = property(Container.__get__, __set__)
+    value = property(Container.__get__, __set__)
+
+    def sync(self):
+        """
+        Copy the value of the storage into the buffer.
+
+        This is needed when a Function replaced the value of the storage,
+        for instance to apply an update.
+
+        """
+        value = self.storage[0]
+        if value is self.buffer:
+            return
+        if value.shape != self.buffer.shape:
+            raise ValueError(
+                "The shape of a shared variable stored in a buffer can not "
+                "change. Container name \"%s\", shape %s, new shape %s" %
+                (self.name, self.buffer.shape, value.shape))
+        self.buffer[...] = value
+        self.storage[0] = self.buffer
+
+    def __getstate__(self):
+        d = self.__dict__.copy()
+        if self.view_of is not None:
+            d['storage'] = [None]
+            d['buffer'] = self.buffer.shape
+        return d
+
+    def __setstate__(self, d):
+        self.__dict__.update(d)
+        if self.view_of is not None:
+            container, offset = self.view_of
+            shape = self.buffer
+            size = int(numpy.prod(shape))
+            self.buffer = container.buffer[offset:offset + size].reshape(
+                shape)
+            self.storage[0] = self.buffer
+
+
+class SharedMemoryContainer(BufferContainer):
+    """
+    BufferContainer whose buffer is a memory-mapped file.
+
+    By default, the file is created in ``/dev/shm`` so that the memory is
+    POSIX shared memory. All the processes that map the file (forked
+    processes or processes that unpickled the variable or called
+    :func:`attach_shared_memory`) use the same physical memory, and see the
+    values set by the others. The buffer can also be a `numpy.memmap` given
+    by the user, see :func:`memmap_constructor`.
+
+    Parameters
+    ----------
+    path : str
+        The file mapped by ``storage[0]``. If None, the buffer is not
+        shared.
+
+    """
+
+    def __init__(self, r, storage, readonly=False, strict=False,
+                 allow_downcast=None, name=None, path=None):
+        super(SharedMemoryContainer, self).__init__(
+            r, storage, readonly=readonly, strict=strict,
+            allow_downcast=allow_downcast, name=name)
+        self.path = path
+
+    def __getstate__(self):
+        d = self.__dict__.copy()
+        if self.path is not None:
+            # Map the same file when unpickled instead of copying the data.
+            buf = self.buffer
+            d['storage'] = [None]
+            d['buffer'] = (buf.dtype, buf.shape, buf.offset,
+                           'F' if numpy.isfortran(buf) else 'C')
+        return d
+
+    def __setstate__(self, d):
+        self.__dict__.update(d)
+        if self.path is not None:
+            dtype, shape, offset, order = self.buffer
+            self.readonly = True
+            self.buffer = numpy.memmap(self.path, dtype=dtype, mode='r',
+                                       offset=offset, shape=shape,
+                                       order=order)
+            self.storage[0] = self.buffer
+
+
+class TensorBufferSharedVariable(TensorSharedVariable):
+    """
+    TensorSharedVariable whose value is stored in a BufferContainer.
+
+    """
+
+    def set_value(self, new_value, borrow=False):
+        # The value is always copied into the buffer.
+        if new_value is not self.container.buffer:
+            self.container.value = new_value
+
+
+class TensorSharedMemoryVariable(TensorBufferSharedVariable):
+    """
+    TensorSharedVariable whose value is stored in shared memory.
+
+    See Also
+    --------
+    shared_memory_constructor, attach_shared_memory
+
+    """
+
+    @property
+    def path(self):
+        """The file mapped by this shared variable."""
+        return self.container.path
+
+
+class TensorMemmapSharedVariable(TensorSharedMemoryVariable):
+    """
+    TensorSharedVariable whose value is a `numpy.memmap`.
+
+    The value is never copied: `get_value` always returns the memmap, and
+    `set_value` writes into it. `AdvancedSubtensor1` only reads the pages of
+    the rows it takes, and the inplace `AdvancedIncSubtensor1` of an update
+    only writes the pages of the rows it changes.
+
+    See Also
+    --------
+    memmap_constructor
+
+    """
+
+    def get_value(self, borrow=False, return_internal_type=False):
+        # A copy would load the whole file in memory.
+        return self.container.value
+
+
+@shared_constructor
+def shared_memory_constructor(value, name=None, strict=False,
+                              allow_downcast=None, borrow=False,
+                              broadcastable=None, shared_memory=False,
+                              path=None, target='cpu'):
+    """
+    SharedVariable constructor for TensorType, storing the value in shared
+    memory.
+
+    It is used by ``theano.shared(value, shared_memory=True)``. Processes
+    forked after the creation of the variable, or that unpickle it, map the
+    same memory instead of holding their own copy of the value. A pickled
+    variable is mapped read-only. `set_value` and the updates of Theano
+    functions write into the shared memory, so they are seen by all the
+    processes.
+
+    Parameters
+    ----------
+    shared_memory : bool
+        Must be True, otherwise this constructor is not used.
+    path : str
+        The ``.npy`` file to create. By default, a new file in ``/dev/shm``
+        (or in the temporary directory if it does not exist) that is
+        removed when the process exits.
+
+    Notes
+    -----
+    The value is always copied, `borrow` is ignored. The shape of the value
+    can not change after the creation of the variable.
+
+    """
+    if target != 'cpu' or not shared_memory:
+        raise TypeError('not for shared memory')
+
+    if not isinstance(value, numpy.ndarray):
+        raise TypeError()
+
+    if broadcastable is None:
+        broadcastable = (False,) * len(value.shape)
+    type = TensorType(value.dtype, broadcastable=broadcastable)
+    value = type.filter(value, strict=strict, allow_downcast=allow_downcast)
+
+    if path is None:
+        shm_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+        fd, path = tempfile.mkstemp(prefix='theano_shared_', suffix='.npy',
+                                    dir=shm_dir)
+        os.close(fd)
+        _shared_memory_files.append((os.getpid(), path))
+    buf = numpy.lib.format.open_memmap(path, mode='w+', dtype=value.dtype,
+                                       shape=value.shape)
+    buf[...] = value
+
+    container = SharedMemoryContainer(
+        type, [buf], strict=strict, allow_downcast=allow_downcast,
+        name=name, path=path)
+    return TensorSharedMemoryVariable(type=type, value=None, strict=None,
+                                      name=name, container=container)
+
+
+@shared_constructor
+def memmap_constructor(value, name=None, strict=False, allow_downcast=None,
+                       borrow=False, broadcastable=None, memmap=False,
+                       target='cpu'):
+    """
+    SharedVariable constructor for `numpy.memmap` values.
+
+    It is used by ``theano.shared(value, memmap=True)`` when `value` is a
+    `numpy.memmap` (and not a view of one), for tables bigger than the
+    memory. The memmap is used directly, whatever `borrow` is, so
+    `set_value` and the updates of Theano functions write into the file.
+    It is read-only if it was opened with mode ``'r'``: functions updating
+    it can not be compiled.
+
+    A pickled variable maps the same file, read-only, when unpickled. The
+    shape of the value can not change.
+
+    Parameters
+    ----------
+    memmap : bool
+        Must be True, otherwise this constructor is not used and the value
+        is copied like any other ndarray.
+
+    """
+    if target != 'cpu' or not memmap:
+        raise TypeError('not for memmap')
+
+    if (not isinstance(value, numpy.memmap) or
+            not isinstance(value.base, mmap.mmap)):
+        raise TypeError()
+
+    if broadcastable is None:
+        broadcastable = (False,) * len(value.shape)
+    type = TensorType(value.dtype, broadcastable=broadcastable)
+    container = SharedMemoryContainer(
+        type, [value], readonly=(value.mode == 'r'), strict=strict,
+        allow_downcast=allow_downcast, name=name, path=value.filename)
+    return TensorMemmapSharedVariable(type=type, value=None, strict=None,
+                                      name=name, container=container)
+
+
+def attach_shared_memory(path, name=None, broadcastable=None, readonly=True):
+    """
+    Return a shared variable that maps the value stored in `path` by
+    :func:`shared_memory_constructor`, without copying it.
+
+    Parameters
+    ----------
+    path : str
+        The ``.npy`` file of the shared variable (its `path` attribute).
+    readonly : bool
+        If True, the value is mapped read-only and `set_value` raises an
+        error. Use False in the process that updates the value.
+
+    """
+    buf = numpy.lib.format.open_memmap(path, mode='r' if readonly else 'r+')
+    if broadcastable is None:
+        broadcastable = (False,) * buf.ndim
+    type = TensorType(buf.dtype, broadcastable=broadcastable)
+    container = SharedMemoryContainer(type, [buf], readonly=readonly,
+                                      name=name, path=path)
+    return TensorSharedMemoryVariable(type=type, value=None, strict=None,
+                                      name=name, container=container)
+
+
+class SharedGroup(object):
+    """
+    Tensor shared variables whose values are views of one contiguous
+    buffer.
+
+    The whole group can be read, written, updated or reduced with a few
+    operations on `buffer`, instead of one per parameter. For instance, a
+    gradient step over all the parameters is a single Elemwise::
+
+        group = SharedGroup([W_value, b_value])
+        W, b = group.params
+        grads = theano.grad(cost, group.params)
+        updates = [(group.buffer,
+                    group.buffer - lr * group.flatten(grads))]
+
+    The updates of `buffer` and of the parameters are copied into the
+    buffer, so the views always see them.
+
+    Parameters
+    ----------
+    values : list of ndarray
+        The initial values of the parameters. They are copied.
+    names : list of str
+        The names of the parameters.
+    dtype : str
+        The dtype of the buffer. By default, the dtype that can hold all
+        the values.
+    name : str
+        The name of the buffer.
+
+    Attributes
+    ----------
+    buffer : TensorSharedVariable
+        The flat vector shared variable that holds all the values.
+    params : list of TensorSharedVariable
+        The shared variables of the parameters, views of `buffer`.
+
+    Notes
+    -----
+    A function using several of these shared variables, e.g. reading the
+    parameters and updating `buffer` as above, does not compute their
+    updates inplace, as that would change the values it reads.
+
+    """
+
+    def __init__(self, values, names=None, dtype=None, name=None):
+        values = [numpy.asarray(v) for v in values]
+        if names is None:
+            names = [None] * len(values)
+        if dtype is None:
+            dtype = numpy.result_type(*values)
+        dtype = str(numpy.dtype(dtype))
+
+        sizes = [v.size for v in values]
+        buf = numpy.empty(sum(sizes), dtype=dtype)
+        buffer_type = TensorType(dtype, broadcastable=(False,))
+        buffer_container = BufferContainer(buffer_type, [buf], name=name)
+        self.buffer = TensorBufferSharedVariable(
+            type=buffer_type, value=None, strict=None, name=name,
+            container=buffer_container)
+
+        self.params = []
+        offset = 0
+        for value, size, param_name in zip(values, sizes, names):
+            view = buf[offset:offset + size].reshape(value.shape)
+            view[...] = value
+            param_type = TensorType(dtype,
+                                    broadcastable=(False,) * value.ndim)
+            container = BufferContainer(param_type, [view], name=param_name,
+                                        view_of=(buffer_container, offset))
+            self.params.append(TensorBufferSharedVariable(
+                type=param_type, value=None, strict=None, name=param_name,
+                container=container))
+            offset += size
+
+    def flatten(self, variables):
+        """
+        Return the symbolic vector that concatenates `variables`, one per
+        parameter (e.g. their gradients), in the layout of `buffer`.
+
+        """
+        if len(variables) != len(self.params):
+            raise ValueError("Expected one variable per parameter",
+                             len(variables), len(self.params))
+        return theano.tensor.basic.concatenate(
+            [theano.tensor.basic.cast(v.flatten(), self.buffer.dtype)
+             for v in variables])
+
+    def get_value(self, borrow=False):
+        """Return the value of `buffer`, i.e. of all the parameters."""
+        return self.buffer.get_value(borrow=borrow)
+
+    def set_value(self, new_value):
+        """Set the value of all the parameters from a flat vector."""
+        self.buffer.set_value(new_value)
+
+
 # TensorSharedVariable brings in the tensor operators, is not ideal, but works
 # as long as we dont do purely scalar-scalar operations
 # _tensor_py_operators is first to have its version of __{gt,ge,lt,le}__
@@ -765,6 +765,8 @@ class Pool(OpenMPOp):
             {
                 non_pooling_prod *= PyArray_DIMS(%(x)s)[i];
             }
+            // The loops don't use the Python API: let other threads run.
+            Py_BEGIN_ALLOW_THREADS
             %(omp_parallel)s
             // first loop over non-pooling dimensions
             for (int t=0; t<non_pooling_prod; t++)
@@ -899,12 +901,13 @@ class Pool(OpenMPOp):
 
         ccode += """
           } // for loop over non-pooling dimensions
+          Py_END_ALLOW_THREADS
         } // if z_prod
         """
         return ccode % locals()
 
     def c_code_cache_version(self):
-        return (0, 6, 8, 7, self.openmp)
+        return (0, 6, 8, 8, self.openmp)
 
 
 class PoolGrad(OpenMPOp):
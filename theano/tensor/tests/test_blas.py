@@ -1,8 +1,12 @@
 from __future__ import absolute_import, print_function, division
 from copy import copy
+import threading
+import time
 from itertools import product as itertools_product
 from unittest import TestCase
 
+from nose.plugins.skip import SkipTest
+
 import numpy
 from numpy import (arange, array, common_type, complex64, complex128, float32,
                   float64, newaxis, shape, transpose, zeros)
@@ -859,6 +863,38 @@ def test_dot22():
             cmp((0, 0), (0, 0))
 
 
+def test_dot22_releases_gil():
+    # Another thread must be able to run while the BLAS call is running,
+    # e.g. the other thunks of a ParallelLoop.
+    if not config.cxx or not config.blas.ldflags:
+        raise SkipTest('Only the C code linked with BLAS releases the GIL')
+    n = 1500
+    rng = numpy.random.RandomState(unittest_tools.fetch_seed())
+    a = shared(rng.rand(n, n))
+    b = shared(rng.rand(n, n))
+    f = theano.function([], T.dot(a, b), mode=theano.Mode(linker='cvm'))
+    assert any(isinstance(node.op, type(_dot22))
+               for node in f.maker.fgraph.toposort())
+    f()
+    t0 = time.time()
+    f()
+    duration = time.time() - t0
+
+    start = threading.Event()
+
+    def run():
+        start.wait()
+        f()
+    thread = threading.Thread(target=run)
+    thread.start()
+    stamps = [time.time()]
+    start.set()
+    while thread.is_alive():
+        stamps.append(time.time())
+    thread.join()
+    assert max(numpy.diff(stamps)) < duration / 2
+
+
 @attr('slow')
 def test_dot22scalar():
     # including does not seem to work for 'local_dot_to_dot22' and
@@ -1,5 +1,8 @@
 from __future__ import absolute_import, print_function, division
 import numpy
+import os
+import pickle
+import tempfile
 import unittest
 import warnings
 
@@ -625,3 +628,144 @@ def test_scalar_shared_options():
     # Simple test to make sure we do not loose that fonctionality.
     theano.shared(value=0., name='lk', borrow=True)
     theano.shared(value=numpy.float32(0.), name='lk', borrow=True)
+
+
+def test_shared_memory():
+    x = theano.shared(numpy.arange(4.), name='x', shared_memory=True)
+    assert isinstance(x, tensor.sharedvar.TensorSharedMemoryVariable)
+    buf = x.get_value(borrow=True)
+    assert isinstance(buf, numpy.memmap)
+
+    # The other processes see the updates, done in place or not.
+    other = tensor.sharedvar.attach_shared_memory(x.path)
+    for mode in [theano.compile.Mode(linker='py'), None,
+                 theano.compile.Mode(optimizer=None)]:
+        f = theano.function([], x.sum(), updates=[(x, x * 2)], mode=mode)
+        f()
+        assert x.get_value(borrow=True) is buf
+        assert numpy.all(other.get_value() == x.get_value())
+    assert numpy.all(other.get_value() == numpy.arange(4.) * 8)
+    x.set_value(numpy.ones(4))
+    assert numpy.all(other.get_value() == 1)
+    assert x.get_value(borrow=True) is buf
+
+    # Unpickled variables map the same memory, read-only.
+    x2 = pickle.loads(pickle.dumps(x))
+    assert numpy.all(x2.get_value() == 1)
+    x.set_value(numpy.zeros(4))
+    assert numpy.all(x2.get_value() == 0)
+    assert not x2.get_value(borrow=True).flags.writeable
+    utt.assert_allclose(theano.function([], x2 + 1)(), numpy.ones(4))
+    try:
+        x2.set_value(numpy.ones(4))
+    except Exception:
+        pass
+    else:
+        assert False
+
+    try:
+        x.set_value(numpy.ones(5))
+    except ValueError:
+        pass
+    else:
+        assert False
+
+
+def test_memmap():
+    path = os.path.join(tempfile.mkdtemp(), 'table.dat')
+    value = numpy.memmap(path, dtype='float64', mode='w+', shape=(1000, 4))
+    # Memmaps are copied by default.
+    assert not isinstance(theano.shared(value),
+                          tensor.sharedvar.TensorMemmapSharedVariable)
+    W = theano.shared(value, name='W', memmap=True)
+    assert isinstance(W, tensor.sharedvar.TensorMemmapSharedVariable)
+    assert W.get_value() is value
+
+    idx = tensor.lvector()
+    take = theano.function([idx], W[idx])
+    update = theano.function([idx], [], updates=[
+        (W, tensor.inc_subtensor(W[idx], 1.))])
+    if theano.config.mode != 'FAST_COMPILE':
+        # The rows are written in place.
+        assert any(getattr(node.op, 'inplace', False)
+                   for node in update.maker.fgraph.apply_nodes)
+    update([3, 7, 3])
+    assert W.get_value(borrow=True) is value
+    other = numpy.memmap(path, dtype='float64', mode='r', shape=(1000, 4))
+    assert numpy.all(other[3] == 2) and numpy.all(other[7] == 1)
+    assert other.sum() == 12
+    utt.assert_allclose(take([7, 0]), [[1] * 4, [0] * 4])
+
+    W.set_value(numpy.ones((1000, 4)))
+    assert W.get_value() is value
+    assert other.sum() == 4000
+
+    W2 = pickle.loads(pickle.dumps(W))
+    assert numpy.all(W2.get_value()[5] == 1)
+
+    # Views of a memmap can not be used directly.
+    try:
+        theano.shared(value[10:], memmap=True)
+    except TypeError:
+        pass
+    else:
+        assert False
+
+
+def test_memmap_readonly():
+    path = os.path.join(tempfile.mkdtemp(), 'table.dat')
+    numpy.memmap(path, dtype='float64', mode='w+', shape=(10, 4))[:] = 1
+    value = numpy.memmap(path, dtype='float64', mode='r', shape=(10, 4))
+    W = theano.shared(value, memmap=True)
+    assert W.container.readonly
+    utt.assert_allclose(theano.function([], W.sum())(), 40)
+    try:
+        theano.function([], [], updates=[(W, W + 1)])
+    except ValueError:
+        pass
+    else:
+        assert False
+
+    # Without memmap=True, the value is copied and the file is not changed.
+    W = theano.shared(value)
+    theano.function([], [], updates=[(W, W + 1)])()
+    utt.assert_allclose(W.get_value(), numpy.ones((10, 4)) * 2)
+    assert numpy.all(value == 1)
+
+
+def test_shared_group():
+    group = tensor.sharedvar.SharedGroup(
+        [numpy.ones((2, 3)), numpy.arange(3.)], names=['W', 'b'], name='p')
+    W, b = group.params
+    assert W.name == 'W' and group.buffer.name == 'p'
+    utt.assert_allclose(group.get_value(), [1] * 6 + [0, 1, 2])
+
+    x = tensor.dvector()
+    cost = tensor.dot(W, x).sum() + b.sum()
+    grads = theano.grad(cost, group.params)
+    f = theano.function([x], cost, updates=[
+        (group.buffer, group.buffer - 0.5 * group.flatten(grads))])
+    # The buffer is not updated inplace, as the parameters are read.
+    assert not any(f.maker.fgraph.destroyers(i)
+                   for i in f.maker.fgraph.inputs)
+    utt.assert_allclose(f(numpy.ones(3)), 9)
+    utt.assert_allclose(W.get_value(), numpy.ones((2, 3)) / 2)
+    utt.assert_allclose(b.get_value(), [-0.5, 0.5, 1.5])
+    buf = group.get_value(borrow=True)
+    assert numpy.may_share_memory(W.get_value(borrow=True), buf)
+
+    # The updates of the parameters are written into the buffer.
+    g = theano.function([], group.buffer.sum(), updates=[(b, b * 2)])
+    assert not any(g.maker.fgraph.destroyers(i)
+                   for i in g.maker.fgraph.inputs)
+    utt.assert_allclose(g(), 4.5)
+    utt.assert_allclose(group.get_value()[6:], [-1, 1, 3])
+    W.set_value(numpy.zeros((2, 3)))
+    utt.assert_allclose(group.get_value()[:6], 0)
+    group.set_value(numpy.arange(9.))
+    utt.assert_allclose(b.get_value(), [6, 7, 8])
+
+    group2 = pickle.loads(pickle.dumps(group))
+    group2.set_value(numpy.zeros(9))
+    utt.assert_allclose(group2.params[1].get_value(), 0)
+    utt.assert_allclose(b.get_value(), [6, 7, 8])
@@ -2,8 +2,12 @@
 Test config options.
 """
 from __future__ import absolute_import, print_function, division
+import threading
 import unittest
-from theano.configparser import AddConfigVar, ConfigParam, THEANO_FLAGS_DICT
+
+import theano
+from theano.configparser import (AddConfigVar, ConfigParam, THEANO_FLAGS_DICT,
+                                 thread_local_flags)
 
 
 class T_config(unittest.TestCase):
@@ -42,3 +46,40 @@ class T_config(unittest.TestCase):
         assert 'T_config.test_invalid_default_b' not in THEANO_FLAGS_DICT
 
         # TODO We should remove these dummy options on test exit.
+
+    def test_thread_local_flags(self):
+        # The flags changed by thread_local_flags are not seen by the other
+        # threads, e.g. a compilation running in the background.
+        limit = theano.config.traceback.limit
+        entered = threading.Event()
+        done = threading.Event()
+        seen = []
+
+        def other():
+            with thread_local_flags(**{'traceback.limit': limit + 3}):
+                with thread_local_flags(**{'traceback.limit': limit + 4}):
+                    seen.append(theano.config.traceback.limit)
+                seen.append(theano.config.traceback.limit)
+                entered.set()
+                done.wait()
+            seen.append(theano.config.traceback.limit)
+        thread = threading.Thread(target=other)
+        thread.start()
+        entered.wait()
+        assert theano.config.traceback.limit == limit
+        done.set()
+        thread.join()
+        assert seen == [limit + 4, limit + 3, limit]
+
+        # Only the params overridden in some thread check the overrides of
+        # the current thread.
+        param, = [v for v in theano.configparser._config_var_list
+                  if v.fullname == 'traceback.limit']
+        assert param.n_thread_overrides == 0
+        # Nothing is left behind if the values can't be set.
+        flags = thread_local_flags(**{'traceback.limit': limit + 3,
+                                      'device': 'cpu'})
+        self.assertRaises(Exception, flags.__enter__)
+        assert param.n_thread_overrides == 0
+        assert not getattr(theano.configparser._thread_local, 'saved', None)
+        assert theano.config.traceback.limit == limit